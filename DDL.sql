@@ -217,6 +217,7 @@ CREATE TABLE [dbo].[model_performance_metrics](
 	[rmse_90d] [decimal](18, 8) NULL,
 	[r2_score] [decimal](10, 4) NULL,
 	[sample_size] [int] NULL,
+	[coin_id] [int] NULL,
 PRIMARY KEY CLUSTERED 
 (
 	[metric_id] ASC
@@ -239,6 +240,105 @@ PRIMARY KEY CLUSTERED
 )WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
 ) ON [PRIMARY]
 GO
+/****** Object:  Table [dbo].[job_watermarks]    Script Date: 18/10/2026 ******/
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- High-water marks of the incremental maintenance jobs
+CREATE TABLE [dbo].[job_watermarks](
+	[job_name] [varchar](50) NOT NULL,
+	[high_water_mark] [bigint] NOT NULL,
+	[updated_at] [datetime] NULL,
+PRIMARY KEY CLUSTERED 
+(
+	[job_name] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+/****** Object:  Table [dbo].[chat_data_hourly]    Script Date: 18/10/2026 ******/
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- Hourly rollup of chat_data, maintained by utils/rollups.py.
+-- Unscored rows are stored with sentiment_label = ''
+CREATE TABLE [dbo].[chat_data_hourly](
+	[bucket_hour] [datetime] NOT NULL,
+	[coin_id] [int] NOT NULL,
+	[source_id] [int] NOT NULL,
+	[sentiment_label] [varchar](20) NOT NULL,
+	[mention_count] [int] NOT NULL,
+	[score_sum] [float] NOT NULL,
+	[score_count] [int] NOT NULL,
+PRIMARY KEY CLUSTERED 
+(
+	[bucket_hour] ASC,
+	[coin_id] ASC,
+	[source_id] ASC,
+	[sentiment_label] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+/****** Object:  Table [dbo].[chat_data_unscored]    Script Date: 18/10/2026 ******/
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- chat_data rows folded into chat_data_hourly before they were scored, with the
+-- label they were folded under; utils/rollups.py re-folds them once scored
+CREATE TABLE [dbo].[chat_data_unscored](
+	[chat_id] [int] NOT NULL,
+	[sentiment_label] [varchar](20) NOT NULL,
+PRIMARY KEY CLUSTERED 
+(
+	[chat_id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+/****** Object:  Table [dbo].[model_error_sums]    Script Date: 18/10/2026 ******/
+SET ANSI_NULLS ON
+GO
+SET QUOTED_IDENTIFIER ON
+GO
+-- Running prediction error sums per model_version x coin x horizon, maintained by
+-- the prediction resolver (utils/predictions.py) and read by utils/evaluation.py.
+-- A NULL model_version is stored as ''
+CREATE TABLE [dbo].[model_error_sums](
+	[model_version] [varchar](50) NOT NULL,
+	[coin_id] [int] NOT NULL,
+	[horizon] [varchar](10) NOT NULL,
+	[sample_count] [int] NOT NULL,
+	[abs_error_sum] [float] NOT NULL,
+	[sq_error_sum] [float] NOT NULL,
+	[ape_sum] [float] NOT NULL,
+	[actual_sum] [float] NOT NULL,
+	[actual_sq_sum] [float] NOT NULL,
+PRIMARY KEY CLUSTERED 
+(
+	[model_version] ASC,
+	[coin_id] ASC,
+	[horizon] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, IGNORE_DUP_KEY = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+) ON [PRIMARY]
+GO
+/****** Object:  Index [IX_Price_Data_coin_price_date]    Script Date: 18/10/2026 ******/
+-- Serves the per-coin as-of lookups of the prediction resolver and the latest-price queries
+CREATE NONCLUSTERED INDEX [IX_Price_Data_coin_price_date] ON [dbo].[Price_Data]
+(
+	[coin_id] ASC,
+	[price_date] ASC
+)
+INCLUDE([price_usd]) WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, DROP_EXISTING = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
+/****** Object:  Index [IX_Price_Data_coin_id]    Script Date: 18/10/2026 ******/
+-- Serves the per-coin MAX(id) data watermarks behind the API ETags
+CREATE NONCLUSTERED INDEX [IX_Price_Data_coin_id] ON [dbo].[Price_Data]
+(
+	[coin_id] ASC,
+	[id] ASC
+)WITH (PAD_INDEX = OFF, STATISTICS_NORECOMPUTE = OFF, SORT_IN_TEMPDB = OFF, DROP_EXISTING = OFF, ONLINE = OFF, ALLOW_ROW_LOCKS = ON, ALLOW_PAGE_LOCKS = ON, OPTIMIZE_FOR_SEQUENTIAL_KEY = OFF) ON [PRIMARY]
+GO
 ALTER TABLE [dbo].[chat_source] ADD  DEFAULT (getdate()) FOR [created_at]
 GO
 ALTER TABLE [dbo].[predictions] ADD  DEFAULT (getdate()) FOR [prediction_date]
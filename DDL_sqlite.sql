@@ -0,0 +1,203 @@
+-- SQLite translation of DDL.sql for the local stand-in backend (DB_BACKEND=sqlite).
+-- Column names, types and indexes mirror CryptoAiDb so query plans stay
+-- comparable with production.
+-- Price_Data carries both price_date (read by vw_predictions) and timestamp
+-- (read by the dashboard queries), as the live table does.
+
+CREATE TABLE IF NOT EXISTS chat_source (
+    source_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_name VARCHAR(50) NOT NULL UNIQUE,
+    api_base_url VARCHAR(255) NULL,
+    created_at DATETIME NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS Coins (
+    coin_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol VARCHAR(20) NOT NULL,
+    full_name VARCHAR(100) NULL,
+    description VARCHAR(100) NULL
+);
+
+CREATE TABLE IF NOT EXISTS chat_data (
+    chat_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME NOT NULL,
+    coin_id INT NOT NULL REFERENCES Coins (coin_id),
+    source_id INT NOT NULL REFERENCES chat_source (source_id),
+    content TEXT NULL,
+    sentiment_score DECIMAL(5, 2) NULL,
+    sentiment_label VARCHAR(20) NULL,
+    url VARCHAR(500) NULL
+);
+
+CREATE TABLE IF NOT EXISTS Price_Data (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    coin_id INT NULL REFERENCES Coins (coin_id),
+    price_date DATETIME NULL,
+    timestamp DATETIME NULL,
+    price_usd DECIMAL(18, 8) NULL,
+    volume_24h DECIMAL(18, 2) NULL,
+    price_change_24h DECIMAL(18, 2) NULL,
+    data_source VARCHAR(50) NULL
+);
+
+CREATE TABLE IF NOT EXISTS predictions (
+    prediction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    coin_id INT NULL REFERENCES Coins (coin_id),
+    prediction_date DATETIME NULL DEFAULT (datetime('now', 'localtime')),
+    current_price DECIMAL(18, 8) NULL,
+    prediction_24h DECIMAL(18, 8) NULL,
+    prediction_7d DECIMAL(18, 8) NULL,
+    prediction_30d DECIMAL(18, 8) NULL,
+    prediction_90d DECIMAL(18, 8) NULL,
+    sentiment_score DECIMAL(5, 2) NULL,
+    confidence_score DECIMAL(5, 2) NULL,
+    actual_price_24h DECIMAL(18, 8) NULL,
+    actual_price_7d DECIMAL(18, 8) NULL,
+    actual_price_30d DECIMAL(18, 8) NULL,
+    actual_price_90d DECIMAL(18, 8) NULL,
+    accuracy_score DECIMAL(5, 2) NULL,
+    features_used TEXT NULL,
+    model_version VARCHAR(50) NULL,
+    training_window_days INT NULL,
+    data_points_count INT NULL,
+    market_conditions VARCHAR(50) NULL,
+    volatility_index DECIMAL(10, 2) NULL,
+    prediction_error_24h DECIMAL(18, 8) NULL,
+    prediction_error_7d DECIMAL(18, 8) NULL,
+    prediction_error_30d DECIMAL(18, 8) NULL,
+    prediction_error_90d DECIMAL(18, 8) NULL,
+    model_parameters TEXT NULL
+);
+
+CREATE TABLE IF NOT EXISTS model_performance_metrics (
+    metric_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_version VARCHAR(50) NULL,
+    evaluation_date DATETIME NULL,
+    mae_24h DECIMAL(18, 8) NULL,
+    mae_7d DECIMAL(18, 8) NULL,
+    mae_30d DECIMAL(18, 8) NULL,
+    mae_90d DECIMAL(18, 8) NULL,
+    rmse_24h DECIMAL(18, 8) NULL,
+    rmse_7d DECIMAL(18, 8) NULL,
+    rmse_30d DECIMAL(18, 8) NULL,
+    rmse_90d DECIMAL(18, 8) NULL,
+    r2_score DECIMAL(10, 4) NULL,
+    sample_size INT NULL,
+    coin_id INT NULL  -- NULL: all coins of the model
+);
+
+CREATE TABLE IF NOT EXISTS prediction_feature_importance (
+    feature_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prediction_id INT NULL REFERENCES predictions (prediction_id),
+    feature_name VARCHAR(100) NULL,
+    importance_score DECIMAL(10, 4) NULL
+);
+
+-- Serves the per-coin as-of lookups of the prediction resolver and the latest-price queries
+CREATE INDEX IF NOT EXISTS IX_Price_Data_coin_price_date ON Price_Data (coin_id, price_date, price_usd);
+
+-- Serves the per-coin MAX(id) data watermarks behind the API ETags
+CREATE INDEX IF NOT EXISTS IX_Price_Data_coin_id ON Price_Data (coin_id, id);
+
+-- High-water marks of the incremental maintenance jobs
+CREATE TABLE IF NOT EXISTS job_watermarks (
+    job_name VARCHAR(50) NOT NULL PRIMARY KEY,
+    high_water_mark BIGINT NOT NULL,
+    updated_at DATETIME NULL
+);
+
+-- Hourly rollup of chat_data, maintained by utils/rollups.py.
+-- Unscored rows are stored with sentiment_label = ''
+CREATE TABLE IF NOT EXISTS chat_data_hourly (
+    bucket_hour DATETIME NOT NULL,
+    coin_id INT NOT NULL,
+    source_id INT NOT NULL,
+    sentiment_label VARCHAR(20) NOT NULL,
+    mention_count INT NOT NULL,
+    score_sum FLOAT NOT NULL,
+    score_count INT NOT NULL,
+    PRIMARY KEY (bucket_hour, coin_id, source_id, sentiment_label)
+) WITHOUT ROWID;
+
+-- chat_data rows folded into chat_data_hourly before they were scored, with the
+-- label they were folded under; utils/rollups.py re-folds them once scored
+CREATE TABLE IF NOT EXISTS chat_data_unscored (
+    chat_id INT NOT NULL PRIMARY KEY,
+    sentiment_label VARCHAR(20) NOT NULL
+) WITHOUT ROWID;
+
+-- Running prediction error sums per model_version x coin x horizon, maintained by
+-- the prediction resolver (utils/predictions.py) and read by utils/evaluation.py.
+-- A NULL model_version is stored as ''
+CREATE TABLE IF NOT EXISTS model_error_sums (
+    model_version VARCHAR(50) NOT NULL,
+    coin_id INT NOT NULL,
+    horizon VARCHAR(10) NOT NULL,
+    sample_count INT NOT NULL,
+    abs_error_sum FLOAT NOT NULL,
+    sq_error_sum FLOAT NOT NULL,
+    ape_sum FLOAT NOT NULL,
+    actual_sum FLOAT NOT NULL,
+    actual_sq_sum FLOAT NOT NULL,
+    PRIMARY KEY (model_version, coin_id, horizon)
+) WITHOUT ROWID;
+
+CREATE VIEW IF NOT EXISTS ChatView AS
+SELECT Coins.symbol, chat_source.source_id, chat_data.content, chat_data.sentiment_score, chat_source.source_name
+FROM chat_data
+INNER JOIN chat_source ON chat_data.source_id = chat_source.source_id
+INNER JOIN Coins ON chat_data.coin_id = Coins.coin_id;
+
+CREATE VIEW IF NOT EXISTS vw_predictions AS
+SELECT
+   p.prediction_date AS PredictionDate,
+   c.symbol AS Symbol,
+   p.current_price AS [Price When Predicted],
+   (
+       SELECT pd.price_usd
+       FROM price_data pd
+       WHERE pd.coin_id = p.coin_id
+       ORDER BY pd.price_date DESC
+       LIMIT 1
+   ) AS [Price Now],
+   p.prediction_24h AS [Prediction 24h],
+   (
+       SELECT pd.price_usd
+       FROM price_data pd
+       WHERE pd.coin_id = p.coin_id
+         AND pd.price_date >= datetime(p.prediction_date, '+24 hours')
+       ORDER BY pd.price_date ASC
+       LIMIT 1
+   ) AS [Actual 24h],
+   p.prediction_7d AS [Predicted 7d],
+   (
+       SELECT pd.price_usd
+       FROM price_data pd
+       WHERE pd.coin_id = p.coin_id
+         AND pd.price_date >= datetime(p.prediction_date, '+7 days')
+       ORDER BY pd.price_date ASC
+       LIMIT 1
+   ) AS [Actual 7d],
+   p.prediction_30d AS [Pred 30d],
+   (
+       SELECT pd.price_usd
+       FROM price_data pd
+       WHERE pd.coin_id = p.coin_id
+         AND pd.price_date >= datetime(p.prediction_date, '+30 days')
+       ORDER BY pd.price_date ASC
+       LIMIT 1
+   ) AS [Actual 30d],
+   p.prediction_90d AS [Pred 90d],
+   (
+       SELECT pd.price_usd
+       FROM price_data pd
+       WHERE pd.coin_id = p.coin_id
+         AND pd.price_date >= datetime(p.prediction_date, '+90 days')
+       ORDER BY pd.price_date ASC
+       LIMIT 1
+   ) AS [Actual 90d],
+   p.market_conditions AS Sentiment,
+   p.confidence_score AS Confidence,
+   p.accuracy_score AS Accuracy
+FROM predictions p
+INNER JOIN Coins c ON p.coin_id = c.coin_id;
@@ -1,95 +1,436 @@
-from flask import Flask, render_template, jsonify, request
+from flask import (
+    Flask, Response, render_template, jsonify, request, stream_with_context, make_response, g,
+    has_request_context
+)
+from flask.json.provider import DefaultJSONProvider
+from functools import wraps
 from datetime import datetime, timedelta
-import pandas as pd
-import numpy as np
-from utils.database import DatabaseManager
-from utils.chart_utils import ChartManager
-import pyodbc
-import traceback
-from config import DB_CONNECTION_STRING  # Import the full connection string
-import decimal
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+np = lazy_import('numpy')
+from utils.database import DatabaseManager, format_sql_datetime
+from utils.coins import id_filter
+from utils import responses
+from utils.cache import response_cache
+from utils.chart_render import chart_renderer, FORMATS as CHART_FORMATS
+from utils import metrics
+from utils import profiler
+from utils.downsample import downsample_series, minmax_indices, lttb_indices, METHODS as DOWNSAMPLE_METHODS
+from utils.indicators import INDICATORS
+from utils.candles import parse_interval as parse_candle_interval, COLUMNS as CANDLE_COLUMNS
+from utils.evaluation import HORIZON_NAMES
+from utils.columnar import (
+    requested_format, encode_columnar, encode_arrow, compress, COLUMNAR_MIMETYPE, ARROW_MIMETYPE
+)
+import hashlib
+import json
+import logging
+import threading
+import time
+from config import (
+    PREDICTIONS_PAGE_SIZE, PREDICTIONS_MAX_PAGE_SIZE, PREDICTIONS_FETCH_SIZE,
+    PRICE_MIN_POINTS, PRICE_MAX_POINTS, BATCH_MAX_COINS, BATCH_PARALLEL, LOG_LEVEL, PROFILE_SECRET,
+    CORRELATION_DEFAULT_WINDOW, CORRELATION_MAX_WINDOW, CORRELATION_DEFAULT_MAX_LAG, CORRELATION_MAX_LAG,
+    SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE
+)
+from concurrent.futures import ThreadPoolExecutor
+
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, recording serialization time per route"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            metrics.json_serialize_seconds.observe(time.perf_counter() - started, route_label())
+
+def route_label():
+    """URL rule of the current request, so /api/price/BTC and /api/price/ETH share a series"""
+    if has_request_context() and request.url_rule is not None:
+        return request.url_rule.rule
+    return 'unmatched' if has_request_context() else 'none'
 
 app = Flask(__name__)
+app.json = TimedJSONProvider(app)
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = route_label()
+        metrics.request_latency.observe(
+            time.perf_counter() - started, route, request.method, str(response.status_code)
+        )
+        if response.content_length:
+            metrics.response_bytes.inc(route, amount=response.content_length)
+    return response
+
+# Without a secret no hook is registered, so unprofiled requests pay nothing
+if PROFILE_SECRET:
+    @app.before_request
+    def start_profiler():
+        token = request.headers.get('X-Profile') or request.args.get('profile')
+        if token and request.path.startswith('/api/') and profiler.verify(token, request.path):
+            g.profiler = profiler.SamplingProfiler(threading.get_ident()).start()
+
+    def save_profile(sampler, route, fmt):
+        """Stop the sampler, save and log its profile; returns (breakdown, path)"""
+        sampler.stop()
+        breakdown = sampler.breakdown()
+        try:
+            path = profiler.save(sampler, route, fmt)
+        except Exception as e:
+            logger.error("Error saving profile: %s", e)
+            path = None
+        logger.info("Profiled %s: %s", route, breakdown)
+        return breakdown, path
+
+    @app.after_request
+    def finish_profiler(response):
+        """Save the profile; ?profile_output=body returns it instead of the response.
+
+        A streamed body (NDJSON) is generated after this hook, so its sample
+        runs until the server closes the response and the profile is only
+        saved and logged, without the X-Profile-* headers.
+        """
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return response
+        fmt = request.args.get('profile_format', 'speedscope')
+        if response.is_streamed:
+            if request.args.get('profile_output') != 'body':
+                route = request.path
+                response.call_on_close(lambda: save_profile(sampler, route, fmt))
+                return response
+            # Generate the body under the sampler, then release what the stream holds
+            response.get_data()
+            response.close()
+        breakdown, path = save_profile(sampler, request.path, fmt)
+        if request.args.get('profile_output') == 'body':
+            if fmt == 'collapsed':
+                return Response(sampler.collapsed(), mimetype='text/plain')
+            return jsonify({'breakdown': breakdown, 'path': path, 'profile': sampler.speedscope(request.path)})
+        response.headers['X-Profile-Breakdown'] = json.dumps(breakdown, separators=(',', ':'))
+        if path:
+            response.headers['X-Profile-Path'] = path
+        return response
 db_manager = DatabaseManager()
-chart_manager = ChartManager()
 
-def get_db_connection():
-    try:
-        print("Attempting database connection with configured string...")
-        return pyodbc.connect(DB_CONNECTION_STRING)
-    except Exception as e:
-        print(f"Connection error: {str(e)}")
-        print(f"Using connection string: {DB_CONNECTION_STRING}")
-        raise
+def numeric_stats(stats):
+    """Numeric fields of a stats dict as gauge samples"""
+    return {(key,): value for key, value in stats.items() if isinstance(value, (int, float))}
+
+metrics.registry.gauge(
+    'dashboard_pool', 'Connection pool occupancy and checkout counters', ('stat',),
+    lambda: numeric_stats(db_manager.get_pool_stats())
+)
+metrics.registry.gauge(
+    'dashboard_response_cache', 'Response cache entries, hits, misses and hit ratio', ('stat',),
+    lambda: numeric_stats(response_cache.stats())
+)
+metrics.registry.gauge(
+    'dashboard_single_flight', 'Query executions and coalesced duplicates', ('stat',),
+    lambda: numeric_stats(db_manager.get_query_stats())
+)
+
+def to_iso(value):
+    """ISO-format a datetime column that may arrive as a datetime or a string"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value).replace(' ', 'T')
+
+def is_error_body(response):
+    """True for a buffered JSON object carrying an 'error' key"""
+    if response.is_streamed or not response.is_json or b'"error"' not in response.get_data():
+        return False
+    body = response.get_json(silent=True)
+    return isinstance(body, dict) and 'error' in body
+
+def conditional(*sources, granularity=None):
+    """Answer If-None-Match with 304 while the data behind a route is unchanged.
+
+    The ETag hashes the path, query string, body, Accept header and the watermarks of
+    `sources` (for a <coin> route the per-coin ones use that coin), plus a
+    time bucket of `granularity` seconds for routes whose window moves with
+    the clock. A match returns before the view runs any query. Only successful
+    responses are tagged: an error body, even one sent with status 200, must
+    not be revalidated as current until the data changes.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            try:
+                marks = db_manager.watermarks.lookup(sources, kwargs.get('coin'))
+            except Exception as e:
+                logger.error("Error reading data watermarks: %s", e)
+                return view(**kwargs)
+            
+            bucket = int(time.time() // granularity) if granularity else None
+            etag = hashlib.sha1(repr((
+                request.path, sorted(request.args.items(multi=True)), request.get_data(),
+                request.headers.get('Accept', ''), marks, bucket
+            )).encode('utf-8')).hexdigest()
+            
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = make_response(view(**kwargs))
+                if response.status_code != 200 or is_error_body(response):
+                    return response
+            response.set_etag(etag, weak=True)
+            # Let the browser keep the body but revalidate on every fetch
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+def signed_only(view):
+    """Serve a maintenance route only to requests carrying a token signed for its path with
+    PROFILE_SECRET (X-Token header or ?token=, see `python -m utils.profiler <path>`).
+
+    Without a secret the route is disabled and answers 404.
+    """
+    @wraps(view)
+    def wrapper(**kwargs):
+        if not PROFILE_SECRET:
+            return jsonify({'error': 'not found'}), 404
+        token = request.headers.get('X-Token') or request.args.get('token')
+        if not profiler.verify(token, request.path):
+            return jsonify({'error': 'a valid token signed for this path is required'}), 403
+        return view(**kwargs)
+    return wrapper
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/api/coins')
+@conditional('Coins')
 def get_coins():
     # Get the tab parameter, defaulting to None if not provided
     tab = request.args.get('tab')
     
-    coins = db_manager.get_available_coins()
+    coins = response_cache.get_or_compute('coins', {}, db_manager.get_available_coins)
     
-    # Add "All" option for all tabs
-    coins.insert(0, "All")
+    # Add "All" option for all tabs (without touching the cached list)
+    coins = ["All"] + coins
         
     return jsonify(coins)
 
-@app.route('/api/price/<coin>')
-def get_price_data(coin):
-    timerange = request.args.get('timerange', '24h')
+def format_timestamps(values):
+    """Format a datetime64 array as 'YYYY-MM-DD HH:MM:SS' strings in one vectorized pass"""
+    if len(values) == 0:
+        return []
+    return np.char.replace(np.datetime_as_string(values, unit='s'), 'T', ' ').tolist()
+
+def build_price_series(coin, start_time, max_points=None, method='minmax', df=None):
+    """Price and volume arrays of a coin, downsampled to about max_points when given"""
+    arrays = None
+    if df is None:
+        try:
+            # Slices of the memory-mapped price store, no DataFrame in between
+            arrays = db_manager.get_price_arrays(coin, start_time)
+        except Exception as e:
+            logger.error("Error reading the price store, falling back to SQL: %s", e)
+        if arrays is None:
+            df = db_manager.get_price_data(coin, start_time)
+    
+    if arrays is not None:
+        timestamps, prices, volumes = arrays
+        if len(timestamps) == 0:
+            return {}
+    else:
+        if 'timestamp' not in df.columns or df.empty:
+            return {}
+        timestamps = pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]')
+        prices = pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float)
+        volumes = pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=float)
+    if max_points and len(prices) > max_points:
+        timestamps, prices, volumes = downsample_series(timestamps, prices, volumes, max_points, method)
+    
+    return {'timestamps': timestamps, 'prices': prices, 'volumes': volumes}
+
+def series_response(columns, meta, to_json):
+    """Send time-series columns in the negotiated wire format, compressed when large.
+
+    JSON stays the default; ?format=columnar (or Accept: application/x-columnar)
+    sends typed-array buffers and ?format=arrow an Arrow IPC stream.
+    """
+    fmt = requested_format(request.args, request.headers.get('Accept', ''))
+    if fmt == 'columnar':
+        body, mimetype = encode_columnar(columns, meta), COLUMNAR_MIMETYPE
+    elif fmt == 'arrow':
+        body, mimetype = encode_arrow(columns, meta), ARROW_MIMETYPE
+    else:
+        body, mimetype = app.json.dumps(to_json()).encode('utf-8'), 'application/json'
     
+    body, encoding = compress(body, request.headers.get('Accept-Encoding'))
+    response = Response(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept, Accept-Encoding'
+    return response
+
+def timerange_start(timerange):
+    """Start of a price timerange (24h, 7d, 30d, anything else 90d)"""
     # Convert timerange to datetime
     now = datetime.now()
     if timerange == '24h':
-        start_time = now - timedelta(hours=24)
+        return now - timedelta(hours=24)
     elif timerange == '7d':
-        start_time = now - timedelta(days=7)
+        return now - timedelta(days=7)
     elif timerange == '30d':
-        start_time = now - timedelta(days=30)
+        return now - timedelta(days=30)
     else:  # 90d
-        start_time = now - timedelta(days=90)
-    
-    df = db_manager.get_price_data(coin, start_time)
+        return now - timedelta(days=90)
+
+@app.route('/api/price/<coin>')
+@conditional('coin_price', granularity=60)
+def get_price_data(coin):
+    """Price series of a coin; ?max_points= downsamples it (?downsample=minmax|lttb)"""
+    timerange = request.args.get('timerange', '24h')
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('downsample', 'minmax')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    if max_points is not None:
+        max_points = min(max(max_points, PRICE_MIN_POINTS), PRICE_MAX_POINTS)
     
-    # Ensure we have a timestamp column
-    if 'timestamp' not in df.columns and 'date' not in df.columns:
-        return jsonify({
-            'timestamps': [],
-            'prices': [],
-            'volumes': []
-        })
+    start_time = timerange_start(timerange)
     
-    # Use timestamp column if it exists, otherwise use date
-    time_col = 'timestamp' if 'timestamp' in df.columns else 'date'
+    if max_points:
+        # Downsampled series are cached per coin, timerange and resolution
+        series = response_cache.get_or_compute(
+            'price',
+            {'coin': coin, 'timerange': timerange, 'max_points': max_points, 'method': method},
+            lambda: build_price_series(coin, start_time, max_points, method)
+        )
+    else:
+        series = build_price_series(coin, start_time)
     
-    # Format the response
-    return jsonify({
-        'timestamps': df[time_col].dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
-        'prices': df['price'].tolist() if 'price' in df.columns else [],
-        'volumes': df['volume'].tolist() if 'volume' in df.columns else []
-    })
+    series = series or {
+        'timestamps': np.array([], dtype='datetime64[ns]'),
+        'prices': np.array([]),
+        'volumes': np.array([])
+    }
+    return series_response(series, {}, lambda: price_payload(series))
+
+def price_payload(series):
+    """JSON structure of /api/price from build_price_series arrays"""
+    return {
+        'timestamps': format_timestamps(series['timestamps']),
+        'prices': [None if np.isnan(p) else p for p in series['prices'].tolist()],
+        'volumes': [None if np.isnan(v) else v for v in series['volumes'].tolist()]
+    }
+
+@app.route('/api/indicators/<coin>')
+@conditional('coin_price', granularity=60)
+def get_indicators(coin):
+    """Technical indicators of a coin over a price timerange; ?indicators=sma,rsi,... picks them"""
+    timerange = request.args.get('timerange', '24h')
+    requested = request.args.get('indicators')
+    groups = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(INDICATORS)
+    unknown = [name for name in groups if name not in INDICATORS]
+    if unknown:
+        return jsonify({'error': f"indicators must be among {', '.join(INDICATORS)}"}), 400
+    max_points = request.args.get('max_points', type=int)
+    method = request.args.get('downsample', 'minmax')
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+
+    try:
+        result = db_manager.indicators.get(coin, timerange_start(timerange))
+    except Exception as e:
+        logger.error("Error computing indicators: %s", e)
+        result = None
+    timestamps, values = result if result is not None else (np.array([], dtype='datetime64[ns]'), {'price': np.array([])})
+    names = ['price'] + [name for group in groups for name in INDICATORS[group]]
+    columns = {'timestamps': timestamps}
+    columns.update({name: values.get(name, np.array([])) for name in names})
+
+    if max_points is not None:
+        max_points = min(max(max_points, PRICE_MIN_POINTS), PRICE_MAX_POINTS)
+        if len(timestamps) > max_points:
+            # Points are picked on the price line; the indicators are sampled at the same rows
+            if method == 'lttb':
+                indices = lttb_indices(timestamps.astype('datetime64[ms]').astype(np.int64), columns['price'], max_points)
+            else:
+                indices = minmax_indices(columns['price'], max_points)
+            columns = {name: column[indices] for name, column in columns.items()}
+
+    return series_response(columns, {'coin': coin}, lambda: indicators_payload(columns))
+
+def indicators_payload(columns):
+    """JSON structure of /api/indicators; warm-up rows without a value are null"""
+    payload = {'timestamps': format_timestamps(columns['timestamps'])}
+    for name, values in columns.items():
+        if name != 'timestamps':
+            payload[name] = [None if np.isnan(v) else v for v in values.tolist()]
+    return payload
+
+@app.route('/api/indicators/stats')
+def get_indicator_stats():
+    return jsonify(db_manager.indicators.stats())
+
+@app.route('/api/candles/<coin>')
+@conditional('coin_price', granularity=60)
+def get_candles(coin):
+    """OHLCV candles of a coin; ?interval=1m..1d over ?timerange= or ?start=&end= (ISO datetimes)"""
+    interval = request.args.get('interval', '1h')
+    seconds = parse_candle_interval(interval)
+    if seconds is None:
+        return jsonify({'error': "interval must be like 1m, 15m, 4h or 1d, between 1m and 1d and dividing a day"}), 400
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start_time = datetime.fromisoformat(start) if start else timerange_start(request.args.get('timerange', '24h'))
+        end_time = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({'error': "start and end must be ISO datetimes"}), 400
+
+    try:
+        timestamps, columns = db_manager.candles.get(coin, seconds, start_time, end_time)
+    except Exception as e:
+        logger.error("Error building candles: %s", e)
+        timestamps, columns = np.array([], dtype='datetime64[ns]'), {column: np.array([]) for column in CANDLE_COLUMNS}
+    columns = {'timestamps': timestamps, **columns}
+    return series_response(columns, {'coin': coin, 'interval': interval}, lambda: candles_payload(columns))
+
+def candles_payload(columns):
+    """JSON structure of /api/candles; timestamps are bucket starts"""
+    payload = {'timestamps': format_timestamps(columns['timestamps'])}
+    for column in CANDLE_COLUMNS:
+        values = columns[column].tolist()
+        payload[column] = [int(v) for v in values] if column == 'ticks' else [None if np.isnan(v) else v for v in values]
+    return payload
+
+@app.route('/api/candles/stats')
+def get_candle_stats():
+    return jsonify(db_manager.candles.stats())
 
 @app.route('/api/sentiment/daterange')
+@conditional('chat_data', 'Coins')
 def get_sentiment_date_range():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
+        sql = db_manager.sql
+        query = f"""
         SELECT 
-            MIN(CONVERT(DATE, timestamp)) as min_date,
-            MAX(CONVERT(DATE, timestamp)) as max_date
-        FROM chat_data cd
-        JOIN Coins c ON cd.coin_id = c.coin_id
-        WHERE cd.sentiment_label IS NOT NULL
+            MIN({sql.to_date('h.bucket_hour')}) as min_date,
+            MAX({sql.to_date('h.bucket_hour')}) as max_date
+        FROM {db_manager.chat_rollup.source_sql()} h
+        WHERE h.sentiment_label <> ''
         """
         
-        cursor.execute(query)
-        row = cursor.fetchone()
+        rows = db_manager.fetch_all(query)
+        row = rows[0] if rows else None
         
         if not row or not row[0] or not row[1]:
             # Return default date range if no data
@@ -100,13 +441,14 @@ def get_sentiment_date_range():
                 'maxDate': now.strftime('%Y-%m-%d')
             })
             
+        # Dates come back as date objects or YYYY-MM-DD strings depending on the backend
         return jsonify({
-            'minDate': row[0].strftime('%Y-%m-%d'),
-            'maxDate': row[1].strftime('%Y-%m-%d')
+            'minDate': str(row[0])[:10],
+            'maxDate': str(row[1])[:10]
         })
         
     except Exception as e:
-        print(f"Error in get_sentiment_date_range: {str(e)}")
+        logger.error("Error in get_sentiment_date_range: %s", e)
         # Return a default range on error
         now = datetime.now()
         week_ago = now - timedelta(days=7)
@@ -114,13 +456,11 @@ def get_sentiment_date_range():
             'minDate': week_ago.strftime('%Y-%m-%d'),
             'maxDate': now.strftime('%Y-%m-%d')
         })
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @app.route('/api/sentiment/<coin>')
+@conditional('chat_data', 'Coins')
 def get_sentiment_data(coin):
-    print(f"\n\n=== Starting sentiment data request for {coin} ===")
+    logger.debug("Sentiment data request for %s", coin)
     try:
         start_date = request.args.get('start')
         end_date = request.args.get('end')
@@ -129,80 +469,50 @@ def get_sentiment_data(coin):
         try:
             start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
             end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            start_date = start_dt.strftime('%Y-%m-%d %H:%M:%S')
+            # The hourly rollup resolves the range to whole hours
+            start_date = start_dt.strftime('%Y-%m-%d %H:00:00')
             end_date = end_dt.strftime('%Y-%m-%d %H:%M:%S')
         except Exception as e:
-            print(f"Date parsing error: {str(e)}")
+            logger.debug("Date parsing error: %s", e)
             return jsonify({'error': 'Invalid date format'}), 400
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Modify query based on whether "All" is selected
+        sql = db_manager.sql
+        hourly = db_manager.chat_rollup.source_sql()
         if coin.lower() == 'all':
-            query = """
+            query = f"""
             SELECT 
-                CONVERT(DATE, cd.timestamp) as date,
-                COALESCE(cd.sentiment_label, 'Neutral') as sentiment_label,
-                COUNT(*) as count
-            FROM chat_data cd
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE cd.timestamp BETWEEN ? AND ?
-                AND cd.sentiment_label IS NOT NULL
-            GROUP BY CONVERT(DATE, cd.timestamp), cd.sentiment_label
+                {sql.to_date('h.bucket_hour')} as date,
+                h.sentiment_label,
+                SUM(h.mention_count) as count
+            FROM {hourly} h
+            WHERE h.bucket_hour BETWEEN ? AND ?
+                AND h.sentiment_label <> ''
+            GROUP BY {sql.to_date('h.bucket_hour')}, h.sentiment_label
             ORDER BY date
             """
-            cursor.execute(query, (start_date, end_date))
+            params = (start_date, end_date)
         else:
-            query = """
+            coin_ids = db_manager.coins.coin_ids(coin)
+            query = f"""
             SELECT 
-                CONVERT(DATE, cd.timestamp) as date,
-                COALESCE(cd.sentiment_label, 'Neutral') as sentiment_label,
-                COUNT(*) as count
-            FROM chat_data cd
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE c.symbol = ?
-                AND cd.timestamp BETWEEN ? AND ?
-                AND cd.sentiment_label IS NOT NULL
-            GROUP BY CONVERT(DATE, cd.timestamp), cd.sentiment_label
+                {sql.to_date('h.bucket_hour')} as date,
+                h.sentiment_label,
+                SUM(h.mention_count) as count
+            FROM {hourly} h
+            WHERE {id_filter('h.coin_id', coin_ids)}
+                AND h.bucket_hour BETWEEN ? AND ?
+                AND h.sentiment_label <> ''
+            GROUP BY {sql.to_date('h.bucket_hour')}, h.sentiment_label
             ORDER BY date
             """
-            cursor.execute(query, (coin, start_date, end_date))
+            params = (*coin_ids, start_date, end_date)
         
-        rows = cursor.fetchall()
-        print(f"\nQuery returned {len(rows)} rows")
+        df = db_manager.read_sql(query, params)
+        logger.debug("Sentiment query returned %d rows", len(df))
         
-        dates = []
-        sentiment_data = {
-            'Positive': [],
-            'Neutral': [],
-            'Negative': []
-        }
-        
-        current_date = None
-        current_data = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
-        
-        for row in rows:
-            # The date is already a string in YYYY-MM-DD format from SQL Server
-            date = str(row[0])  # Convert to string in case it's not already
-            sentiment = row[1]
-            count = row[2]
-            
-            if date not in dates:
-                if current_date is not None:
-                    for sentiment_type in sentiment_data:
-                        sentiment_data[sentiment_type].append(current_data[sentiment_type])
-                
-                dates.append(date)
-                current_date = date
-                current_data = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
-            
-            if sentiment in current_data:
-                current_data[sentiment] = count
-        
-        if current_date is not None:
-            for sentiment_type in sentiment_data:
-                sentiment_data[sentiment_type].append(current_data[sentiment_type])
+        # One pivot of the date x label rows
+        dates, sentiment_data = responses.daily_sentiment(df, ['Positive', 'Neutral', 'Negative'])
         
         response_data = {
             'dates': dates,
@@ -214,44 +524,49 @@ def get_sentiment_data(coin):
             }
         }
         
-        print(f"Returning data structure with {len(dates)} dates")
-        return jsonify(response_data)
+        logger.debug("Returning sentiment data with %d dates", len(dates))
+        columns = {'dates': np.array(dates, dtype='datetime64[D]')}
+        columns.update({label: np.array(counts, dtype=np.int64) for label, counts in sentiment_data.items()})
+        return series_response(columns, {'colors': response_data['colors']}, lambda: response_data)
         
     except Exception as e:
-        print(f"Error in get_sentiment_data: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Error in get_sentiment_data: %s", e)
         return jsonify({'error': str(e)}), 500
-        
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+def build_mentions(timerange):
+    """Mention counts per coin for each timeframe"""
+    df = db_manager.get_mentions_data(timerange)
+    
+    # Process data for each timeframe
+    hour_df = df[df['timeframe'] == 'hour']
+    day_df = df[df['timeframe'] == 'day']
+    week_df = df[df['timeframe'] == 'week']
+    month_df = df[df['timeframe'] == 'month']
+    
+    return {
+        'hour_labels': hour_df['coin'].tolist(),
+        'hour_values': hour_df['mentions'].tolist(),
+        'day_labels': day_df['coin'].tolist(),
+        'day_values': day_df['mentions'].tolist(),
+        'week_labels': week_df['coin'].tolist(),
+        'week_values': week_df['mentions'].tolist(),
+        'month_labels': month_df['coin'].tolist(),
+        'month_values': month_df['mentions'].tolist()
+    }
 
 @app.route('/api/mentions')
+@conditional('chat_data', 'Coins', granularity=3600)
 def get_mentions_data():
     timerange = request.args.get('timerange', '24h')
     
     try:
-        df = db_manager.get_mentions_data(timerange)
-        
-        # Process data for each timeframe
-        hour_df = df[df['timeframe'] == 'hour']
-        day_df = df[df['timeframe'] == 'day']
-        week_df = df[df['timeframe'] == 'week']
-        month_df = df[df['timeframe'] == 'month']
-        
-        return jsonify({
-            'hour_labels': hour_df['coin'].tolist(),
-            'hour_values': hour_df['mentions'].tolist(),
-            'day_labels': day_df['coin'].tolist(),
-            'day_values': day_df['mentions'].tolist(),
-            'week_labels': week_df['coin'].tolist(),
-            'week_values': week_df['mentions'].tolist(),
-            'month_labels': month_df['coin'].tolist(),
-            'month_values': month_df['mentions'].tolist()
-        })
+        result = response_cache.get_or_compute(
+            'mentions', {'timerange': timerange}, lambda: build_mentions(timerange)
+        )
+        return jsonify(result)
         
     except Exception as e:
-        print(f"Error in get_mentions_data: {str(e)}")
+        logger.error("Error in get_mentions_data: %s", e)
         return jsonify({
             'hour_labels': [], 'hour_values': [],
             'day_labels': [], 'day_values': [],
@@ -260,9 +575,13 @@ def get_mentions_data():
         })
 
 @app.route('/api/coin_details/<coin>')
+@conditional('coin_price', 'chat_data', 'Coins', granularity=60)
 def get_coin_details(coin):
     price_data, sentiment_data = db_manager.get_coin_details(coin)
-    
+    return jsonify(coin_details_payload(price_data, sentiment_data))
+
+def coin_details_payload(price_data, sentiment_data):
+    """JSON structure of /api/coin_details from the latest price row and sentiment rows"""
     # Convert price_data tuple to dictionary
     price_dict = None
     if price_data:
@@ -282,12 +601,46 @@ def get_coin_details(coin):
                 'avg_score': float(row[2]) if row[2] else None
             })
     
-    return jsonify({
+    return {
         'price_data': price_dict,
         'sentiment_data': sentiment_list
-    })
+    }
+
+def label_sentiment_counts(df, count_col):
+    """Attach symbols to per-coin_id sentiment counts and add each label's percentage of its coin.
+
+    Rows come back ordered by symbol and label; unscored rows ('' label) get None.
+    """
+    df['symbol'] = db_manager.coins.symbols_for(df['coin_id'])
+    df['sentiment_label'] = df['sentiment_label'].replace('', None)
+    df = df.groupby(['symbol', 'sentiment_label'], dropna=False, as_index=False)[count_col].sum()
+    df = df.dropna(subset=['symbol'])
+    df['percentage'] = df[count_col] * 100.0 / df.groupby('symbol')[count_col].transform('sum')
+    return df.sort_values(['symbol', 'sentiment_label'], na_position='first', ignore_index=True)
+
+def build_mentions_chart(days):
+    """Sentiment distribution per coin over the last `days` days, in symbol order"""
+    # Use parameterized query with the backend's date functions
+    sql = db_manager.sql
+    query = f"""
+    SELECT 
+        h.coin_id,
+        h.sentiment_label,
+        SUM(h.mention_count) as mentions
+    FROM {db_manager.chat_rollup.source_sql()} h
+    WHERE h.bucket_hour >= {sql.to_hour(sql.date_add('day', '?', sql.now()))}
+    GROUP BY h.coin_id, h.sentiment_label
+    """
+
+    # Execute query with days parameter
+    df = db_manager.read_sql(query, (-days,))
+    df = label_sentiment_counts(df, 'mentions')
+    
+    # Per-coin totals and label counts in one pivot, plus the arrays the sort modes use
+    return responses.mentions_chart(df) if not df.empty else {}
 
 @app.route('/api/mentions_chart')
+@conditional('chat_data', 'Coins', granularity=3600)
 def get_mentions_chart_data():
     timerange = request.args.get('timerange', '7d')
     sort_by = request.args.get('sort_by', 'total')
@@ -299,82 +652,58 @@ def get_mentions_chart_data():
             '90d': 90
         }.get(timerange, 7)
 
-        # Use parameterized query with proper SQL Server syntax
-        query = """
-        WITH SentimentCounts AS (
-            SELECT 
-                c.symbol,
-                cd.sentiment_label,
-                COUNT(*) as mentions
-            FROM chat_data cd
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE cd.timestamp >= DATEADD(day, ?, GETDATE())
-            GROUP BY c.symbol, cd.sentiment_label
+        chart = response_cache.get_or_compute(
+            'mentions_chart', {'timerange': timerange}, lambda: build_mentions_chart(days)
         )
-        SELECT 
-            symbol,
-            sentiment_label,
-            mentions,
-            CAST(mentions AS FLOAT) * 100.0 / SUM(mentions) OVER (PARTITION BY symbol) as percentage
-        FROM SentimentCounts
-        ORDER BY symbol, sentiment_label
-        """
-
-        # Execute query with days parameter
-        df = pd.read_sql_query(query, db_manager.get_engine(), params=(-days,))
-        
-        # Process data for each coin
-        result = {'coins': []}
-        
-        for symbol in df['symbol'].unique():
-            coin_data = df[df['symbol'] == symbol]
-            total_mentions = int(coin_data['mentions'].sum())
-            
-            # Calculate sentiment distribution
-            distribution = {
-                'Positive': 0,
-                'Neutral': 0,
-                'Negative': 0,
-                'Very Positive': 0,
-                'Very Negative': 0
-            }
-            
-            # Update distribution with actual values
-            for _, row in coin_data.iterrows():
-                sentiment = row['sentiment_label']
-                if sentiment in distribution:
-                    distribution[sentiment] = int(row['mentions'])
-            
-            result['coins'].append({
-                'symbol': symbol,
-                'total_mentions': total_mentions,
-                'sentiment_distribution': distribution
-            })
         
         # Sort the coins based on the sort_by parameter
-        result['coins'].sort(key=lambda x: (
-            -x['total_mentions'] if sort_by == 'total' else
-            -(x['sentiment_distribution']['Positive'] / x['total_mentions'] * 100 if x['total_mentions'] > 0 else 0) if sort_by == 'positive' else
-            -(x['sentiment_distribution']['Negative'] / x['total_mentions'] * 100 if x['total_mentions'] > 0 else 0) if sort_by == 'negative' else
-            x['symbol']  # sort by name
-        ))
+        result = {'coins': responses.sort_mentions_chart(chart, sort_by) if chart else []}
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"Error in get_mentions_chart_data: {str(e)}")
+        logger.error("Error in get_mentions_chart_data: %s", e)
         return jsonify({
             'error': str(e),
             'coins': []
         })
 
 @app.route('/api/coin_names')
+@conditional('Coins')
 def get_coin_names():
     """Get dictionary of coin symbols and their CoinGecko names"""
-    coin_names = db_manager.get_coin_names()
+    coin_names = response_cache.get_or_compute('coin_names', {}, db_manager.get_coin_names)
     return jsonify(coin_names)
 
+SENTIMENT_CHART_COLORS = {
+    'Positive': '#00ff00',
+    'Very Positive': '#008000',
+    'Neutral': '#808080',
+    'Negative': '#ff0000',
+    'Very Negative': '#800000'
+}
+
+def sentiment_pivot(df):
+    """Date x sentiment_label counts of a get_sentiment_data frame"""
+    return df.pivot(
+        index='date',
+        columns='sentiment_label',
+        values='count'
+    ).fillna(0)
+
+def sentiment_chart_payload(sentiment_over_time):
+    """JSON structure of /api/sentiment_charts from a sentiment_pivot"""
+    return {
+        'dates': sentiment_over_time.index.strftime('%Y-%m-%d').tolist(),
+        'sentiment_data': {
+            label: sentiment_over_time[label].astype(int).tolist()
+            for label in sentiment_over_time.columns
+        },
+        'colors': SENTIMENT_CHART_COLORS
+    }
+
 @app.route('/api/sentiment_charts/<coin>')
+@conditional('chat_data', 'Coins', granularity=3600)
 def get_sentiment_charts(coin):
     """Get sentiment chart data for a specific coin"""
     try:
@@ -389,32 +718,19 @@ def get_sentiment_charts(coin):
             })
         
         # Group by date and sentiment
-        sentiment_over_time = df.pivot(
-            index='date',
-            columns='sentiment_label',
-            values='count'
-        ).fillna(0)
+        sentiment_over_time = sentiment_pivot(df)
+        colors = SENTIMENT_CHART_COLORS
+        columns = {'dates': sentiment_over_time.index.to_numpy(dtype='datetime64[D]')}
+        columns.update({
+            label: sentiment_over_time[label].to_numpy(dtype=np.int64)
+            for label in sentiment_over_time.columns
+        })
         
         # Convert to format suitable for Plotly
-        chart_data = {
-            'dates': sentiment_over_time.index.strftime('%Y-%m-%d').tolist(),
-            'sentiment_data': {
-                label: sentiment_over_time[label].astype(int).tolist()
-                for label in sentiment_over_time.columns
-            },
-            'colors': {
-                'Positive': '#00ff00',
-                'Very Positive': '#008000',
-                'Neutral': '#808080',
-                'Negative': '#ff0000',
-                'Very Negative': '#800000'
-            }
-        }
-        
-        return jsonify(chart_data)
+        return series_response(columns, {'colors': colors}, lambda: sentiment_chart_payload(sentiment_over_time))
         
     except Exception as e:
-        print(f"Error in get_sentiment_charts: {str(e)}")
+        logger.error("Error in get_sentiment_charts: %s", e)
         return jsonify({
             'error': str(e),
             'dates': [],
@@ -422,7 +738,30 @@ def get_sentiment_charts(coin):
             'colors': {}
         })
 
+def sentiment_counts(days):
+    """Symbol-sorted (symbol, sentiment_label, mention_count, percentage) rows over the last `days` days"""
+    sql = db_manager.sql
+    query = f"""
+    SELECT 
+        h.coin_id,
+        h.sentiment_label,
+        SUM(h.mention_count) as mention_count
+    FROM {db_manager.chat_rollup.source_sql()} h
+    WHERE h.bucket_hour >= {sql.to_hour(sql.date_add('day', '?', sql.now()))}
+    GROUP BY h.coin_id, h.sentiment_label
+    """
+    
+    # Execute query with days parameter
+    df = db_manager.read_sql(query, (-days,))
+    return label_sentiment_counts(df, 'mention_count')
+
+def build_sentiment_distribution(days):
+    """Sentiment counts and percentages per coin over the last `days` days"""
+    # Convert DataFrame to dictionary structure
+    return responses.sentiment_distribution(sentiment_counts(days))
+
 @app.route('/api/sentiment_distribution')
+@conditional('chat_data', 'Coins', granularity=3600)
 def get_sentiment_distribution():
     timerange = request.args.get('timerange', '7d')
     try:
@@ -433,107 +772,395 @@ def get_sentiment_distribution():
             '90d': 90
         }.get(timerange, 7)
 
-        query = """
-        WITH SentimentCounts AS (
-            SELECT 
-                c.symbol,
-                cd.sentiment_label,
-                COUNT(*) as mention_count
-            FROM chat_data cd
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE cd.timestamp >= DATEADD(day, ?, GETDATE())
-            GROUP BY c.symbol, cd.sentiment_label
+        result = response_cache.get_or_compute(
+            'sentiment_distribution', {'timerange': timerange}, lambda: build_sentiment_distribution(days)
         )
-        SELECT 
-            symbol,
-            sentiment_label,
-            mention_count,
-            CAST(mention_count AS FLOAT) * 100.0 / SUM(mention_count) OVER (PARTITION BY symbol) as percentage
-        FROM SentimentCounts
-        ORDER BY symbol, sentiment_label
-        """
-        
-        # Execute query with days parameter
-        df = pd.read_sql_query(query, db_manager.get_engine(), params=(-days,))
-        
-        # Convert DataFrame to dictionary structure
-        result = {}
-        for symbol in df['symbol'].unique():
-            symbol_data = df[df['symbol'] == symbol]
-            total = int(symbol_data['mention_count'].sum())
-            
-            distribution = {}
-            for _, row in symbol_data.iterrows():
-                distribution[str(row['sentiment_label'])] = {
-                    'count': int(row['mention_count']),
-                    'percentage': float(row['percentage'])
-                }
-            
-            result[symbol] = {
-                'total': total,
-                'distribution': distribution
-            }
         
         return jsonify(result)
         
     except Exception as e:
-        print(f"Error in get_sentiment_distribution: {str(e)}")
+        logger.error("Error in get_sentiment_distribution: %s", e)
         return jsonify({})
 
+@app.route('/api/correlation')
+@conditional('chat_data', 'Price_Data', 'Coins', granularity=3600)
+def get_correlation():
+    """Rolling and lagged correlation of hourly net sentiment with hourly returns, all coins at once.
+
+    ?timerange= (default 90d), ?window= hours of the rolling correlation,
+    ?max_lag= hours tried each way, ?coins=BTC,ETH to restrict the coin axis.
+    Matrices are cached per window; ?format=columnar sends them as flat typed arrays.
+    """
+    timerange = request.args.get('timerange', '90d')
+    window = request.args.get('window', CORRELATION_DEFAULT_WINDOW, type=int)
+    max_lag = request.args.get('max_lag', CORRELATION_DEFAULT_MAX_LAG, type=int)
+    if not 2 <= window <= CORRELATION_MAX_WINDOW:
+        return jsonify({'error': f"window must be between 2 and {CORRELATION_MAX_WINDOW} hours"}), 400
+    if not 0 <= max_lag <= CORRELATION_MAX_LAG:
+        return jsonify({'error': f"max_lag must be between 0 and {CORRELATION_MAX_LAG} hours"}), 400
+    coins = request.args.get('coins')
+    coins = sorted({coin.strip() for coin in coins.split(',') if coin.strip()}) if coins else None
+
+    try:
+        # One matrix per timerange, window, lag range and coin selection
+        result = response_cache.get_or_compute(
+            'correlation',
+            {'timerange': timerange, 'window': window, 'max_lag': max_lag, 'coins': ','.join(coins or [])},
+            lambda: db_manager.correlation.compute(timerange_start(timerange), window, max_lag, coins)
+        )
+    except Exception as e:
+        logger.error("Error computing correlations: %s", e)
+        result = None
+    if not result:
+        return jsonify({'hours': [], 'coins': [], 'rolling': [], 'lags': [], 'lagged': []})
+
+    columns = {
+        'hours': result['hours'],
+        'rolling': result['rolling'].ravel(),
+        'lags': result['lags'],
+        'lagged': result['lagged'].ravel(),
+        'best_lag': result['best_lag'],
+        'best_correlation': result['best_correlation'],
+        'samples': result['samples']
+    }
+    # 2-D arrays travel row-major (hour or lag first) in the binary formats
+    meta = {'coins': result['coins'], 'window': window, 'rolling_shape': list(result['rolling'].shape),
+            'lagged_shape': list(result['lagged'].shape)}
+    return series_response(columns, meta, lambda: correlation_payload(result, window))
+
+def nullable(values, decimals=4):
+    """Array as nested lists, rounded, with NaN as None"""
+    values = np.round(np.asarray(values, dtype=float), decimals)
+    listed = values.astype(object)
+    listed[np.isnan(values)] = None
+    return listed.tolist()
+
+def correlation_payload(result, window):
+    """JSON structure of /api/correlation; rolling is [hour][coin] and lagged [lag][coin]"""
+    return {
+        'hours': format_timestamps(result['hours']),
+        'coins': result['coins'],
+        'window': window,
+        'rolling': nullable(result['rolling']),
+        'lags': result['lags'].tolist(),
+        'lagged': nullable(result['lagged']),
+        'best_lag': [None if lag is None else int(lag) for lag in nullable(result['best_lag'], 0)],
+        'best_correlation': nullable(result['best_correlation']),
+        'samples': result['samples'].tolist()
+    }
+
+# Columns of /api/predictions and whether they are numeric (Decimal from pyodbc)
+PREDICTION_COLUMNS = [
+    ('PredictionDate', False), ('Symbol', False),
+    ('Price When Predicted', True), ('Price Now', True),
+    ('Prediction 24h', True), ('Actual 24h', True),
+    ('Predicted 7d', True), ('Actual 7d', True),
+    ('Pred 30d', True), ('Actual 30d', True),
+    ('Pred 90d', True), ('Actual 90d', True),
+    ('Sentiment', False), ('Confidence', True), ('Accuracy', True)
+]
+
+def build_predictions_query(day=None, after=None, limit=None):
+    """Predictions newest first, optionally for one day and after a (prediction_date, prediction_id) key"""
+    sql = db_manager.sql
+    # Same rows as the old INNER JOIN Coins: predictions of removed coins are left out
+    conditions = ["p.coin_id IN (SELECT coin_id FROM Coins)"]
+    params = []
+    if day:
+        conditions.append("p.prediction_date >= ? AND p.prediction_date < ?")
+        params += [format_sql_datetime(day), format_sql_datetime(day + timedelta(days=1))]
+    if after:
+        after_date, after_id = after
+        conditions.append("(p.prediction_date < ? OR (p.prediction_date = ? AND p.prediction_id < ?))")
+        params += [format_sql_datetime(after_date), format_sql_datetime(after_date), after_id]
+    where = f"WHERE {' AND '.join(conditions)}"
+    
+    # Actual prices and errors are stored by the prediction resolver job;
+    # "Price Now" is one TOP 1 seek per row on IX_Price_Data_coin_price_date
+    query = f"""
+        SELECT {sql.top(limit) if limit else ''}
+            p.prediction_date as PredictionDate,
+            p.coin_id as Symbol,
+            p.current_price as [Price When Predicted],
+            (
+                SELECT {sql.top(1)} pd.price_usd FROM Price_Data pd
+                WHERE pd.coin_id = p.coin_id
+                ORDER BY pd.price_date DESC
+                {sql.limit(1)}
+            ) as [Price Now],
+            p.prediction_24h as [Prediction 24h],
+            p.actual_price_24h as [Actual 24h],
+            p.prediction_7d as [Predicted 7d],
+            p.actual_price_7d as [Actual 7d],
+            p.prediction_30d as [Pred 30d],
+            p.actual_price_30d as [Actual 30d],
+            p.prediction_90d as [Pred 90d],
+            p.actual_price_90d as [Actual 90d],
+            p.market_conditions as Sentiment,
+            p.confidence_score as Confidence,
+            p.accuracy_score as Accuracy,
+            p.prediction_id
+        FROM predictions p
+        {where}
+        ORDER BY p.prediction_date DESC, p.prediction_id DESC
+        {sql.limit(limit) if limit else ''}
+    """
+    return query, params
+
+def prediction_row_to_dict(row):
+    """Convert a predictions row to a JSON-ready dict (Decimal to float, coin_id to symbol)"""
+    result = {
+        name: float(value) if numeric and value is not None else value
+        for (name, numeric), value in zip(PREDICTION_COLUMNS, row)
+    }
+    result['Symbol'] = db_manager.coins.symbol(row[1])
+    return result
+
+def encode_cursor(date, row_id):
+    """Keyset cursor continuing after the (date, id) of the last row of a page"""
+    return f"{to_iso(date)}_{row_id}"
+
+def decode_cursor(token):
+    date_part, id_part = token.rsplit('_', 1)
+    return datetime.fromisoformat(date_part), int(id_part)
+
 @app.route('/api/predictions')
+@conditional('predictions', 'prediction_resolver', 'Price_Data', 'Coins')
 def get_predictions():
+    """Predictions newest first.
+
+    ?date=YYYY-MM-DD limits to one day, ?limit= sets the page size and
+    ?cursor= (next_cursor of the previous page) continues after it.
+    format=ndjson (or Accept: application/x-ndjson) streams one row per line.
+    """
+    stream = (request.args.get('format') == 'ndjson'
+              or 'application/x-ndjson' in request.headers.get('Accept', ''))
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        date_filter = request.args.get('date', '')
+        cursor_token = request.args.get('cursor')
+        try:
+            day = datetime.strptime(date_filter, '%Y-%m-%d') if date_filter else None
+            after = decode_cursor(cursor_token) if cursor_token else None
+            limit = request.args.get('limit', type=int)
+        except ValueError as e:
+            return jsonify({'error': f'Invalid parameter: {e}'}), 400
+        if limit is not None and limit < 1:
+            return jsonify({'error': 'limit must be positive'}), 400
         
-        # Print column names for debugging
-        cursor.execute("SELECT TOP 1 * FROM vw_predictions")
-        columns = [column[0] for column in cursor.description]
-        print("Column names:", columns)
+        if stream:
+            return stream_predictions(day, after, limit)
         
-        cursor.execute("""
-            SELECT 
-                PredictionDate,
-                Symbol,
-                [Price When Predicted],
-                [Price Now],
-                [Prediction 24h],
-                [Actual 24h],
-                [Predicted 7d],
-                [Actual 7d],
-                [Pred 30d],
-                [Actual 30d],
-                [Pred 90d],
-                [Actual 90d],
-                Sentiment,
-                Confidence,
-                Accuracy
-            FROM vw_predictions
-            ORDER BY PredictionDate DESC
-        """)
+        limit = min(limit or PREDICTIONS_PAGE_SIZE, PREDICTIONS_MAX_PAGE_SIZE)
         
-        # Get column names from the cursor
-        columns = [column[0] for column in cursor.description]
+        # Fetch one extra row to know whether another page follows
+        query, params = build_predictions_query(day, after, limit + 1)
+        rows = db_manager.fetch_all(query, params)
         
-        predictions = []
-        for row in cursor.fetchall():
-            # Convert row to dict with correct column names
-            prediction = {}
-            for i, value in enumerate(row):
-                # Convert Decimal to float for JSON serialization
-                if isinstance(value, decimal.Decimal):
-                    prediction[columns[i]] = float(value)
-                else:
-                    prediction[columns[i]] = value
-            predictions.append(prediction)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][-1])
         
-        return jsonify({'predictions': predictions})
+        return jsonify({
+            'predictions': [prediction_row_to_dict(row) for row in rows],
+            'next_cursor': next_cursor
+        })
         
     except Exception as e:
-        print(f"Error in get_predictions: {str(e)}")
+        logger.error("Error in get_predictions: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+def stream_predictions(day, after, limit):
+    """Stream predictions as NDJSON from a fetchmany loop so memory stays flat"""
+    query, params = build_predictions_query(day, after, limit)
+    conn = db_manager.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+    except Exception:
+        conn.close()
+        raise
+    
+    def generate():
+        while True:
+            rows = cursor.fetchmany(PREDICTIONS_FETCH_SIZE)
+            if not rows:
+                break
+            yield ''.join(app.json.dumps(prediction_row_to_dict(row)) + '\n' for row in rows)
+    
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Runs when the server closes the response, even if the client left before the first chunk
+    response.call_on_close(conn.close)
+    return response
+
+@app.route('/api/model_leaderboard')
+@conditional('prediction_resolver', 'Coins')
+def get_model_leaderboard():
+    """Prediction models ranked by accuracy; ?coin=, ?horizon=24h|7d|30d|90d, ?per_coin=true"""
+    coin = request.args.get('coin')
+    horizon = request.args.get('horizon')
+    per_coin = request.args.get('per_coin', 'false').lower() == 'true'
+    if horizon is not None and horizon not in HORIZON_NAMES:
+        return jsonify({'error': f"horizon must be one of {', '.join(HORIZON_NAMES)}"}), 400
+
+    try:
+        coin_ids = db_manager.coins.coin_ids(coin) if coin and coin != 'All' else None
+        if coin_ids == []:
+            return jsonify([])
+        rows = db_manager.model_evaluator.leaderboard(coin_ids, horizon, per_coin)
+        for row in rows:
+            if 'coin_id' in row:
+                row['coin'] = db_manager.coins.symbol(row['coin_id'])
+        return jsonify(rows)
+    except Exception as e:
+        logger.error("Error building model leaderboard: %s", e)
+        return jsonify([])
+
+# Views of /api/batch: name -> builder taking the list of coins and the request options
+def batch_price(coins, options):
+    frames = db_manager.get_price_data_batch(coins, timerange_start(options['timerange']))
+    return {
+        symbol: price_payload(build_price_series(
+            symbol, None, options['max_points'], options['downsample'], df=df
+        ))
+        for symbol, df in frames.items()
+    }
+
+def batch_coin_details(coins, options):
+    return {
+        symbol: coin_details_payload(price_data, sentiment_data)
+        for symbol, (price_data, sentiment_data) in db_manager.get_coin_details_batch(coins).items()
+    }
+
+def batch_sentiment_charts(coins, options):
+    return {
+        symbol: sentiment_chart_payload(sentiment_pivot(df))
+        for symbol, df in db_manager.get_sentiment_data_batch(coins).items()
+    }
+
+BATCH_VIEWS = {
+    'price': batch_price,
+    'coin_details': batch_coin_details,
+    'sentiment_charts': batch_sentiment_charts
+}
+
+@app.route('/api/batch', methods=['GET', 'POST'])
+@conditional('Price_Data', 'chat_data', 'Coins', granularity=60)
+def get_batch():
+    """Several views for several coins in one round trip.
+
+    ?coins=BTC,ETH&views=price,coin_details,sentiment_charts (or the same keys in
+    a JSON body). Each view runs one set-based query for all coins; with
+    parallel=1 the views run concurrently on separate pooled connections.
+    Price options timerange, max_points and downsample work as on /api/price.
+    Answers {'coins': {symbol: {view: payload}}}.
+    """
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({'error': "The JSON body must be an object"}), 400
+    def listed(name, default):
+        """Comma-separated string or list of strings; None when it is neither"""
+        value = body.get(name, request.args.get(name, default))
+        if isinstance(value, str):
+            value = value.split(',')
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return None
+        return list(dict.fromkeys(item.strip() for item in value if item.strip()))
+    
+    coins = listed('coins', '')
+    views = listed('views', ','.join(BATCH_VIEWS))
+    if coins is None or views is None:
+        return jsonify({'error': "coins and views must be comma-separated strings or lists of strings"}), 400
+    unknown = [view for view in views if view not in BATCH_VIEWS]
+    if not coins or unknown:
+        return jsonify({'error': f"coins is required and views must be among {', '.join(BATCH_VIEWS)}"}), 400
+    if len(coins) > BATCH_MAX_COINS:
+        return jsonify({'error': f"At most {BATCH_MAX_COINS} coins per batch"}), 400
+    
+    max_points = body.get('max_points', request.args.get('max_points', type=int))
+    if max_points is not None and (isinstance(max_points, bool) or not isinstance(max_points, int)):
+        return jsonify({'error': "max_points must be an integer"}), 400
+    options = {
+        'timerange': body.get('timerange', request.args.get('timerange', '24h')),
+        'max_points': min(max(max_points, PRICE_MIN_POINTS), PRICE_MAX_POINTS) if max_points else None,
+        'downsample': body.get('downsample', request.args.get('downsample', 'minmax'))
+    }
+    if not isinstance(options['timerange'], str):
+        return jsonify({'error': "timerange must be a string"}), 400
+    if not isinstance(options['downsample'], str) or options['downsample'] not in DOWNSAMPLE_METHODS:
+        return jsonify({'error': f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+    parallel = str(body.get('parallel', request.args.get('parallel', BATCH_PARALLEL))).lower() in ('1', 'true')
+    
+    try:
+        if parallel and len(views) > 1:
+            with ThreadPoolExecutor(max_workers=len(views)) as executor:
+                futures = {view: executor.submit(BATCH_VIEWS[view], coins, options) for view in views}
+                results = {view: future.result() for view, future in futures.items()}
+        else:
+            results = {view: BATCH_VIEWS[view](coins, options) for view in views}
+    except Exception as e:
+        logger.error("Error in get_batch: %s", e)
+        return jsonify({'error': str(e)}), 500
+    
+    return jsonify({
+        'coins': {
+            coin: {view: results[view].get(coin) for view in views}
+            for coin in coins
+        }
+    })
+
+# Views of /api/chart: name -> (watermark sources, time bucket seconds, loader taking coin and timerange)
+CHART_VIEWS = {
+    'price': (
+        ('coin_price',), 60,
+        lambda coin, timerange: db_manager.get_price_data(coin, timerange_start(timerange))
+    ),
+    'sentiment': (
+        ('chat_data', 'Coins'), 3600,
+        lambda coin, timerange: db_manager.get_sentiment_data(coin)
+    ),
+    'mentions': (
+        ('chat_data', 'Coins'), 3600,
+        lambda coin, timerange: sentiment_counts({'24h': 1, '7d': 7, '30d': 30, '90d': 90}.get(timerange, 7))
+    )
+}
+
+@app.route('/api/chart/<view>')
+def get_chart_image(view):
+    """PNG/SVG snapshot of a chart: ?coin= (price, sentiment), ?format=png|svg, ?timerange="""
+    if view not in CHART_VIEWS:
+        return jsonify({'error': f"view must be one of {', '.join(CHART_VIEWS)}"}), 404
+    fmt = request.args.get('format', 'png')
+    if fmt not in CHART_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(CHART_FORMATS)}"}), 400
+    coin = request.args.get('coin') if view != 'mentions' else None
+    if view != 'mentions' and not coin:
+        return jsonify({'error': 'coin is required'}), 400
+    timerange = request.args.get('timerange', '24h' if view == 'price' else '7d')
+    sources, granularity, load = CHART_VIEWS[view]
+    
+    try:
+        marks = db_manager.watermarks.lookup(sources, coin)
+        key = (view, coin, fmt, timerange, tuple(marks), int(time.time() // granularity))
+        image = chart_renderer.get_or_render(key, view, lambda: load(coin, timerange), coin or 'All', fmt)
+    except Exception as e:
+        logger.exception("Error rendering %s chart", view)
         return jsonify({'error': str(e)}), 500
+    
+    if image is None:
+        return jsonify({'error': 'No data available'}), 404
+    response = Response(image, mimetype=CHART_FORMATS[fmt])
+    response.set_etag(hashlib.sha1(repr(key).encode('utf-8')).hexdigest(), weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/chart/stats')
+def get_chart_stats():
+    """Get chart image cache and renderer counters"""
+    return jsonify(chart_renderer.stats())
 
 @app.route('/api/data_loads')
+@conditional('chat_data', 'chat_source', 'Coins', granularity=3600)
 def get_data_loads():
     try:
         # Get query parameters with defaults
@@ -541,22 +1168,19 @@ def get_data_loads():
         source = request.args.get('source', 'all')
         coin = request.args.get('coin', 'all')
 
-        print(f"Received request with params - hours: {hours}, source: {source}, coin: {coin}")
+        logger.debug("Data loads request - hours: %s, source: %s, coin: %s", hours, source, coin)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Base query using chat_data table
-        query = """
+        # Base query using the hourly chat_data rollup, so loads are reported per hour
+        sql = db_manager.sql
+        query = f"""
             SELECT 
-                cd.timestamp as LoadDate,
+                h.bucket_hour as LoadDate,
                 cs.source_name as ChatSource,
-                c.symbol as Symbol,
-                COUNT(*) as RecordsLoaded
-            FROM chat_data cd
-            JOIN chat_source cs ON cd.source_id = cs.source_id
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE cd.timestamp >= DATEADD(HOUR, -?, GETDATE())
+                h.coin_id,
+                SUM(h.mention_count) as RecordsLoaded
+            FROM {db_manager.chat_rollup.source_sql()} h
+            JOIN chat_source cs ON h.source_id = cs.source_id
+            WHERE h.bucket_hour >= {sql.to_hour(sql.date_add('hour', '-?', sql.now()))}
         """
         params = [int(hours)]
 
@@ -567,65 +1191,168 @@ def get_data_loads():
 
         # Add coin filter if specified
         if coin.lower() != 'all':
-            query += " AND c.symbol = ?"
-            params.append(coin)
+            coin_ids = db_manager.coins.coin_ids(coin)
+            query += f" AND {id_filter('h.coin_id', coin_ids)}"
+            params.extend(coin_ids)
 
         # Add grouping
         query += """
-            GROUP BY cd.timestamp, cs.source_name, c.symbol
-            ORDER BY cd.timestamp DESC
+            GROUP BY h.bucket_hour, cs.source_name, h.coin_id
+            ORDER BY h.bucket_hour DESC
         """
 
-        print(f"Executing query: {query}")
-        print(f"With parameters: {params}")
 
-        # Execute query
-        cursor.execute(query, params)
-        
-        # Fetch results
-        rows = cursor.fetchall()
-        print(f"Found {len(rows)} rows")
+        # Execute query and fetch results
+        rows = db_manager.fetch_all(query, params)
+        logger.debug("Found %d data load rows", len(rows))
         
-        # Convert to list of dicts
-        results = []
-        for row in rows:
-            results.append({
-                'LoadDate': row[0].isoformat() if row[0] else None,
-                'ChatSource': row[1],
-                'Symbol': row[2],
-                'RecordsLoaded': row[3]
-            })
+        # Convert to list of dicts, labelling coin_ids with their symbols
+        results = {}
+        for load_date, chat_source, coin_id, records in rows:
+            symbol = db_manager.coins.symbol(coin_id)
+            if symbol is None:
+                continue
+            key = (load_date, chat_source, symbol)
+            if key in results:
+                results[key]['RecordsLoaded'] += records
+            else:
+                results[key] = {
+                    'LoadDate': to_iso(load_date) if load_date else None,
+                    'ChatSource': chat_source,
+                    'Symbol': symbol,
+                    'RecordsLoaded': records
+                }
 
-        return jsonify(results)
+        return jsonify(list(results.values()))
 
     except Exception as e:
-        print(f"Error in get_data_loads: {str(e)}")
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("Error in get_data_loads: %s", e)
         return jsonify({'error': str(e)}), 500
 
-    finally:
-        if 'conn' in locals():
-            conn.close()
+@app.route('/api/search')
+def search_chat():
+    """Chat messages matching ?q= (all terms, a trailing * matches a prefix), newest first, with snippets.
+
+    Filters: ?coin=, ?source= (name), ?label= (sentiment_label), ?start=&end=
+    (ISO datetimes). ?limit= sets the page size and ?cursor= (next_cursor
+    of the previous page) continues after it. Served from the local index,
+    so messages newer than its last run are not found yet.
+    """
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        cursor_token = request.args.get('cursor')
+        start_time = datetime.fromisoformat(start) if start else None
+        end_time = datetime.fromisoformat(end) if end else None
+        after = decode_cursor(cursor_token) if cursor_token else None
+        limit = min(request.args.get('limit', SEARCH_PAGE_SIZE, type=int), SEARCH_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid parameter: {e}'}), 400
+    if limit < 1:
+        return jsonify({'error': 'limit must be positive'}), 400
+
+    try:
+        page = db_manager.search_index.search(
+            request.args.get('q', ''), request.args.get('coin'), request.args.get('source'),
+            request.args.get('label'), start_time, end_time, limit, after
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error("Error in search_chat: %s", e)
+        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'total': page['total'],
+        'results': page['results'],
+        'next_cursor': encode_cursor(*page['next']) if page['next'] else None,
+        'indexed_through': db_manager.search_index.stats()['last_chat_id']
+    })
+
+@app.route('/api/search/stats')
+def get_search_stats():
+    return jsonify(db_manager.search_index.stats())
 
 @app.route('/api/chat_sources')
+@conditional('chat_source')
 def get_chat_sources():
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
         # Get chat sources from the database
-        cursor.execute("SELECT source_name FROM chat_source ORDER BY source_name")
-        sources = [row[0] for row in cursor.fetchall()]
+        rows = db_manager.fetch_all("SELECT source_name FROM chat_source ORDER BY source_name")
+        sources = [row[0] for row in rows]
         
         return jsonify(sources)
         
     except Exception as e:
-        print(f"Error in get_chat_sources: {str(e)}")
+        logger.error("Error in get_chat_sources: %s", e)
         return jsonify([]), 500
-        
-    finally:
-        if 'conn' in locals():
-            conn.close()
+
+@app.route('/api/ready')
+def get_readiness():
+    """Readiness probe: the app is up; 503 while the database cannot be reached"""
+    database = db_manager.ping()
+    return jsonify({
+        'status': 'ready' if database['connected'] else 'unavailable',
+        'app': 'ok',
+        'database': database
+    }), 200 if database['connected'] else 503
+
+@app.route('/api/pool_stats')
+def get_pool_stats():
+    """Get connection pool occupancy and checkout wait counters"""
+    return jsonify(db_manager.get_pool_stats())
+
+@app.route('/metrics')
+def get_metrics():
+    """Latency histograms, query phases, pool and cache counters in Prometheus text format"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/query_stats')
+def get_query_stats():
+    """Get how many identical concurrent queries were coalesced"""
+    return jsonify(db_manager.get_query_stats())
+
+@app.route('/api/slow_queries')
+@signed_only
+def get_slow_queries():
+    """Get the slowest recent queries with their execution plans, newest first"""
+    limit = request.args.get('limit', type=int)
+    plans = request.args.get('plans', 'true').lower() != 'false'
+    return jsonify({
+        **db_manager.slow_queries.stats(),
+        'queries': db_manager.slow_queries.entries(limit, plans)
+    })
+
+@app.route('/api/slow_queries/dump', methods=['POST'])
+@signed_only
+def dump_slow_queries():
+    """Write the slow-query buffer to disk; ?clear=true empties it afterwards"""
+    try:
+        path, count = db_manager.slow_queries.dump()
+        if request.args.get('clear', 'false').lower() == 'true':
+            db_manager.slow_queries.clear()
+        return jsonify({'path': path, 'count': count})
+    except Exception as e:
+        logger.error("Error dumping slow queries: %s", e)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/cache/stats')
+def get_cache_stats():
+    """Get response cache hit/miss counters"""
+    return jsonify(response_cache.stats())
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+@signed_only
+def invalidate_cache():
+    """Drop cached responses; ingest jobs call this after writing new rows"""
+    table = request.args.get('table')
+    route = request.args.get('route')
+    if table:
+        removed = response_cache.invalidate_table(table)
+    else:
+        removed = response_cache.invalidate(route)
+    # New rows should change the ETags right away, not after WATERMARK_TTL
+    db_manager.watermarks.clear()
+    return jsonify({'invalidated': removed})
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    app.run(debug=True) 
@@ -0,0 +1,158 @@
+"""Microbenchmark of the mentions/sentiment response builders.
+
+Compares the per-symbol filter + iterrows builders that app.py used before
+with the single groupby/pivot builders in utils/responses.py, on synthetic
+data of 500 coins x 5 labels x 90 days, and checks both give the same JSON.
+
+    python -m benchmarks.bench_response_builders
+"""
+import argparse
+import timeit
+import numpy as np
+import pandas as pd
+from utils import responses
+
+LABELS = ['Very Negative', 'Negative', 'Neutral', 'Positive', 'Very Positive']
+
+
+def make_daily(coins, days, seed=42):
+    """(symbol, date, sentiment_label, count) for every coin x label x day"""
+    rng = np.random.default_rng(seed)
+    symbols = np.array([f"C{i:04d}" for i in range(coins)], dtype=object)
+    dates = pd.date_range('2026-01-01', periods=days, freq='D').strftime('%Y-%m-%d').to_numpy(dtype=object)
+    grid = pd.MultiIndex.from_product([symbols, dates, LABELS], names=['symbol', 'date', 'sentiment_label'])
+    return pd.DataFrame({'count': rng.integers(0, 500, len(grid))}, index=grid).reset_index()
+
+
+def per_coin_counts(daily, count_col):
+    """What the rollup query returns: counts per symbol and label, symbol-sorted, with percentages"""
+    df = daily.groupby(['symbol', 'sentiment_label'], as_index=False)['count'].sum()
+    df = df.rename(columns={'count': count_col})
+    df['percentage'] = df[count_col] * 100.0 / df.groupby('symbol')[count_col].transform('sum')
+    return df
+
+
+def per_day_counts(daily):
+    """What /api/sentiment/all reads: counts per date and label, date-sorted"""
+    return daily.groupby(['date', 'sentiment_label'], as_index=False)['count'].sum()
+
+
+# Previous builders, kept verbatim for comparison
+
+def legacy_mentions_chart(df, sort_by):
+    coins = []
+    for symbol in df['symbol'].unique():
+        coin_data = df[df['symbol'] == symbol]
+        total_mentions = int(coin_data['mentions'].sum())
+        distribution = {
+            'Positive': 0,
+            'Neutral': 0,
+            'Negative': 0,
+            'Very Positive': 0,
+            'Very Negative': 0
+        }
+        for _, row in coin_data.iterrows():
+            sentiment = row['sentiment_label']
+            if sentiment in distribution:
+                distribution[sentiment] = int(row['mentions'])
+        coins.append({
+            'symbol': symbol,
+            'total_mentions': total_mentions,
+            'sentiment_distribution': distribution
+        })
+    return sorted(coins, key=lambda x: (
+        -x['total_mentions'] if sort_by == 'total' else
+        -(x['sentiment_distribution']['Positive'] / x['total_mentions'] * 100 if x['total_mentions'] > 0 else 0) if sort_by == 'positive' else
+        -(x['sentiment_distribution']['Negative'] / x['total_mentions'] * 100 if x['total_mentions'] > 0 else 0) if sort_by == 'negative' else
+        x['symbol']
+    ))
+
+
+def legacy_sentiment_distribution(df):
+    result = {}
+    for symbol in df['symbol'].unique():
+        symbol_data = df[df['symbol'] == symbol]
+        total = int(symbol_data['mention_count'].sum())
+        distribution = {}
+        for _, row in symbol_data.iterrows():
+            distribution[str(row['sentiment_label'])] = {
+                'count': int(row['mention_count']),
+                'percentage': float(row['percentage'])
+            }
+        result[symbol] = {'total': total, 'distribution': distribution}
+    return result
+
+
+def legacy_daily_sentiment(rows):
+    dates = []
+    sentiment_data = {'Positive': [], 'Neutral': [], 'Negative': []}
+    current_date = None
+    current_data = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
+    for row in rows:
+        date = str(row[0])
+        sentiment = row[1]
+        count = row[2]
+        if date not in dates:
+            if current_date is not None:
+                for sentiment_type in sentiment_data:
+                    sentiment_data[sentiment_type].append(current_data[sentiment_type])
+            dates.append(date)
+            current_date = date
+            current_data = {'Positive': 0, 'Neutral': 0, 'Negative': 0}
+        if sentiment in current_data:
+            current_data[sentiment] = count
+    if current_date is not None:
+        for sentiment_type in sentiment_data:
+            sentiment_data[sentiment_type].append(current_data[sentiment_type])
+    return dates, sentiment_data
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mentions/sentiment response builders")
+    parser.add_argument('--coins', type=int, default=500)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    daily = make_daily(args.coins, args.days)
+    mentions = per_coin_counts(daily, 'mentions')
+    distribution = per_coin_counts(daily, 'mention_count')
+    by_day = per_day_counts(daily)
+    day_rows = list(by_day.itertuples(index=False, name=None))
+    print(f"{args.coins} coins x {len(LABELS)} labels x {args.days} days = {len(daily):,} rows")
+
+    cases = []
+    for sort_by in responses.MENTIONS_CHART_SORTS:
+        assert responses.sort_mentions_chart(responses.mentions_chart(mentions), sort_by) == legacy_mentions_chart(mentions, sort_by)
+        cases.append((
+            f"mentions_chart sort={sort_by}",
+            lambda s=sort_by: legacy_mentions_chart(mentions, s),
+            lambda s=sort_by: responses.sort_mentions_chart(responses.mentions_chart(mentions), s)
+        ))
+    assert responses.sentiment_distribution(distribution) == legacy_sentiment_distribution(distribution)
+    cases.append((
+        "sentiment_distribution",
+        lambda: legacy_sentiment_distribution(distribution),
+        lambda: responses.sentiment_distribution(distribution)
+    ))
+    labels = ['Positive', 'Neutral', 'Negative']
+    assert responses.daily_sentiment(by_day, labels) == legacy_daily_sentiment(day_rows)
+    cases.append((
+        "sentiment/<coin> (all coins)",
+        lambda: legacy_daily_sentiment(day_rows),
+        lambda: responses.daily_sentiment(by_day, labels)
+    ))
+
+    print(f"{'builder':<32}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for name, before, after in cases:
+        t_before = best_of(before, args.repeat) * 1000
+        t_after = best_of(after, args.repeat) * 1000
+        print(f"{name:<32}{t_before:>12.2f}{t_after:>12.2f}{t_before / t_after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
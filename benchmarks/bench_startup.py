@@ -0,0 +1,80 @@
+"""Startup benchmark: wall time of `import app` in a fresh interpreter.
+
+Each run starts a new Python process, so nothing is warm in sys.modules.
+It reports the median import time and any heavy module that got imported
+during startup. Those modules should load on first use, not at import.
+Exits non-zero past --max-seconds or when a heavy module is loaded, so
+the benchmark can guard CI against import-cost regressions.
+
+    python -m benchmarks.bench_startup --runs 5 --max-seconds 1.0
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by `import app`
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib', 'tkinter', 'sqlalchemy', 'pyodbc', 'pyarrow')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def run_once(extra_args=()):
+    result = subprocess.run(
+        [sys.executable, *extra_args, '-c', PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_imports(n):
+    """The n modules with the largest cumulative import time, from -X importtime"""
+    _, stderr = run_once(('-X', 'importtime'))
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:n]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None, help='fail when the median import is slower')
+    parser.add_argument('--top', type=int, default=10, help='list the slowest imports (0 to skip)')
+    args = parser.parse_args()
+
+    results = [run_once()[0] for _ in range(args.runs)]
+    seconds = [result['seconds'] for result in results]
+    loaded = sorted({module for result in results for module in result['loaded']})
+    median = statistics.median(seconds)
+    print(f"import app: median {median * 1000:.1f} ms, min {min(seconds) * 1000:.1f} ms "
+          f"over {args.runs} runs")
+    print(f"heavy modules imported at startup: {', '.join(loaded) or 'none'}")
+
+    if args.top:
+        print("slowest imports (cumulative):")
+        for cumulative, name in slowest_imports(args.top):
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = bool(loaded)
+    if args.max_seconds is not None and median > args.max_seconds:
+        print(f"FAIL: median {median:.3f}s exceeds {args.max_seconds:.3f}s")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
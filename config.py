@@ -9,6 +9,10 @@ BINANCE_API_KEY = os.getenv('BINANCE_API_KEY')
 BINANCE_SECRET_KEY = os.getenv('BINANCE_SECRET_KEY')
 
 # Database Configuration
+# 'mssql' for the SQL Server below, 'sqlite' for the local stand-in at SQLITE_PATH
+DB_BACKEND = os.getenv('DB_BACKEND', 'mssql')
+SQLITE_PATH = os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'CryptoAiDb.sqlite'))
+
 DB_SERVER = 'MICROBOX\\SQLEXPRESS'
 DB_NAME = 'CryptoAiDb'
 DB_USER = 'CryptoAdm'
@@ -23,6 +27,129 @@ DB_CONNECTION_STRING = (
     f"PWD={DB_PASSWORD};"
 )
 
+# Logging level of the dashboard and its jobs (DEBUG, INFO, WARNING, ERROR)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# Connection pool settings shared by every route and DatabaseManager method
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_POOL_MAX_OVERFLOW = int(os.getenv('DB_POOL_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+# Hourly chat_data rollup job (utils/rollups.py)
+ROLLUP_BATCH_SIZE = int(os.getenv('ROLLUP_BATCH_SIZE', 1000000))  # chat_ids folded per transaction
+ROLLUP_INTERVAL = int(os.getenv('ROLLUP_INTERVAL', 60))  # seconds between runs of the job loop
+
+# Prediction actual-price resolver job (utils/predictions.py)
+PREDICTION_RESOLVE_INTERVAL = int(os.getenv('PREDICTION_RESOLVE_INTERVAL', 300))  # seconds between runs
+# A horizon still without a price this many days after it fell due is given up on
+# (e.g. a delisted coin); raise it to catch up after a longer resolver outage.
+# The first pass ignores it and backfills every historical horizon
+PREDICTION_RESOLVE_GRACE_DAYS = int(os.getenv('PREDICTION_RESOLVE_GRACE_DAYS', 14))
+
+# Model accuracy evaluator job (utils/evaluation.py), snapshots into model_performance_metrics
+MODEL_EVAL_INTERVAL = int(os.getenv('MODEL_EVAL_INTERVAL', 3600))  # seconds between runs
+
+# Cold storage: closed days older than the retention move from the hot tables to
+# date/coin-partitioned Parquet under ARCHIVE_DIR (utils/archive.py, needs pyarrow)
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'archive'))
+ARCHIVE_CHAT_RETENTION_DAYS = int(os.getenv('ARCHIVE_CHAT_RETENTION_DAYS', 90))
+ARCHIVE_PRICE_DATA = os.getenv('ARCHIVE_PRICE_DATA', 'false').lower() == 'true'
+ARCHIVE_PRICE_RETENTION_DAYS = int(os.getenv('ARCHIVE_PRICE_RETENTION_DAYS', 180))
+ARCHIVE_INTERVAL = int(os.getenv('ARCHIVE_INTERVAL', 3600))  # seconds between runs of the job loop
+
+# Memory-mapped per-coin Price_Data copy served by get_price_data when present
+# (maintained by `python -m utils.price_store`)
+PRICE_STORE_ENABLED = os.getenv('PRICE_STORE_ENABLED', 'true').lower() == 'true'
+PRICE_STORE_DIR = os.getenv('PRICE_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'price_store'))
+PRICE_STORE_INTERVAL = int(os.getenv('PRICE_STORE_INTERVAL', 60))  # seconds between runs of the job loop
+
+# Technical indicators (/api/indicators/<coin>); windows and periods count Price_Data rows
+INDICATOR_SMA_WINDOW = int(os.getenv('INDICATOR_SMA_WINDOW', 20))
+INDICATOR_EMA_SPAN = int(os.getenv('INDICATOR_EMA_SPAN', 20))
+INDICATOR_RSI_PERIOD = int(os.getenv('INDICATOR_RSI_PERIOD', 14))
+INDICATOR_MACD = tuple(int(n) for n in os.getenv('INDICATOR_MACD', '12,26,9').split(','))  # fast, slow, signal
+INDICATOR_BOLLINGER_WINDOW = int(os.getenv('INDICATOR_BOLLINGER_WINDOW', 20))
+INDICATOR_BOLLINGER_STDS = float(os.getenv('INDICATOR_BOLLINGER_STDS', 2))
+INDICATOR_VOLATILITY_WINDOW = int(os.getenv('INDICATOR_VOLATILITY_WINDOW', 24))
+INDICATOR_HISTORY_DAYS = int(os.getenv('INDICATOR_HISTORY_DAYS', 90))  # history kept per coin, covers the longest timerange
+INDICATOR_CACHE_MAX_COINS = int(os.getenv('INDICATOR_CACHE_MAX_COINS', 64))  # coins kept per worker
+
+# OHLCV candles (/api/candles/<coin>): a bucket is closed, and cached for good, this long after it ends
+CANDLE_SETTLE_SECONDS = int(os.getenv('CANDLE_SETTLE_SECONDS', 300))
+CANDLE_CACHE_MAX_SERIES = int(os.getenv('CANDLE_CACHE_MAX_SERIES', 256))  # (coin, interval) pairs kept
+
+# Sentiment/price correlation (/api/correlation): bounds of ?window= and ?max_lag=, in hours
+CORRELATION_DEFAULT_WINDOW = int(os.getenv('CORRELATION_DEFAULT_WINDOW', 168))
+CORRELATION_MAX_WINDOW = int(os.getenv('CORRELATION_MAX_WINDOW', 720))
+CORRELATION_DEFAULT_MAX_LAG = int(os.getenv('CORRELATION_DEFAULT_MAX_LAG', 24))
+CORRELATION_MAX_LAG = int(os.getenv('CORRELATION_MAX_LAG', 168))
+
+# Full-text index of chat_data content (/api/search), per-day segments under SEARCH_INDEX_DIR
+# (maintained by `python -m utils.search_index`)
+SEARCH_INDEX_DIR = os.getenv('SEARCH_INDEX_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'search_index'))
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv('SEARCH_INDEX_BATCH_SIZE', 100000))  # chat_ids indexed per manifest update
+SEARCH_INDEX_INTERVAL = int(os.getenv('SEARCH_INDEX_INTERVAL', 60))  # seconds between runs of the job loop
+SEARCH_INDEX_CACHE_SEGMENTS = int(os.getenv('SEARCH_INDEX_CACHE_SEGMENTS', 400))  # day segments kept loaded
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 20))
+SEARCH_MAX_PAGE_SIZE = int(os.getenv('SEARCH_MAX_PAGE_SIZE', 100))
+SEARCH_SNIPPET_CHARS = int(os.getenv('SEARCH_SNIPPET_CHARS', 160))
+
+# /api/predictions paging and NDJSON streaming
+PREDICTIONS_PAGE_SIZE = int(os.getenv('PREDICTIONS_PAGE_SIZE', 500))
+PREDICTIONS_MAX_PAGE_SIZE = int(os.getenv('PREDICTIONS_MAX_PAGE_SIZE', 5000))
+PREDICTIONS_FETCH_SIZE = int(os.getenv('PREDICTIONS_FETCH_SIZE', 1000))  # rows per fetchmany when streaming
+
+# Bounds of /api/price/<coin>?max_points= downsampling
+PRICE_MIN_POINTS = int(os.getenv('PRICE_MIN_POINTS', 50))
+PRICE_MAX_POINTS = int(os.getenv('PRICE_MAX_POINTS', 10000))
+
+# /api/batch limits; views run concurrently on separate pooled connections unless disabled
+BATCH_MAX_COINS = int(os.getenv('BATCH_MAX_COINS', 100))
+BATCH_PARALLEL = os.getenv('BATCH_PARALLEL', 'true').lower() == 'true'
+
+# Response bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+
+# Seconds a data watermark (ETag source) is reused before it is queried again
+WATERMARK_TTL = int(os.getenv('WATERMARK_TTL', 5))
+
+# Slow-query log: queries slower than the threshold (execute + fetch) are kept with their plan
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 500))  # negative disables
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 200))
+SLOW_QUERY_CAPTURE_PLAN = os.getenv('SLOW_QUERY_CAPTURE_PLAN', 'true').lower() == 'true'
+SLOW_QUERY_DUMP_DIR = os.getenv('SLOW_QUERY_DUMP_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'slow_queries'))
+
+# Per-request profiler: /api/* requests carrying a token signed with PROFILE_SECRET
+# (X-Profile header or ?profile=) are sampled, streamed (NDJSON) bodies until the
+# response is closed; unset disables profiling entirely.
+# The same tokens (X-Token header or ?token=) unlock the maintenance routes such as
+# /api/cache/invalidate and /api/slow_queries, which are disabled while it is unset
+PROFILE_SECRET = os.getenv('PROFILE_SECRET', '')
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', 1))
+PROFILE_TOKEN_TTL = int(os.getenv('PROFILE_TOKEN_TTL', 3600))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'profiles'))
+
+# Headless chart images (/api/chart/<view>): renderer processes and cached images
+CHART_RENDER_WORKERS = int(os.getenv('CHART_RENDER_WORKERS', 2))
+CHART_RENDER_TIMEOUT = int(os.getenv('CHART_RENDER_TIMEOUT', 60))  # seconds
+CHART_CACHE_MAX_ENTRIES = int(os.getenv('CHART_CACHE_MAX_ENTRIES', 256))
+CHART_DPI = int(os.getenv('CHART_DPI', 100))
+
+# Server-side response cache for the aggregate endpoints (TTLs in seconds)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512))
+RESPONSE_CACHE_DEFAULT_TTL = int(os.getenv('RESPONSE_CACHE_DEFAULT_TTL', 60))
+RESPONSE_CACHE_TTLS = {
+    'mentions_chart': 60,
+    'sentiment_distribution': 60,
+    'mentions': 60,
+    'coins': 3600,
+    'coin_names': 3600,
+    'price': 60,
+    'correlation': 300
+}
+
 # Social Media API Keys
 REDDIT_CLIENT_ID = os.getenv('REDDIT_CLIENT_ID')
 REDDIT_CLIENT_SECRET = os.getenv('REDDIT_CLIENT_SECRET')
@@ -0,0 +1,50 @@
+// Decoder for the typed-array wire format (?format=columnar) of the time-series endpoints
+//
+// Layout: 'COL1', uint32 header length, JSON header, then each column's
+// little-endian int64/float64 values on an 8-byte boundary.
+function decodeColumnar(buffer) {
+    const view = new DataView(buffer);
+    const magic = new TextDecoder().decode(new Uint8Array(buffer, 0, 4));
+    if (magic !== 'COL1') {
+        throw new Error('Not a columnar payload');
+    }
+    const headerLength = view.getUint32(4, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+
+    const columns = {};
+    let offset = 8 + headerLength;
+    header.columns.forEach(column => {
+        if (column.type === 'int64') {
+            // Epoch milliseconds and counts fit a double exactly
+            columns[column.name] = Array.from(new BigInt64Array(buffer, offset, column.length), Number);
+        } else {
+            columns[column.name] = new Float64Array(buffer, offset, column.length);
+        }
+        offset += column.length * 8;
+    });
+    return { columns, meta: header.meta };
+}
+
+// Fetch a time-series endpoint in the columnar format
+async function fetchColumnar(url) {
+    const separator = url.includes('?') ? '&' : '?';
+    const response = await fetch(`${url}${separator}format=columnar`, {
+        headers: { 'Accept': 'application/x-columnar' }
+    });
+    if (!response.ok) {
+        const error = await response.json().catch(() => ({}));
+        throw new Error(error.error || `HTTP error! status: ${response.status}`);
+    }
+    return decodeColumnar(await response.arrayBuffer());
+}
+
+// Server timestamps are naive local times sent as if they were UTC
+function naiveEpochToDate(ms) {
+    const date = new Date(ms);
+    return new Date(ms + date.getTimezoneOffset() * 60000);
+}
+
+// Day columns as 'YYYY-MM-DD' labels
+function epochToDateLabel(ms) {
+    return new Date(ms).toISOString().slice(0, 10);
+}
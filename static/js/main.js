@@ -69,11 +69,22 @@ async function updatePredictions() {
     try {
         console.log('Fetching predictions...');
         const dateFilter = document.getElementById('predictionsDateFilter')?.value || '';
-        const response = await fetch(`/api/predictions?date=${dateFilter}`);
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        const data = await response.json();
+        const data = { predictions: [] };
+        let cursor = null;
+        // Follow the keyset pages until the server reports no next_cursor
+        do {
+            let url = `/api/predictions?date=${encodeURIComponent(dateFilter)}`;
+            if (cursor) {
+                url += `&cursor=${encodeURIComponent(cursor)}`;
+            }
+            const response = await fetch(url);
+            if (!response.ok) {
+                throw new Error(`HTTP error! status: ${response.status}`);
+            }
+            const page = await response.json();
+            data.predictions.push(...(page.predictions || []));
+            cursor = page.next_cursor;
+        } while (cursor);
         console.log('Received predictions:', data);
         displayPredictions(data);
     } catch (error) {
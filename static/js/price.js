@@ -5,8 +5,8 @@ async function updatePriceChart() {
         if (!coin) return; // Don't make the API call if no coin is selected
         
         const timeRange = document.getElementById('priceTimeRange').value;
-        const response = await fetch(`/api/price/${coin}?timerange=${timeRange}`);
-        const data = await response.json();
+        // About one point per pixel of chart width; spikes survive the downsampling
+        const { columns } = await fetchColumnar(`/api/price/${coin}?timerange=${timeRange}&max_points=1000`);
 
         const chartContainer = document.getElementById('price-chart');
         if (!chartContainer) return;
@@ -40,7 +40,7 @@ async function updatePriceChart() {
             series: [{
                 name: 'Price',
                 type: 'line',
-                data: data.prices.map((price, index) => [data.timestamps[index], price]),
+                data: Array.from(columns.prices, (price, index) => [naiveEpochToDate(columns.timestamps[index]), price]),
                 smooth: true,
                 areaStyle: {
                     opacity: 0.1
@@ -40,8 +40,13 @@ async function updateSentimentChart() {
             sentimentChart = null;
         }
         
-        const response = await fetch(`/api/sentiment/${coin}?start=${startDate.toISOString()}&end=${endDate.toISOString()}`);
-        const data = await response.json();
+        const { columns, meta } = await fetchColumnar(`/api/sentiment/${coin}?start=${startDate.toISOString()}&end=${endDate.toISOString()}`);
+        const { dates, ...counts } = columns;
+        const data = {
+            dates: dates.map(epochToDateLabel),
+            sentiment_data: counts,
+            colors: meta.colors
+        };
         
         // Clear the loading message
         chartContainer.innerHTML = '';
@@ -0,0 +1,265 @@
+import argparse
+import importlib.util
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from config import (
+    ARCHIVE_DIR, ARCHIVE_CHAT_RETENTION_DAYS, ARCHIVE_PRICE_DATA, ARCHIVE_PRICE_RETENTION_DAYS,
+    ARCHIVE_INTERVAL, LOG_LEVEL
+)
+from utils.lazy import lazy_import
+from utils.rollups import get_watermark, set_watermark
+pd = lazy_import('pandas')
+pa = lazy_import('pyarrow') if importlib.util.find_spec('pyarrow') is not None else None
+
+logger = logging.getLogger(__name__)
+
+# Archived table: its id and time columns, the (column, Parquet type) pairs copied to the
+# files besides the coin_id partition key, and the job_watermarks entry holding the last
+# archived day as YYYYMMDD
+ArchiveTable = namedtuple('ArchiveTable', ['name', 'id_column', 'time_column', 'columns', 'job_name'])
+
+TABLES = {
+    'chat_data': ArchiveTable(
+        'chat_data', 'chat_id', 'timestamp',
+        [('chat_id', 'int64'), ('timestamp', 'timestamp'), ('source_id', 'int64'), ('content', 'string'),
+         ('sentiment_score', 'float64'), ('sentiment_label', 'string'), ('url', 'string')],
+        'chat_archive'
+    ),
+    'Price_Data': ArchiveTable(
+        'Price_Data', 'id', 'timestamp',
+        [('id', 'int64'), ('price_date', 'timestamp'), ('timestamp', 'timestamp'), ('price_usd', 'float64'),
+         ('volume_24h', 'float64'), ('price_change_24h', 'float64'), ('data_source', 'string')],
+        'price_archive'
+    )
+}
+
+
+def _arrow_type(name):
+    return pa.timestamp('us') if name == 'timestamp' else getattr(pa, name)()
+
+
+def file_schema(spec):
+    """Parquet schema of a table's archive files; fixed so all-NULL days keep their types"""
+    return pa.schema([(column, _arrow_type(kind)) for column, kind in spec.columns])
+
+
+def day_mark(day):
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def mark_day(mark):
+    return date(mark // 10000, mark // 100 % 100, mark % 100) if mark else None
+
+
+def _to_datetime(value):
+    """MIN(timestamp) as a datetime; SQLite returns aggregates as text"""
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value)[:19])
+
+
+class ColdStore:
+    """Closed days of chat_data (and optionally Price_Data) moved to Parquet.
+
+    Files live under ARCHIVE_DIR/<table>/date=YYYY-MM-DD/coin_id=N/, so a
+    read prunes partitions by date and coin and decodes only the requested
+    columns. A day is archived by writing its files and then deleting the
+    same rows from the hot table in one transaction, and the day is
+    recorded in job_watermarks. The hot table and the archive never hold
+    the same row, so readers can simply concatenate the two.
+
+    chat_data rows are archived only once the hourly rollup has folded them
+    in. Aggregates read from chat_data_hourly therefore keep the full
+    history without touching the archive.
+    """
+
+    def __init__(self, db_manager, root=ARCHIVE_DIR):
+        self.db = db_manager
+        self.root = root
+        self._lock = threading.Lock()
+        self._datasets = {}
+
+    @property
+    def available(self):
+        return pa is not None
+
+    def archived_through(self, table):
+        """Last archived day of `table`, or None (read through the watermark cache)"""
+        mark = self.db.watermarks.lookup([TABLES[table].job_name])[0]
+        return mark_day(int(mark[0])) if mark and mark[0] else None
+
+    def covers(self, table, start):
+        """True when rows of `table` from `start` onwards may be in the archive"""
+        through = self.archived_through(table)
+        return through is not None and (start is None or start.date() <= through)
+
+    def _dataset(self, table):
+        """pyarrow dataset of a table's partitions, rediscovered when the archive moves on"""
+        import pyarrow.dataset as ds
+        through = self.archived_through(table)
+        with self._lock:
+            cached = self._datasets.get(table)
+            if cached and cached[0] == through:
+                return cached[1]
+        keys = pa.schema([('date', pa.string()), ('coin_id', pa.int64())])
+        dataset = ds.dataset(
+            os.path.join(self.root, table), format='parquet',
+            schema=pa.unify_schemas([file_schema(TABLES[table]), keys]),
+            partitioning=ds.partitioning(keys, flavor='hive')
+        )
+        with self._lock:
+            self._datasets[table] = (through, dataset)
+        return dataset
+
+    def read(self, table, columns, coin_ids=None, start=None, end=None, ids=None):
+        """Archived rows of `table` as a DataFrame, `columns` mapping output names to table columns.
+
+        Filters on coin_ids, the [start, end) time range and id values; only
+        the matching partitions and the requested columns are read. Days past
+        archived_through are skipped: their files may be left from a pass
+        whose DELETE did not commit, so the rows are still hot.
+        """
+        spec = TABLES[table]
+        through = self.archived_through(table) if self.available else None
+        if through is None or not os.path.isdir(os.path.join(self.root, table)):
+            return pd.DataFrame(columns=list(columns))
+        import pyarrow.dataset as ds
+        conditions = [ds.field('date') <= through.isoformat()]
+        if coin_ids is not None:
+            conditions.append(ds.field('coin_id').isin([int(coin_id) for coin_id in coin_ids]))
+        if start is not None:
+            conditions.append(ds.field('date') >= start.date().isoformat())
+            conditions.append(ds.field(spec.time_column) >= pa.scalar(start, pa.timestamp('us')))
+        if end is not None:
+            conditions.append(ds.field('date') <= end.date().isoformat())
+            conditions.append(ds.field(spec.time_column) < pa.scalar(end, pa.timestamp('us')))
+        if ids is not None:
+            conditions.append(ds.field(spec.id_column).isin([int(value) for value in ids]))
+        condition = None
+        for expression in conditions:
+            condition = expression if condition is None else condition & expression
+        table_data = self._dataset(table).to_table(columns=sorted(set(columns.values())), filter=condition)
+        df = table_data.to_pandas()
+        return pd.DataFrame({name: df[column] for name, column in columns.items()})
+
+    def _archivable_through(self, conn, spec):
+        """Highest id that may be archived, read once per pass so every statement sees the same rows.
+
+        chat_data rows must be folded into the rollup first; for Price_Data it
+        is the current MAX(id), so rows inserted during the pass wait for the next.
+        """
+        if spec.name == 'chat_data':
+            return get_watermark(conn, self.db.chat_rollup.job_name)
+        return int(conn.exec_driver_sql(f"SELECT MAX({spec.id_column}) FROM {spec.name}").scalar() or 0)
+
+    def _write_day(self, spec, day, df):
+        """Write one day's rows as per-coin Parquet files named by their id range.
+
+        A file whose id range lies within the new one is left from an attempt
+        that failed before its DELETE committed (a retry selects a superset of
+        those rows), so it is removed before the new file is moved in.
+        """
+        import pyarrow.parquet as pq
+        for coin_id, rows in df.groupby('coin_id', sort=True):
+            directory = os.path.join(self.root, spec.name, f'date={day.isoformat()}', f'coin_id={int(coin_id)}')
+            os.makedirs(directory, exist_ok=True)
+            ids = rows[spec.id_column]
+            name = f'part-{int(ids.min())}-{int(ids.max())}.parquet'
+            table = pa.Table.from_pandas(rows.drop(columns=['coin_id']), schema=file_schema(spec), preserve_index=False)
+            # Readers skip '_'-prefixed files, so a half-written file is never picked up
+            staging = os.path.join(directory, f'_{name}')
+            pq.write_table(table, staging, compression='zstd')
+            for existing in os.listdir(directory):
+                parts = existing[:-len('.parquet')].split('-')
+                if (existing.startswith('part-') and existing != name and len(parts) == 3
+                        and int(ids.min()) <= int(parts[1]) and int(parts[2]) <= int(ids.max())):
+                    os.remove(os.path.join(directory, existing))
+            os.replace(staging, os.path.join(directory, name))
+
+    def archive_table(self, table, retention_days, today=None):
+        """Move every closed day older than `retention_days` into the archive; returns rows moved"""
+        if not self.available:
+            raise RuntimeError("Archiving requires pyarrow")
+        spec = TABLES[table]
+        # Hot queries read up to a day of raw rows, so at least two days stay in the table
+        boundary = (today or date.today()) - timedelta(days=max(retention_days, 2))
+        select = f"""
+            SELECT {', '.join(['coin_id'] + [column for column, _ in spec.columns])}
+            FROM {spec.name}
+            WHERE {spec.time_column} >= ? AND {spec.time_column} < ? AND {spec.id_column} <= ?
+            ORDER BY {spec.id_column}
+        """
+        # The DELETE is pinned to the selected id range, so rows that are added or become
+        # archivable in between stay in the table
+        delete = f"""
+            DELETE FROM {spec.name}
+            WHERE {spec.time_column} >= ? AND {spec.time_column} < ?
+                AND {spec.id_column} >= ? AND {spec.id_column} <= ?
+        """
+
+        moved = 0
+        with self.db.connection() as conn:
+            through_id = self._archivable_through(conn, spec)
+            oldest = _to_datetime(conn.exec_driver_sql(
+                f"SELECT MIN({spec.time_column}) FROM {spec.name} WHERE {spec.id_column} <= ?", (through_id,)
+            ).scalar())
+            conn.commit()
+            day = oldest.date() if oldest else boundary
+            while day < boundary:
+                params = (f'{day.isoformat()} 00:00:00', f'{(day + timedelta(days=1)).isoformat()} 00:00:00')
+                df = pd.read_sql_query(select, conn, params=params + (through_id,))
+                if not df.empty:
+                    for column, kind in spec.columns:
+                        if kind == 'timestamp':
+                            df[column] = pd.to_datetime(df[column])
+                    self._write_day(spec, day, df)
+                    ids = df[spec.id_column]
+                    deleted = conn.exec_driver_sql(delete, params + (int(ids.min()), int(ids.max()))).rowcount
+                    if deleted != len(df):
+                        conn.rollback()
+                        raise RuntimeError(
+                            f"{spec.name} {day}: deleted {deleted} rows but archived {len(df)}; rolled back"
+                        )
+                set_watermark(conn, spec.job_name, max(get_watermark(conn, spec.job_name), day_mark(day)))
+                conn.commit()
+                if not df.empty:
+                    logger.info("Archived %d %s rows of %s", len(df), spec.name, day)
+                moved += len(df)
+                day += timedelta(days=1)
+        self.db.watermarks.clear()
+        return moved
+
+    def run(self):
+        """One archiving pass over chat_data and, when enabled, Price_Data"""
+        moved = {'chat_data': self.archive_table('chat_data', ARCHIVE_CHAT_RETENTION_DAYS)}
+        if ARCHIVE_PRICE_DATA:
+            moved['Price_Data'] = self.archive_table('Price_Data', ARCHIVE_PRICE_RETENTION_DAYS)
+        return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move closed days of chat_data (and Price_Data) to Parquet")
+    parser.add_argument('--once', action='store_true', help="run a single pass and exit")
+    parser.add_argument('--interval', type=int, default=ARCHIVE_INTERVAL, help="seconds between passes")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    while True:
+        try:
+            moved = db_manager.archive.run()
+            logger.info("Archived rows: %s", moved)
+        except Exception:
+            logger.exception("Error archiving")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,176 @@
+import os
+import sqlite3
+from datetime import datetime
+from urllib.parse import quote_plus
+from config import DB_BACKEND, DB_CONNECTION_STRING, SQLITE_PATH
+
+SQLITE_DDL_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'DDL_sqlite.sql')
+
+
+class MSSQLBackend:
+    """SQL Server via pyodbc - the production database"""
+    name = 'mssql'
+
+    def create_engine(self, **pool_options):
+        # SQLAlchemy is imported with the first engine, not at app startup
+        from sqlalchemy import create_engine
+        return create_engine(
+            f"mssql+pyodbc:///?odbc_connect={quote_plus(DB_CONNECTION_STRING)}",
+            fast_executemany=True,
+            **pool_options
+        )
+
+    def prepare(self, engine):
+        """The production schema is managed by DDL.sql, nothing to do"""
+        pass
+
+    def now(self):
+        return "GETDATE()"
+
+    def date_add(self, unit, amount, base):
+        """Shift `base` by `amount` units (hour, day, week, month)"""
+        return f"DATEADD({unit}, {amount}, {base})"
+
+    def to_date(self, expr):
+        """Truncate a datetime expression to its date"""
+        return f"CONVERT(DATE, {expr})"
+
+    def to_hour(self, expr):
+        """Truncate a datetime expression to the start of its hour"""
+        return f"DATEADD(hour, DATEDIFF(hour, 0, {expr}), 0)"
+
+    def merge_add(self, table, keys, values, source):
+        """Add the `values` columns of `source` rows into `table`, inserting rows for new keys"""
+        columns = keys + values
+        return f"""
+        MERGE {table} WITH (HOLDLOCK) AS t
+        USING ({source}) AS s ({', '.join(columns)})
+        ON {' AND '.join(f"t.{key} = s.{key}" for key in keys)}
+        WHEN MATCHED THEN
+            UPDATE SET {', '.join(f"t.{value} = t.{value} + s.{value}" for value in values)}
+        WHEN NOT MATCHED THEN
+            INSERT ({', '.join(columns)}) VALUES ({', '.join(f"s.{column}" for column in columns)});
+        """
+
+    def explain(self, conn, query, params=()):
+        """Estimated execution plan of a query as showplan XML; the query itself is not run"""
+        cursor = conn.cursor()
+        cursor.execute("SET SHOWPLAN_XML ON")
+        try:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return 'showplan_xml', row[0] if row else None
+        finally:
+            cursor.execute("SET SHOWPLAN_XML OFF")
+
+    def top(self, n):
+        """Row limit placed after SELECT"""
+        return f"TOP {n}"
+
+    def limit(self, n):
+        """Row limit placed at the end of the statement"""
+        return ""
+
+
+class SQLiteBackend:
+    """Local SQLite file with the DDL.sql schema translated, for offline runs and benchmarks"""
+    name = 'sqlite'
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+
+    def create_engine(self, **pool_options):
+        from sqlalchemy import create_engine, event
+        from sqlalchemy.pool import QueuePool
+        # Return DATETIME columns as datetime objects like pyodbc does
+        sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        engine = create_engine(
+            f"sqlite:///{self.path}",
+            poolclass=QueuePool,
+            connect_args={'check_same_thread': False, 'detect_types': sqlite3.PARSE_DECLTYPES},
+            **pool_options
+        )
+        event.listen(engine, 'connect', self._on_connect)
+        return engine
+
+    @staticmethod
+    def _on_connect(dbapi_conn, connection_record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+        dbapi_conn.execute("PRAGMA synchronous=NORMAL")
+
+    def prepare(self, engine):
+        """Create any missing tables and views of the translated schema"""
+        with open(SQLITE_DDL_PATH) as f:
+            ddl = f.read()
+        raw = engine.raw_connection()
+        try:
+            raw.executescript(ddl)
+            raw.commit()
+        finally:
+            raw.close()
+
+    def now(self):
+        return "datetime('now', 'localtime')"
+
+    def date_add(self, unit, amount, base):
+        """Shift `base` by `amount` units (hour, day, week, month)"""
+        unit = unit.lower()
+        if unit == 'week':
+            return f"datetime({base}, (({amount}) * 7) || ' days')"
+        return f"datetime({base}, ({amount}) || ' {unit}s')"
+
+    def to_date(self, expr):
+        """Truncate a datetime expression to its date"""
+        return f"date({expr})"
+
+    def to_hour(self, expr):
+        """Truncate a datetime expression to the start of its hour"""
+        return f"strftime('%Y-%m-%d %H:00:00', {expr})"
+
+    def merge_add(self, table, keys, values, source):
+        """Add the `values` columns of `source` rows into `table`, inserting rows for new keys"""
+        columns = keys + values
+        return f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        SELECT * FROM ({source}) AS s WHERE 1
+        ON CONFLICT ({', '.join(keys)}) DO UPDATE SET
+            {', '.join(f"{value} = {value} + excluded.{value}" for value in values)}
+        """
+
+    def explain(self, conn, query, params=()):
+        """EXPLAIN QUERY PLAN of a query as an indented tree"""
+        rows = conn.cursor().execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+        depth = {0: -1}
+        lines = []
+        for node_id, parent, _, detail in rows:
+            depth[node_id] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node_id] + detail)
+        return 'explain_query_plan', '\n'.join(lines)
+
+    def top(self, n):
+        """Row limit placed after SELECT"""
+        return ""
+
+    def limit(self, n):
+        """Row limit placed at the end of the statement"""
+        return f"LIMIT {n}"
+
+
+BACKENDS = {
+    'mssql': MSSQLBackend,
+    'sqlite': SQLiteBackend
+}
+
+_backend = None
+
+
+def get_backend():
+    """Return the backend selected by DB_BACKEND in config.py"""
+    global _backend
+    if _backend is None:
+        try:
+            _backend = BACKENDS[DB_BACKEND.lower()]()
+        except KeyError:
+            raise ValueError(f"Unknown DB_BACKEND '{DB_BACKEND}', expected one of {sorted(BACKENDS)}")
+    return _backend
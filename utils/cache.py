@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import OrderedDict
+from config import RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_DEFAULT_TTL, RESPONSE_CACHE_TTLS
+
+# Routes whose results are derived from each table, for invalidation after ingest
+TABLE_ROUTES = {
+    'chat_data': ['mentions_chart', 'sentiment_distribution', 'mentions', 'correlation'],
+    'Coins': ['coins', 'coin_names', 'mentions_chart', 'sentiment_distribution', 'mentions', 'price', 'correlation'],
+    'Price_Data': ['price', 'correlation']
+}
+
+
+class ResponseCache:
+    """In-process LRU cache of endpoint results keyed on route, parameters and time bucket.
+
+    Each route has a TTL; a result is shared by every request that falls in the
+    same TTL-aligned time bucket, so all workers roll over at the same moment.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, default_ttl=RESPONSE_CACHE_DEFAULT_TTL, ttls=None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(RESPONSE_CACHE_TTLS if ttls is None else ttls)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def ttl_for(self, route):
+        return self.ttls.get(route, self.default_ttl)
+
+    def _key(self, route, params):
+        ttl = self.ttl_for(route)
+        bucket = int(time.time() // ttl)
+        return (route, tuple(sorted((params or {}).items())), bucket), (bucket + 1) * ttl
+
+    def _lookup(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get_or_compute(self, route, params, compute):
+        """Return the cached result for this route/params/bucket, computing it on a miss.
+
+        Concurrent misses for the same key wait for the first computation instead of
+        running the query again. Empty results are not stored, so a failed or
+        not-yet-populated query is retried on the next request.
+        """
+        key, expires_at = self._key(route, params)
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None:
+                    self.hits += 1
+                    return entry[0]
+                self.misses += 1
+            try:
+                value = compute()
+                if value:
+                    self.set(key, value, expires_at)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, route=None):
+        """Drop cached results for one route, or everything when route is None"""
+        with self._lock:
+            if route is None:
+                removed = len(self._entries)
+                self._entries.clear()
+            else:
+                keys = [key for key in self._entries if key[0] == route]
+                for key in keys:
+                    del self._entries[key]
+                removed = len(keys)
+            self.invalidations += removed
+            return removed
+
+    def invalidate_table(self, table):
+        """Drop results derived from a table; call this after writing new rows to it"""
+        return sum(self.invalidate(route) for route in TABLE_ROUTES.get(table, []))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'ttls': dict(self.ttls)
+            }
+
+
+response_cache = ResponseCache()
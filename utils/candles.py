@@ -0,0 +1,190 @@
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from config import CANDLE_SETTLE_SECONDS, CANDLE_CACHE_MAX_SERIES
+from utils.lazy import lazy_import
+from utils.singleflight import SingleFlight
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Candle columns, in response order
+COLUMNS = ('open', 'high', 'low', 'close', 'volume', 'ticks')
+
+_INTERVAL = re.compile(r'^(\d+)([mhd])$')
+_UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_interval(text):
+    """Seconds of an interval such as '1m', '15m', '4h' or '1d', or None when it is not allowed.
+
+    Intervals run from one minute to one day and must divide a day, so every
+    bucket starts at a fixed offset from midnight.
+    """
+    match = _INTERVAL.match(text or '')
+    if not match:
+        return None
+    seconds = int(match.group(1)) * _UNIT_SECONDS[match.group(2)]
+    if seconds < 60 or seconds > 86400 or 86400 % seconds:
+        return None
+    return seconds
+
+
+def resample(timestamps, prices, volumes, seconds):
+    """OHLCV candles of time-ordered ticks: (bucket start ns, {column: values}).
+
+    Ticks are grouped by bucket in one pass: the bucket boundaries come from
+    where the bucket number changes, and high/low are ufunc reductions over
+    those runs. volume is the last 24h volume reported in the bucket (the
+    ticks carry a rolling figure, not a traded amount) and ticks the number
+    of ticks. Buckets without a tick have no candle.
+    """
+    timestamps = np.asarray(timestamps, dtype='datetime64[ns]').astype(np.int64)
+    prices = np.asarray(prices, dtype=float)
+    volumes = np.asarray(volumes, dtype=float)
+    keep = ~np.isnan(prices)
+    timestamps, prices, volumes = timestamps[keep], prices[keep], volumes[keep]
+    if len(prices) == 0:
+        return np.empty(0, dtype=np.int64), {column: np.empty(0) for column in COLUMNS}
+
+    step = seconds * 1_000_000_000
+    buckets = timestamps // step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(prices)] - 1
+    return buckets[starts] * step, {
+        'open': prices[starts],
+        'high': np.maximum.reduceat(prices, starts),
+        'low': np.minimum.reduceat(prices, starts),
+        'close': prices[ends],
+        'volume': volumes[ends],
+        'ticks': np.diff(np.r_[starts, len(prices)]).astype(float)
+    }
+
+
+class CandleSeries:
+    """Closed candles of one coin and interval covering the buckets [first, closed)"""
+
+    def __init__(self, first, closed, starts, columns):
+        self.first = first
+        self.closed = closed
+        self.starts = starts
+        self.columns = columns
+
+    def slice(self, start, end):
+        """Candles whose bucket starts in [start, end) ns"""
+        lo, hi = np.searchsorted(self.starts, [start, end], side='left')
+        return self.starts[lo:hi], {column: values[lo:hi] for column, values in self.columns.items()}
+
+
+class CandleCache:
+    """OHLCV candles of each coin and interval, with closed candles kept for good.
+
+    A bucket is closed once it ended CANDLE_SETTLE_SECONDS ago; late ticks
+    are expected within that delay. Closed candles never change, so they are
+    computed once and kept per (coin, interval). A request resamples only the
+    ticks after the last closed bucket, which yields the open candle and any
+    bucket closed since the previous request. Requests that reach further
+    back than the cached candles rebuild them from the requested start. The
+    least recently used series are dropped past CANDLE_CACHE_MAX_SERIES.
+    """
+
+    def __init__(self, db_manager, max_series=CANDLE_CACHE_MAX_SERIES):
+        self.db = db_manager
+        self.max_series = max_series
+        self._lock = threading.Lock()
+        self._series = OrderedDict()
+        self.single_flight = SingleFlight()
+        self.hits = 0
+        self.builds = 0
+        self.extensions = 0
+
+    def _ticks(self, coin, start_ns):
+        """(timestamps, prices, volumes) of a coin from start_ns on"""
+        start_time = pd.Timestamp(start_ns).to_pydatetime()
+        arrays = self.db.get_price_arrays(coin, start_time)
+        if arrays is not None:
+            return arrays
+        df = self.db.get_price_data(coin, start_time)
+        if df.empty:
+            return np.empty(0, dtype='datetime64[ns]'), np.empty(0), np.empty(0)
+        return (
+            pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]'),
+            pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float),
+            pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=float)
+        )
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _compute(self, key, coin, seconds, first, now_ns):
+        """Cached series extended (or built) so its closed candles reach the last closed bucket,
+        plus the candles of the buckets still open"""
+        step = seconds * 1_000_000_000
+        closed = (now_ns - CANDLE_SETTLE_SECONDS * 1_000_000_000) // step * step
+        with self._lock:
+            series = self._series.get(key)
+            if series is not None:
+                self._series.move_to_end(key)
+
+        built = series is None or series.first > first
+        if built:
+            series = CandleSeries(first, first, np.empty(0, dtype=np.int64), {column: np.empty(0) for column in COLUMNS})
+            self._count('builds')
+        elif series.closed >= closed:
+            self._count('hits')
+        else:
+            self._count('extensions')
+
+        # Buckets are aligned, so every tick from series.closed on falls in a bucket starting there or later
+        starts, columns = resample(*self._ticks(coin, series.closed), seconds)
+        split = np.searchsorted(starts, closed, side='left')
+        if built or closed > series.closed:
+            series = CandleSeries(
+                series.first, max(closed, series.closed),
+                np.concatenate((series.starts, starts[:split])),
+                {column: np.concatenate((series.columns[column], columns[column][:split])) for column in COLUMNS}
+            )
+            with self._lock:
+                self._series[key] = series
+                self._series.move_to_end(key)
+                while len(self._series) > self.max_series:
+                    self._series.popitem(last=False)
+        return series, (starts[split:], {column: values[split:] for column, values in columns.items()})
+
+    def get(self, coin, seconds, start_time, end_time=None):
+        """Candles of a coin between start_time (rounded down to its bucket) and end_time (default now).
+
+        Returns (bucket starts as datetime64[ns], {column: values}).
+        """
+        step = seconds * 1_000_000_000
+        now_ns = np.datetime64(datetime.now(), 'ns').astype(np.int64)
+        first = np.datetime64(start_time, 'ns').astype(np.int64) // step * step
+        end = np.datetime64(end_time, 'ns').astype(np.int64) if end_time is not None else now_ns + step
+        key = (coin, seconds)
+        series, (open_starts, open_columns) = self.single_flight.do(
+            (key, first, now_ns // 1_000_000_000), lambda: self._compute(key, coin, seconds, first, now_ns)
+        )[0]
+        starts, columns = series.slice(first, end)
+        if len(open_starts):
+            hi = np.searchsorted(open_starts, end, side='left')
+            starts = np.concatenate((starts, open_starts[:hi]))
+            columns = {column: np.concatenate((columns[column], open_columns[column][:hi])) for column in COLUMNS}
+        return starts.view('datetime64[ns]'), columns
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'series': len(self._series),
+                'candles': sum(len(series.starts) for series in self._series.values()),
+                'hits': self.hits,
+                'builds': self.builds,
+                'extensions': self.extensions
+            }
@@ -0,0 +1,121 @@
+import io
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import CHART_RENDER_WORKERS, CHART_RENDER_TIMEOUT, CHART_CACHE_MAX_ENTRIES, CHART_DPI
+from utils import chart_utils
+from utils.singleflight import SingleFlight
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml'
+}
+
+
+def render_chart(view, df, coin, fmt, dpi=CHART_DPI):
+    """Draw a chart view with the Agg canvas and return the encoded image bytes"""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    if view == 'price':
+        fig = chart_utils.price_figure(df, coin)
+    elif view == 'sentiment':
+        fig = chart_utils.sentiment_figure(df, coin)
+    elif view == 'mentions':
+        fig, _ = chart_utils.mentions_pie_figure(df)
+    else:
+        raise ValueError(f"Unknown chart view '{view}'")
+    FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, dpi=dpi)
+    return buffer.getvalue()
+
+
+class ChartRenderer:
+    """Renders chart images in a pool of worker processes and keeps them in an LRU cache.
+
+    matplotlib is neither thread-safe nor GIL-free, so each image is drawn
+    in a separate process. Callers key images on everything the picture
+    depends on, including the data watermarks, so a cached image is reused
+    until new rows arrive. Identical concurrent misses render once.
+    """
+
+    def __init__(self, workers=CHART_RENDER_WORKERS, max_entries=CHART_CACHE_MAX_ENTRIES):
+        self.workers = workers
+        self.max_entries = max_entries
+        self._executor = None
+        self._lock = threading.Lock()
+        self._images = OrderedDict()
+        self.single_flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.renders = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the web process has threads and open connections
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                )
+            return self._executor
+
+    def _submit(self, view, df, coin, fmt):
+        try:
+            return self._pool().submit(render_chart, view, df, coin, fmt).result(timeout=CHART_RENDER_TIMEOUT)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool and retry once
+            with self._lock:
+                self._executor = None
+            return self._pool().submit(render_chart, view, df, coin, fmt).result(timeout=CHART_RENDER_TIMEOUT)
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return image
+
+    def get_or_render(self, key, view, load, coin, fmt):
+        """Cached image for `key`, else load the DataFrame and render it; None when there is no data"""
+        image = self.get(key)
+        if image is not None:
+            return image
+
+        def render():
+            with self._lock:
+                self.misses += 1
+            df = load()
+            if df is None or df.empty:
+                return None
+            image = self._submit(view, df, coin, fmt)
+            with self._lock:
+                self.renders += 1
+                self._images[key] = image
+                while len(self._images) > self.max_entries:
+                    self._images.popitem(last=False)
+            return image
+
+        image, _ = self.single_flight.do(key, render)
+        return image
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._images),
+                'bytes': sum(len(image) for image in self._images.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'renders': self.renders,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'workers': self.workers
+            }
+
+
+chart_renderer = ChartRenderer()
@@ -0,0 +1,83 @@
+import threading
+from collections import namedtuple
+from utils.lazy import lazy_import
+pd = lazy_import('pandas')
+
+Coin = namedtuple('Coin', ['coin_id', 'symbol', 'full_name', 'slug'])
+
+
+def coin_slug(symbol, full_name):
+    """CoinGecko-style URL name: full name lowercased with spaces as hyphens"""
+    return (full_name or symbol).lower().replace(' ', '-')
+
+
+class CoinRegistry:
+    """In-memory copy of Coins so hot queries can filter on coin_id without a join.
+
+    Loaded on first use and reloaded whenever the Coins watermark changes
+    (checked through the short-lived watermark cache), or on refresh(). A
+    symbol held by several coin_ids maps to all of them, as `symbol = ?` did.
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._marker = None
+        self._by_id = {}
+        self._by_symbol = {}
+        self._symbol_map = None
+
+    def refresh(self):
+        """Reload the registry from Coins"""
+        query = "SELECT coin_id, symbol, full_name FROM Coins ORDER BY symbol, coin_id"
+        with self.db.connection() as conn:
+            rows = conn.exec_driver_sql(query).fetchall()
+        by_id = {
+            int(coin_id): Coin(int(coin_id), symbol, full_name, coin_slug(symbol, full_name))
+            for coin_id, symbol, full_name in rows
+        }
+        by_symbol = {}
+        for coin in by_id.values():
+            by_symbol.setdefault(coin.symbol, []).append(coin.coin_id)
+        with self._lock:
+            self._by_id = by_id
+            self._by_symbol = {symbol: tuple(ids) for symbol, ids in by_symbol.items()}
+            self._symbol_map = pd.Series({coin_id: coin.symbol for coin_id, coin in by_id.items()}, dtype=object)
+
+    def _current(self):
+        marker = self.db.watermarks.lookup(['Coins'])[0]
+        if marker != self._marker or not self._by_id:
+            self.refresh()
+            self._marker = marker
+        return self
+
+    def coin_ids(self, symbol):
+        """coin_ids of a symbol (empty when unknown)"""
+        return self._current()._by_symbol.get(symbol, ())
+
+    def symbol(self, coin_id):
+        coin = self._current()._by_id.get(coin_id)
+        return coin.symbol if coin else None
+
+    def symbols(self):
+        """All symbols, sorted"""
+        return sorted(self._current()._by_symbol)
+
+    def ids(self):
+        """All coin_ids, sorted"""
+        return sorted(self._current()._by_id)
+
+    def slugs(self):
+        """Dictionary of symbol to URL name"""
+        return {coin.symbol: coin.slug for coin in self._current()._by_id.values()}
+
+    def symbols_for(self, coin_ids):
+        """Map a Series of coin_ids to their symbols in one vectorized lookup"""
+        return pd.Series(coin_ids, copy=False).astype('int64').map(self._current()._symbol_map)
+
+
+def id_filter(column, coin_ids):
+    """`column IN (?, ...)` for the coin_ids of a symbol; params are the ids"""
+    if not coin_ids:
+        return "1 = 0"
+    return f"{column} IN ({', '.join('?' * len(coin_ids))})"
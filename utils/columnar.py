@@ -0,0 +1,93 @@
+import gzip
+import importlib.util
+import json
+import struct
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+from config import COMPRESS_MIN_BYTES
+
+# Arrow IPC is offered only when pyarrow is installed; it is imported on first use
+pa = lazy_import('pyarrow') if importlib.util.find_spec('pyarrow') is not None else None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COLUMNAR_MIMETYPE = 'application/x-columnar'
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+MAGIC = b'COL1'
+
+
+def requested_format(args, accept):
+    """Wire format asked for by ?format= or the Accept header: json, columnar or arrow"""
+    fmt = args.get('format')
+    if fmt in ('json', 'columnar') or (fmt == 'arrow' and pa is not None):
+        return fmt
+    if ARROW_MIMETYPE in accept and pa is not None:
+        return 'arrow'
+    if COLUMNAR_MIMETYPE in accept:
+        return 'columnar'
+    return 'json'
+
+
+def epoch_ms(values):
+    """datetime64 values as int64 milliseconds since the epoch (naive times taken as-is)"""
+    return np.asarray(values, dtype='datetime64[ms]').astype(np.int64)
+
+
+def _as_column(values):
+    values = np.asarray(values)
+    if values.dtype.kind == 'M':
+        return epoch_ms(values), 'int64'
+    if values.dtype.kind in 'iub':
+        return np.ascontiguousarray(values, dtype='<i8'), 'int64'
+    return np.ascontiguousarray(values, dtype='<f8'), 'float64'
+
+
+def encode_columnar(columns, meta=None):
+    """Pack named numeric columns into one little-endian typed-array buffer.
+
+    Layout: b'COL1', uint32 header length, UTF-8 JSON header
+    {"columns": [{"name", "type", "length"}], "meta": {...}}, then each column's
+    raw int64/float64 bytes in order, every section starting on an 8-byte
+    boundary so the browser can view it as a BigInt64Array/Float64Array
+    without copying. datetime64 columns become epoch milliseconds.
+    """
+    arrays = []
+    header = {'columns': [], 'meta': meta or {}}
+    for name, values in columns.items():
+        array, dtype = _as_column(values)
+        arrays.append(array)
+        header['columns'].append({'name': name, 'type': dtype, 'length': len(array)})
+    header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header_bytes += b' ' * (-(8 + len(header_bytes)) % 8)
+    return b''.join([MAGIC, struct.pack('<I', len(header_bytes)), header_bytes] + [a.tobytes() for a in arrays])
+
+
+def encode_arrow(columns, meta=None):
+    """Arrow IPC stream of the same columns; datetime64 columns keep a timestamp[ms] type"""
+    table = pa.table({
+        name: pa.array(np.asarray(values, dtype='datetime64[ms]') if np.asarray(values).dtype.kind == 'M' else _as_column(values)[0])
+        for name, values in columns.items()
+    })
+    table = table.replace_schema_metadata({'meta': json.dumps(meta or {})})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def compress(body, accept_encoding):
+    """Compress a body of at least COMPRESS_MIN_BYTES with brotli or gzip as the client allows.
+
+    Returns the (possibly unchanged) body and its Content-Encoding or None.
+    """
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    accept_encoding = accept_encoding or ''
+    if brotli is not None and 'br' in accept_encoding:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accept_encoding:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
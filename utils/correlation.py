@@ -0,0 +1,191 @@
+import logging
+import threading
+from datetime import datetime
+from config import PRICE_STORE_ENABLED
+from utils.candles import resample
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+HOUR_NS = 3_600_000_000_000
+
+
+def _masked(x, y):
+    """x and y with the positions where either is missing zeroed, and the mask of valid pairs"""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return np.where(valid, x, 0.0), np.where(valid, y, 0.0), valid.astype(float)
+
+
+def _pearson(n, sx, sy, sxx, syy, sxy, min_periods):
+    """Pearson correlation from pair counts and sums; NaN below min_periods or without variance"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = n * sxy - sx * sy
+        var = (n * sxx - sx ** 2) * (n * syy - sy ** 2)
+        corr = cov / np.sqrt(var)
+    return np.where((n >= min_periods) & (var > 0), np.clip(corr, -1.0, 1.0), np.nan)
+
+
+def rolling_correlation(x, y, window, min_periods):
+    """Correlation of the columns of two (hours, coins) arrays over trailing windows of `window` rows.
+
+    Pairs with a missing value on either side are skipped. All coins are
+    computed at once: the windowed sums are differences of cumulative sums
+    along the hour axis.
+    """
+    x, y, valid = _masked(x, y)
+    sums = []
+    for values in (valid, x, y, x * x, y * y, x * y):
+        total = np.cumsum(values, axis=0)
+        windowed = total.copy()
+        windowed[window:] -= total[:-window]
+        sums.append(windowed)
+    return _pearson(*sums, min_periods)
+
+
+def lagged_correlation(x, y, lags, min_periods):
+    """(lags, coins) correlation of x at hour t with y at hour t + lag, over the whole range"""
+    result = np.full((len(lags), x.shape[1]), np.nan)
+    hours = x.shape[0]
+    for i, lag in enumerate(lags):
+        if abs(lag) >= hours:
+            continue
+        if lag >= 0:
+            a, b = x[:hours - lag], y[lag:]
+        else:
+            a, b = x[-lag:], y[:hours + lag]
+        a, b, valid = _masked(a, b)
+        result[i] = _pearson(
+            valid.sum(axis=0), a.sum(axis=0), b.sum(axis=0),
+            (a * a).sum(axis=0), (b * b).sum(axis=0), (a * b).sum(axis=0), min_periods
+        )
+    return result
+
+
+class SentimentPriceCorrelation:
+    """Hourly net sentiment against hourly price returns for every coin at once.
+
+    Both series are aligned on one hourly grid as (hours, coins) arrays: net
+    sentiment is the mean sentiment_score of the hour from the chat rollup,
+    and the return is the log change of the hourly close, missing for hours
+    without a tick. The aligned arrays are kept per start hour and data
+    watermarks, so several windows and lags over the same range share one
+    load. Correlations are then computed along the hour axis for all coins
+    together.
+    """
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._inputs = {}  # start hour -> (end hour, watermarks, (hours, symbols, sentiment, returns))
+
+    def _sentiment(self, start_ns, hours, symbols):
+        query = f"""
+        SELECT h.bucket_hour, h.coin_id, SUM(h.score_sum) AS score_sum, SUM(h.score_count) AS score_count
+        FROM {self.db.chat_rollup.source_sql()} h
+        WHERE h.bucket_hour >= ?
+        GROUP BY h.bucket_hour, h.coin_id
+        """
+        df = self.db.read_sql(
+            query, (pd.Timestamp(start_ns).strftime('%Y-%m-%d %H:%M:%S'),), name='correlation_sentiment'
+        )
+        score_sum = np.zeros((len(hours), len(symbols)))
+        score_count = np.zeros((len(hours), len(symbols)))
+        if not df.empty:
+            column = {symbol: i for i, symbol in enumerate(symbols)}
+            coins = df['coin_id'].map(self.db.coins.symbol).map(column)
+            rows = (pd.to_datetime(df['bucket_hour']).to_numpy(dtype='datetime64[ns]').astype(np.int64) - start_ns) // HOUR_NS
+            keep = coins.notna().to_numpy() & (rows >= 0) & (rows < len(hours))
+            rows, coins = rows[keep], coins.to_numpy()[keep].astype(int)
+            # Several coin_ids of one symbol land in the same cell, so accumulate
+            np.add.at(score_sum, (rows, coins), df['score_sum'].to_numpy(dtype=float)[keep])
+            np.add.at(score_count, (rows, coins), df['score_count'].to_numpy(dtype=float)[keep])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(score_count > 0, score_sum / score_count, np.nan)
+
+    def _returns(self, start_ns, hours, symbols):
+        start_time = pd.Timestamp(start_ns).to_pydatetime()
+        closes = np.full((len(hours), len(symbols)), np.nan)
+        missing = []
+        for i, symbol in enumerate(symbols):
+            arrays = self.db.get_price_arrays(symbol, start_time) if PRICE_STORE_ENABLED else None
+            if arrays is None:
+                missing.append(i)
+            else:
+                self._fill_closes(closes, i, start_ns, *arrays)
+        if missing:
+            frames = self.db.get_price_data_batch([symbols[i] for i in missing], start_time)
+            for i in missing:
+                df = frames.get(symbols[i])
+                if df is not None and not df.empty:
+                    self._fill_closes(
+                        closes, i, start_ns, pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]'),
+                        pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float),
+                        pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=float)
+                    )
+        ticked = ~np.isnan(closes)
+        # Across hours without a tick the return accrues to the next hour that has one
+        filled = pd.DataFrame(closes).ffill().to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.full_like(filled, np.nan)
+            returns[1:] = np.log(filled[1:] / filled[:-1])
+        return np.where(ticked & np.isfinite(returns), returns, np.nan)
+
+    @staticmethod
+    def _fill_closes(closes, column, start_ns, timestamps, prices, volumes):
+        starts, candles = resample(timestamps, prices, volumes, 3600)
+        rows = (starts - start_ns) // HOUR_NS
+        keep = (rows >= 0) & (rows < closes.shape[0])
+        closes[rows[keep], column] = candles['close'][keep]
+
+    def inputs(self, start_time):
+        """(hours, symbols, sentiment, returns) from the hour of start_time to the current hour"""
+        start_ns = np.datetime64(start_time, 'ns').astype(np.int64) // HOUR_NS * HOUR_NS
+        end_ns = np.datetime64(datetime.now(), 'ns').astype(np.int64) // HOUR_NS * HOUR_NS
+        marks = self.db.watermarks.lookup(['chat_data', 'Price_Data', 'Coins'])
+        with self._lock:
+            cached = self._inputs.get(start_ns)
+            if cached is not None and cached[:2] == (end_ns, marks):
+                return cached[2]
+
+        hours = np.arange(start_ns, end_ns + HOUR_NS, HOUR_NS).view('datetime64[ns]')
+        symbols = self.db.coins.symbols()
+        result = (hours, symbols, self._sentiment(start_ns, hours, symbols), self._returns(start_ns, hours, symbols))
+        with self._lock:
+            # Entries of earlier hours or older data are never asked for again
+            self._inputs = {
+                start: entry for start, entry in self._inputs.items() if entry[:2] == (end_ns, marks)
+            }
+            self._inputs[start_ns] = (end_ns, marks, result)
+        return result
+
+    def compute(self, start_time, window, max_lag, coins=None):
+        """Rolling and lagged correlation matrices between hourly net sentiment and returns.
+
+        Returns a dict with hours, coins, rolling (hours x coins, over the
+        trailing `window` hours), lags, lagged (lags x coins; a positive lag
+        means sentiment leads the return by that many hours) and, per coin,
+        the lag with the strongest correlation and the number of paired hours.
+        """
+        hours, symbols, sentiment, returns = self.inputs(start_time)
+        if coins:
+            columns = [symbols.index(coin) for coin in coins if coin in symbols]
+            symbols = [symbols[i] for i in columns]
+            sentiment, returns = sentiment[:, columns], returns[:, columns]
+        min_periods = max(3, window // 4)
+        lags = np.arange(-max_lag, max_lag + 1)
+        lagged = lagged_correlation(sentiment, returns, lags, min_periods)
+        strongest = np.where(np.isnan(lagged), -1.0, np.abs(lagged))
+        best = strongest.argmax(axis=0)
+        found = strongest.max(axis=0, initial=-1.0) >= 0
+        return {
+            'hours': hours,
+            'coins': symbols,
+            'rolling': rolling_correlation(sentiment, returns, window, min_periods),
+            'lags': lags,
+            'lagged': lagged,
+            'best_lag': np.where(found, lags[best], np.nan),
+            'best_correlation': np.where(found, lagged[best, np.arange(len(symbols))], np.nan),
+            'samples': (~(np.isnan(sentiment) | np.isnan(returns))).sum(axis=0)
+        }
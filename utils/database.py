@@ -1,75 +1,354 @@
-import pyodbc
-from sqlalchemy import create_engine
-import pandas as pd
-from config import DB_CONNECTION_STRING
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+from config import (
+    DB_CONNECTION_STRING, DB_POOL_SIZE, DB_POOL_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE, DB_POOL_PRE_PING, PRICE_STORE_ENABLED
+)
+from utils.backends import get_backend
+from utils.rollups import ChatRollup
+from utils.predictions import PredictionResolver
+from utils.watermarks import DataWatermarks
+from utils.coins import CoinRegistry, id_filter
+from utils.singleflight import SingleFlight, normalize_sql
+from utils.slowlog import SlowQueryLog
+from utils.archive import ColdStore
+from utils.price_store import PriceStore
+from utils.indicators import IndicatorCache
+from utils.candles import CandleCache
+from utils.evaluation import ModelEvaluator
+from utils.correlation import SentimentPriceCorrelation
+from utils.search_index import SearchIndex
+from utils import metrics
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Thread-safe counters for checkouts from the shared connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waits = 0  # checkouts that found the pool at size + max_overflow with nothing idle
+        self.wait_time = 0.0  # seconds spent acquiring those connections
+        self.max_wait_time = 0.0
+
+    def record(self, waited, elapsed):
+        with self._lock:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+                self.wait_time += elapsed
+                self.max_wait_time = max(self.max_wait_time, elapsed)
+
+    def snapshot(self, pool):
+        """Return the counters together with the pool's current occupancy"""
+        with self._lock:
+            return {
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+                'max_wait_time': round(self.max_wait_time, 6)
+            }
+
+
+pool_stats = PoolStats()
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_shared_engine():
+    """Return the process-wide pooled SQLAlchemy engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                backend = get_backend()
+                engine = backend.create_engine(
+                    pool_size=DB_POOL_SIZE,
+                    max_overflow=DB_POOL_MAX_OVERFLOW,
+                    pool_timeout=DB_POOL_TIMEOUT,
+                    pool_recycle=DB_POOL_RECYCLE,
+                    pool_pre_ping=DB_POOL_PRE_PING
+                )
+                backend.prepare(engine)
+                _engine = engine
+    return _engine
+
+
+def format_sql_datetime(value):
+    """Format a datetime as a query parameter both backends compare correctly"""
+    if value.microsecond:
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
 class DatabaseManager:
     def __init__(self):
         # Use the connection string from config.py
         self.conn_str = DB_CONNECTION_STRING
-        self.conn = None
-        self.connect()
+        self.sql = get_backend()
+        self.chat_rollup = ChatRollup(self)
+        self.prediction_resolver = PredictionResolver(self)
+        self.model_evaluator = ModelEvaluator(self)
+        self.watermarks = DataWatermarks(self)
+        self.coins = CoinRegistry(self)
+        self.single_flight = SingleFlight()
+        self.slow_queries = SlowQueryLog(self)
+        self.archive = ColdStore(self)
+        self.price_store = PriceStore(self)
+        self.indicators = IndicatorCache(self)
+        self.candles = CandleCache(self)
+        self.correlation = SentimentPriceCorrelation(self)
+        self.search_index = SearchIndex(self)
+        # Connections are opened on first use so the app starts while the database is down
 
     def connect(self):
-        """Establish database connection"""
+        """Check that the shared pool can hand out a connection"""
         try:
-            self.conn = pyodbc.connect(self.conn_str)
-            print("Database connection established")
+            with self.raw_connection():
+                pass
+            logger.info("Database connection established")
+            return True
         except Exception as e:
-            print(f"Error connecting to database: {e}")
+            logger.error("Error connecting to database: %s", e)
+            return False
 
-    def get_connection(self):
-        """Get a raw PYODBC connection"""
-        return pyodbc.connect(self.conn_str)
+    def ping(self):
+        """Round-trip a trivial query; reports whether the database is reachable and how fast"""
+        started = time.perf_counter()
+        try:
+            with self.raw_connection() as conn:
+                conn.cursor().execute("SELECT 1").fetchall()
+            return {
+                'connected': True,
+                'backend': self.sql.name,
+                'latency_ms': round((time.perf_counter() - started) * 1000.0, 3)
+            }
+        except Exception as e:
+            logger.error("Database ping failed: %s", e)
+            return {'connected': False, 'backend': self.sql.name, 'error': str(e)}
 
     def get_engine(self):
-        """Get a SQLAlchemy engine"""
-        return create_engine(f"mssql+pyodbc:///?odbc_connect={self.conn_str}")
+        """Get the shared pooled SQLAlchemy engine"""
+        return get_shared_engine()
+
+    def _checkout(self, acquire):
+        """Acquire a pooled connection, recording how long the checkout took"""
+        pool = self.get_engine().pool
+        # Same test QueuePool uses to block: nothing idle and no room to open another connection.
+        # Below that limit a checkout just opens a connection, which is not a wait
+        max_overflow = getattr(pool, '_max_overflow', -1)
+        waited = pool.checkedin() == 0 and max_overflow > -1 and pool.overflow() >= max_overflow
+        started = time.perf_counter()
+        conn = acquire()
+        elapsed = time.perf_counter() - started
+        pool_stats.record(waited, elapsed)
+        metrics.pool_wait_seconds.observe(elapsed, 'true' if waited else 'false')
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a SQLAlchemy connection from the pool; it is always returned"""
+        conn = self._checkout(self.get_engine().connect)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def raw_connection(self):
+        """Borrow a DBAPI (pyodbc) connection from the pool; it is always returned"""
+        conn = self._checkout(self.get_engine().raw_connection)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_connection(self):
+        """Get a pooled DBAPI connection; closing it returns it to the pool"""
+        return self._checkout(self.get_engine().raw_connection)
+
+    def _execute(self, query, params, name, frame):
+        """Execute a query on a pooled DBAPI connection, timing execute, fetch and DataFrame build"""
+        with self.raw_connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            executed = time.perf_counter()
+            rows = cursor.fetchall()
+            fetched = time.perf_counter()
+            columns = [column[0] for column in cursor.description or ()]
+        metrics.query_phase_seconds.observe(executed - started, name, 'execute')
+        metrics.query_phase_seconds.observe(fetched - executed, name, 'fetch')
+        metrics.query_rows.observe(len(rows), name)
+        if self.slow_queries.is_slow(fetched - started):
+            metrics.slow_queries.inc(name)
+            self.slow_queries.record(name, query, params, fetched - started, len(rows))
+        if not frame:
+            return rows
+        # Same construction pandas.read_sql_query uses, Decimal coerced to float
+        df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+        metrics.query_phase_seconds.observe(time.perf_counter() - fetched, name, 'dataframe')
+        return df
+
+    def read_sql(self, query, params=(), name=None):
+        """Run a query into a DataFrame; identical concurrent calls share one execution.
+
+        `name` labels the query's metrics and defaults to the calling function.
+        """
+        params = tuple(params)
+        name = name or sys._getframe(1).f_code.co_name
+        df, shared = self.single_flight.do(
+            ('frame', normalize_sql(query), params), lambda: self._execute(query, params, name, True)
+        )
+        # Callers add and convert columns, so every caller of a shared frame, the
+        # leader included, gets its own copy and the published one stays untouched
+        return df.copy() if shared else df
+
+    def fetch_all(self, query, params=(), name=None):
+        """Run a query and return its rows; identical concurrent calls share one execution"""
+        params = tuple(params)
+        name = name or sys._getframe(1).f_code.co_name
+        rows, shared = self.single_flight.do(
+            ('rows', normalize_sql(query), params), lambda: self._execute(query, params, name, False)
+        )
+        return list(rows) if shared else rows
+
+    def with_archive(self, table, df, columns, coin_ids, start, end=None, order_by=None):
+        """Add the archived rows of the same range to a hot-table result when the range reaches the archive.
+
+        `columns` maps the result's column names to `table` columns.
+        """
+        if not self.archive.covers(table, start):
+            return df
+        cold = self.archive.read(table, columns, coin_ids, start, end)
+        if cold.empty:
+            return df
+        df = pd.concat([cold, df], ignore_index=True)
+        return df.sort_values(order_by, kind='stable', ignore_index=True) if order_by else df
+
+    def get_query_stats(self):
+        """Get single-flight execution and deduplication counters"""
+        return self.single_flight.stats()
+
+    def get_pool_stats(self):
+        """Get checkout counters and occupancy of the shared pool"""
+        return pool_stats.snapshot(self.get_engine().pool)
 
     def get_available_coins(self):
         """Get list of available coins from database"""
         try:
-            engine = self.get_engine()
-            query = "SELECT symbol FROM Coins ORDER BY symbol"
-            df = pd.read_sql_query(query, engine)
-            return df['symbol'].tolist()
+            return self.coins.symbols()
         except Exception as e:
-            print(f"Error getting coins: {str(e)}")
+            logger.error("Error getting coins: %s", e)
             return []
 
-    def get_price_data(self, coin, start_time):
-        """Get price data for a specific coin and time range"""
+    def get_price_arrays(self, coin, start_time):
+        """(timestamps, prices, volumes) of a coin from the price store, or None when it has no copy.
+
+        Rows added since the last sync are read from Price_Data by id and merged in.
+        """
+        coin_ids = self.coins.coin_ids(coin)
+        if not PRICE_STORE_ENABLED or len(coin_ids) != 1:
+            return None
+        stored = self.price_store.slice(coin_ids[0], start_time)
+        if stored is None:
+            return None
+        last_id, arrays = stored
+        mark = self.watermarks.lookup(['coin_price'], coin)[0]
+        if not mark or mark[0] is None or int(mark[0]) <= last_id:
+            return arrays
+
         query = """
-        SELECT pd.timestamp, pd.price_usd as price, pd.volume_24h as volume
-        FROM Price_Data pd
-        JOIN Coins c ON pd.coin_id = c.coin_id
-        WHERE c.symbol = ? AND pd.timestamp >= ?
-        ORDER BY pd.timestamp
+        SELECT timestamp, price_usd as price, volume_24h as volume
+        FROM Price_Data
+        WHERE coin_id = ? AND id > ? AND timestamp >= ?
         """
+        tail = self.read_sql(query, (coin_ids[0], last_id, format_sql_datetime(start_time)), name='price_store_tail')
+        if tail.empty:
+            return arrays
+        timestamps = np.concatenate([arrays[0], pd.to_datetime(tail['timestamp']).to_numpy(dtype='datetime64[ns]')])
+        order = np.argsort(timestamps, kind='stable')
+        return (
+            timestamps[order],
+            np.concatenate([arrays[1], tail['price'].to_numpy(dtype=float)])[order],
+            np.concatenate([arrays[2], tail['volume'].to_numpy(dtype=float)])[order]
+        )
+
+    def get_price_data(self, coin, start_time):
+        """Get price data for a specific coin and time range"""
+        try:
+            arrays = self.get_price_arrays(coin, start_time)
+            if arrays is not None:
+                return pd.DataFrame({'timestamp': arrays[0], 'price': arrays[1], 'volume': arrays[2]})
+        except Exception as e:
+            logger.error("Error reading the price store, falling back to SQL: %s", e)
         try:
-            engine = self.get_engine()
+            coin_ids = self.coins.coin_ids(coin)
+            query = f"""
+            SELECT pd.timestamp, pd.price_usd as price, pd.volume_24h as volume
+            FROM Price_Data pd
+            WHERE {id_filter('pd.coin_id', coin_ids)} AND pd.timestamp >= ?
+            ORDER BY pd.timestamp
+            """
             start_time_str = start_time.strftime('%Y-%m-%d %H:%M:%S')
-            return pd.read_sql_query(query, engine, params=(coin, start_time_str))
+            df = self.read_sql(query, (*coin_ids, start_time_str))
+            return self.with_archive(
+                'Price_Data', df, {'timestamp': 'timestamp', 'price': 'price_usd', 'volume': 'volume_24h'},
+                coin_ids, start_time, order_by='timestamp'
+            )
         except Exception as e:
-            print(f"Error getting price data: {str(e)}")
+            logger.error("Error getting price data: %s", e)
+            return pd.DataFrame()
+
+    def get_chat_messages(self, coin, start_time, end_time=None):
+        """Raw chat_data rows of a coin in [start_time, end_time), including archived days"""
+        try:
+            coin_ids = self.coins.coin_ids(coin)
+            query = f"""
+            SELECT cd.chat_id, cd.timestamp, cd.source_id, cd.content,
+                   cd.sentiment_score, cd.sentiment_label, cd.url
+            FROM chat_data cd
+            WHERE {id_filter('cd.coin_id', coin_ids)} AND cd.timestamp >= ?
+            {'AND cd.timestamp < ?' if end_time else ''}
+            ORDER BY cd.chat_id
+            """
+            params = (*coin_ids, format_sql_datetime(start_time)) + ((format_sql_datetime(end_time),) if end_time else ())
+            df = self.read_sql(query, params)
+            columns = {column: column for column in df.columns}
+            return self.with_archive('chat_data', df, columns, coin_ids, start_time, end_time, order_by='chat_id')
+        except Exception as e:
+            logger.error("Error getting chat messages: %s", e)
             return pd.DataFrame()
 
     def get_sentiment_data(self, coin):
         """Get sentiment data for a specific coin"""
         try:
-            query = """
+            sql = self.sql
+            coin_ids = self.coins.coin_ids(coin)
+            query = f"""
             WITH DailySentiment AS (
                 SELECT 
-                    CAST(cd.timestamp AS DATE) as date,
-                    cd.sentiment_label,
-                    COUNT(*) as count
-                FROM chat_data cd
-                JOIN Coins c ON cd.coin_id = c.coin_id
-                WHERE c.symbol = ?
-                    AND cd.sentiment_label IS NOT NULL
-                    AND cd.timestamp >= DATEADD(day, -30, GETDATE())  -- Last 30 days of data
-                GROUP BY CAST(cd.timestamp AS DATE), cd.sentiment_label
+                    {sql.to_date('h.bucket_hour')} as date,
+                    h.sentiment_label,
+                    SUM(h.mention_count) as count
+                FROM {self.chat_rollup.source_sql()} h
+                WHERE {id_filter('h.coin_id', coin_ids)}
+                    AND h.sentiment_label <> ''
+                    AND h.bucket_hour >= {sql.to_hour(sql.date_add('day', -30, sql.now()))}  -- Last 30 days of data
+                GROUP BY {sql.to_date('h.bucket_hour')}, h.sentiment_label
             )
             SELECT 
                 date,
@@ -80,11 +359,10 @@ class DatabaseManager:
             ORDER BY date ASC, sentiment_label
             """
             
-            engine = self.get_engine()
-            df = pd.read_sql_query(query, engine, params=(coin,))
+            df = self.read_sql(query, coin_ids)
             
             if df.empty:
-                print(f"No sentiment data found for {coin}")
+                logger.debug("No sentiment data found for %s", coin)
                 return pd.DataFrame()
             
             # Ensure proper column types
@@ -93,131 +371,236 @@ class DatabaseManager:
             df['sentiment_label'] = df['sentiment_label'].astype(str)
             df['percentage'] = df['percentage'].astype(float)
             
-            print(f"Retrieved sentiment data for {coin}:")
-            print(df.head())
-            print("\nDataFrame info:")
-            print(df.info())
+            logger.debug("Retrieved %d sentiment rows for %s", len(df), coin)
             
             return df
             
         except Exception as e:
-            print(f"Error getting sentiment data: {str(e)}")
-            print("Full error details:", e.__dict__)
+            logger.exception("Error getting sentiment data: %s", e)
             return pd.DataFrame()
 
     def get_mentions_data(self, timerange='24h'):
         """Get mentions data for different time periods"""
         try:
-            if not self.conn:
-                self.connect()
-                
             # Base query to get mentions count by coin for different time periods
-            base_query = """
+            sql = self.sql
+            base_query = f"""
             WITH MentionsCounts AS (
                 SELECT 
-                    c.symbol,
-                    COUNT(*) as mention_count,
+                    h.coin_id,
+                    SUM(h.mention_count) as mention_count,
                     CASE 
-                        WHEN cd.timestamp >= DATEADD(HOUR, -1, GETDATE()) THEN 'hour'
-                        WHEN cd.timestamp >= DATEADD(DAY, -1, GETDATE()) THEN 'day'
-                        WHEN cd.timestamp >= DATEADD(WEEK, -1, GETDATE()) THEN 'week'
-                        WHEN cd.timestamp >= DATEADD(MONTH, -1, GETDATE()) THEN 'month'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('hour', -1, sql.now()))} THEN 'hour'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('day', -1, sql.now()))} THEN 'day'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('week', -1, sql.now()))} THEN 'week'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('month', -1, sql.now()))} THEN 'month'
                     END as time_period
-                FROM chat_data cd
-                JOIN Coins c ON cd.coin_id = c.coin_id
-                WHERE cd.timestamp >= DATEADD(MONTH, -1, GETDATE())
+                FROM {self.chat_rollup.source_sql()} h
+                WHERE h.bucket_hour >= {sql.to_hour(sql.date_add('month', -1, sql.now()))}
                 GROUP BY 
-                    c.symbol,
+                    h.coin_id,
                     CASE 
-                        WHEN cd.timestamp >= DATEADD(HOUR, -1, GETDATE()) THEN 'hour'
-                        WHEN cd.timestamp >= DATEADD(DAY, -1, GETDATE()) THEN 'day'
-                        WHEN cd.timestamp >= DATEADD(WEEK, -1, GETDATE()) THEN 'week'
-                        WHEN cd.timestamp >= DATEADD(MONTH, -1, GETDATE()) THEN 'month'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('hour', -1, sql.now()))} THEN 'hour'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('day', -1, sql.now()))} THEN 'day'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('week', -1, sql.now()))} THEN 'week'
+                        WHEN h.bucket_hour >= {sql.to_hour(sql.date_add('month', -1, sql.now()))} THEN 'month'
                     END
             )
             SELECT 
-                symbol as coin,
+                coin_id,
                 mention_count as mentions,
                 time_period as timeframe
             FROM MentionsCounts
-            ORDER BY time_period, mention_count DESC
             """
             
-            df = pd.read_sql(base_query, self.conn)
-            return df
+            df = self.read_sql(base_query)
+            
+            # Label with symbols from the registry instead of joining Coins
+            df['coin'] = self.coins.symbols_for(df['coin_id'])
+            df = df.groupby(['timeframe', 'coin'], as_index=False)['mentions'].sum()
+            return df.sort_values(['timeframe', 'mentions'], ascending=[True, False], ignore_index=True)[
+                ['coin', 'mentions', 'timeframe']
+            ]
 
         except Exception as e:
-            print(f"Error getting mentions data: {e}")
-            # If connection error, try to reconnect
-            if "connection" in str(e).lower():
-                self.connect()
+            logger.error("Error getting mentions data: %s", e)
             return pd.DataFrame(columns=['coin', 'mentions', 'timeframe'])
 
+    def refresh_chat_rollup(self):
+        """Bring chat_data_hourly up to date with chat_data"""
+        return self.chat_rollup.refresh()
+
+    def resolve_prediction_actuals(self, **kwargs):
+        """Store actual prices and errors for predictions whose horizons have elapsed"""
+        return self.prediction_resolver.resolve(**kwargs)
+
     def get_coin_details(self, coin):
         """Get detailed information for a specific coin"""
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
+            sql = self.sql
+            coin_ids = self.coins.coin_ids(coin)
             # Get price data
-            price_query = """
-            SELECT TOP 1 
+            price_query = f"""
+            SELECT {sql.top(1)} 
                 pd.price_usd,
                 pd.volume_24h,
                 pd.price_change_24h
             FROM Price_Data pd
-            JOIN Coins c ON pd.coin_id = c.coin_id
-            WHERE c.symbol = ?
+            WHERE {id_filter('pd.coin_id', coin_ids)}
             ORDER BY pd.timestamp DESC
+            {sql.limit(1)}
             """
-            cursor.execute(price_query, coin)
-            price_data = cursor.fetchone()
+            price_rows = self.fetch_all(price_query, coin_ids, name='coin_details_price')
+            price_data = price_rows[0] if price_rows else None
             
             # Get sentiment data
-            sentiment_query = """
+            sentiment_query = f"""
             SELECT 
                 sentiment_label,
                 COUNT(*) as count,
                 AVG(CAST(sentiment_score as float)) as avg_score
             FROM chat_data cd
-            JOIN Coins c ON cd.coin_id = c.coin_id
-            WHERE c.symbol = ?
-            AND cd.timestamp >= DATEADD(day, -1, GETDATE())
+            WHERE {id_filter('cd.coin_id', coin_ids)}
+            AND cd.timestamp >= {sql.date_add('day', -1, sql.now())}
             GROUP BY sentiment_label
             """
-            cursor.execute(sentiment_query, coin)
-            sentiment_data = cursor.fetchall()
+            sentiment_data = self.fetch_all(sentiment_query, coin_ids, name='coin_details_sentiment')
             
-            conn.close()
             return price_data, sentiment_data
             
         except Exception as e:
-            print(f"Error getting coin details: {str(e)}")
+            logger.error("Error getting coin details: %s", e)
             return None, None
 
+    def _batch_ids(self, coins):
+        """{coin_id: symbol} for the coin_ids of every symbol in `coins`"""
+        return {coin_id: symbol for symbol in coins for coin_id in self.coins.coin_ids(symbol)}
+
+    def get_price_data_batch(self, coins, start_time):
+        """Price data of several coins from one query, as {symbol: DataFrame}"""
+        ids = self._batch_ids(coins)
+        if not ids:
+            return {}
+        query = f"""
+        SELECT pd.coin_id, pd.timestamp, pd.price_usd as price, pd.volume_24h as volume
+        FROM Price_Data pd
+        WHERE {id_filter('pd.coin_id', list(ids))} AND pd.timestamp >= ?
+        ORDER BY pd.coin_id, pd.timestamp
+        """
+        df = self.read_sql(query, (*ids, start_time.strftime('%Y-%m-%d %H:%M:%S')))
+        df = self.with_archive(
+            'Price_Data', df,
+            {'coin_id': 'coin_id', 'timestamp': 'timestamp', 'price': 'price_usd', 'volume': 'volume_24h'},
+            list(ids), start_time
+        )
+        df['symbol'] = df['coin_id'].map(ids)
+        return {
+            symbol: group.sort_values('timestamp', kind='stable')[['timestamp', 'price', 'volume']]
+            for symbol, group in df.groupby('symbol', sort=False)
+        }
+
+    def get_coin_details_batch(self, coins):
+        """Latest price and last-day sentiment of several coins, as {symbol: (price_data, sentiment_data)}.
+
+        One windowed latest-price query and one grouped sentiment query; the
+        tuples have the shapes get_coin_details returns.
+        """
+        ids = self._batch_ids(coins)
+        if not ids:
+            return {}
+        sql = self.sql
+        price_query = f"""
+        WITH Latest AS (
+            SELECT 
+                coin_id,
+                timestamp,
+                price_usd,
+                volume_24h,
+                price_change_24h,
+                ROW_NUMBER() OVER (PARTITION BY coin_id ORDER BY timestamp DESC) as rn
+            FROM Price_Data
+            WHERE {id_filter('coin_id', list(ids))}
+        )
+        SELECT coin_id, timestamp, price_usd, volume_24h, price_change_24h
+        FROM Latest
+        WHERE rn = 1
+        """
+        sentiment_query = f"""
+        SELECT 
+            coin_id,
+            sentiment_label,
+            COUNT(*) as count,
+            SUM(CAST(sentiment_score as float)) as score_sum,
+            COUNT(sentiment_score) as score_count
+        FROM chat_data
+        WHERE {id_filter('coin_id', list(ids))}
+        AND timestamp >= {sql.date_add('day', -1, sql.now())}
+        GROUP BY coin_id, sentiment_label
+        """
+        price_rows = self.fetch_all(price_query, tuple(ids), name='coin_details_batch_price')
+        sentiment_rows = self.fetch_all(sentiment_query, tuple(ids), name='coin_details_batch_sentiment')
+
+        # A symbol held by several coin_ids takes the latest price among them
+        latest = {}
+        for coin_id, timestamp, price, volume, change in price_rows:
+            symbol = ids[coin_id]
+            if symbol not in latest or timestamp > latest[symbol][0]:
+                latest[symbol] = (timestamp, (price, volume, change))
+
+        sentiment = {}
+        for coin_id, label, count, score_sum, score_count in sentiment_rows:
+            totals = sentiment.setdefault(ids[coin_id], {}).setdefault(label, [0, 0.0, 0])
+            totals[0] += count
+            totals[1] += score_sum or 0.0
+            totals[2] += score_count
+
+        return {
+            symbol: (
+                latest[symbol][1] if symbol in latest else None,
+                [
+                    (label, count, score_sum / score_count if score_count else None)
+                    for label, (count, score_sum, score_count) in sentiment.get(symbol, {}).items()
+                ]
+            )
+            for symbol in dict.fromkeys(ids.values())
+        }
+
+    def get_sentiment_data_batch(self, coins):
+        """30-day daily sentiment of several coins from one query, as {symbol: DataFrame}"""
+        ids = self._batch_ids(coins)
+        if not ids:
+            return {}
+        sql = self.sql
+        query = f"""
+        SELECT 
+            h.coin_id,
+            {sql.to_date('h.bucket_hour')} as date,
+            h.sentiment_label,
+            SUM(h.mention_count) as count
+        FROM {self.chat_rollup.source_sql()} h
+        WHERE {id_filter('h.coin_id', list(ids))}
+            AND h.sentiment_label <> ''
+            AND h.bucket_hour >= {sql.to_hour(sql.date_add('day', -30, sql.now()))}  -- Last 30 days of data
+        GROUP BY h.coin_id, {sql.to_date('h.bucket_hour')}, h.sentiment_label
+        """
+        df = self.read_sql(query, tuple(ids))
+        if df.empty:
+            return {}
+
+        df['symbol'] = df['coin_id'].map(ids)
+        df['date'] = pd.to_datetime(df['date'])
+        df = df.groupby(['symbol', 'date', 'sentiment_label'], as_index=False)['count'].sum()
+        df['count'] = df['count'].astype(int)
+        df['percentage'] = df['count'].astype(float) / df.groupby(['symbol', 'date'])['count'].transform('sum') * 100
+        return {
+            symbol: group[['date', 'sentiment_label', 'count', 'percentage']].reset_index(drop=True)
+            for symbol, group in df.groupby('symbol', sort=False)
+        }
+
     def get_coin_names(self):
-        """Get dictionary of coin symbols and their full names from database"""
+        """Get dictionary of coin symbols and their URL names (full name, lowercase, hyphenated)"""
         try:
-            query = """
-            SELECT symbol, full_name 
-            FROM Coins 
-            ORDER BY symbol
-            """
-            engine = self.get_engine()
-            df = pd.read_sql_query(query, engine)
-            
-            # Convert full names to URL format (lowercase, replace spaces with hyphens)
-            coin_names = {}
-            for _, row in df.iterrows():
-                url_name = row['full_name'].lower().replace(' ', '-')
-                coin_names[row['symbol']] = url_name
-            
-            return coin_names
+            return self.coins.slugs()
         except Exception as e:
-            print(f"Error getting coin names: {str(e)}")
+            logger.error("Error getting coin names: %s", e)
             return {}
-
-    def __del__(self):
-        """Close database connection when object is destroyed"""
-        if self.conn:
-            self.conn.close()
\ No newline at end of file
@@ -0,0 +1,85 @@
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+
+# Downsampling methods accepted by /api/price/<coin>?downsample=
+METHODS = ('minmax', 'lttb')
+
+
+def _bucket_ids(n, buckets):
+    """Bucket number of each of n points split into `buckets` nearly equal runs"""
+    return (np.arange(n) * buckets) // n
+
+
+def minmax_indices(values, max_points):
+    """Indices of the lowest and highest point of each bucket, plus both ends.
+
+    Every spike survives because each bucket keeps its extremes. Runs as one
+    lexsort: within each bucket the first sorted index is the minimum and the
+    last one the maximum.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    buckets = max(1, (max_points - 2) // 2)
+    ids = _bucket_ids(n, buckets)
+    order = np.lexsort((np.nan_to_num(values, nan=-np.inf), ids))
+    starts = np.searchsorted(ids[order], np.arange(buckets), side='left')
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+def lttb_indices(x, y, max_points):
+    """Largest-Triangle-Three-Buckets selection of at most max_points indices.
+
+    Keeps the first and last point; for every bucket in between picks the point
+    forming the largest triangle with the previously kept point and the mean of
+    the next bucket. Buckets are visited in order, the work inside each bucket
+    is vectorized.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.nan_to_num(np.asarray(y, dtype=float))
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        next_start, next_end = end, max(edges[i + 2] if i + 2 < len(edges) else n, end + 1)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs(
+            (x[prev] - avg_x) * (y[start:end] - y[prev])
+            - (x[prev] - x[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(area.argmax())
+        selected[i + 1] = prev
+    return np.unique(selected)
+
+
+def segment_sums(values, indices):
+    """Sum `values` over the runs ending at each kept index, so totals are preserved"""
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    if len(indices) == 0:
+        return values[:0]
+    starts = np.r_[0, indices[:-1] + 1]
+    sums = np.add.reduceat(values, starts)
+    # reduceat leaves a run after the last kept index out; fold it into the last point
+    sums[-1] += values[indices[-1] + 1:].sum()
+    return sums
+
+
+def downsample_series(timestamps, prices, volumes, max_points, method='minmax'):
+    """Reduce a price series to about max_points points.
+
+    Prices are picked by the shape-preserving `method`, volumes are summed over
+    the points each kept point stands for. Returns the three arrays.
+    """
+    if method == 'lttb':
+        indices = lttb_indices(timestamps.astype('datetime64[ms]').astype(np.int64), prices, max_points)
+    else:
+        indices = minmax_indices(prices, max_points)
+    return timestamps[indices], prices[indices], segment_sums(volumes, indices)
@@ -0,0 +1,252 @@
+import argparse
+import logging
+import time
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+from config import MODEL_EVAL_INTERVAL, LOG_LEVEL
+from utils.coins import id_filter
+from utils.predictions import HORIZONS, accuracy_scores
+from utils.rollups import get_watermark, set_watermark
+
+logger = logging.getLogger(__name__)
+
+HORIZON_NAMES = [name for name, _, _ in HORIZONS]
+
+# Key and additive columns of model_error_sums
+KEYS = ['model_version', 'coin_id', 'horizon']
+SUMS = ['sample_count', 'abs_error_sum', 'sq_error_sum', 'ape_sum', 'actual_sum', 'actual_sq_sum']
+
+
+def error_sums(frame):
+    """model_error_sums increments of (model_version, coin_id, horizon, predicted, actual) rows"""
+    predicted = frame['predicted'].to_numpy(dtype=float)
+    actual = frame['actual'].to_numpy(dtype=float)
+    error = predicted - actual
+    valid = np.isfinite(error) & (actual > 0)
+    rows = frame.loc[valid, KEYS].copy()
+    rows['model_version'] = rows['model_version'].fillna('')
+    error, actual = error[valid], actual[valid]
+    rows['sample_count'] = 1
+    rows['abs_error_sum'] = np.abs(error)
+    rows['sq_error_sum'] = error ** 2
+    rows['ape_sum'] = np.abs(error) / actual
+    rows['actual_sum'] = actual
+    rows['actual_sq_sum'] = actual ** 2
+    return rows.groupby(KEYS, as_index=False, sort=True)[SUMS].sum()
+
+
+def metrics_from_sums(sums, by):
+    """Error metrics of the model_error_sums rows grouped by `by`.
+
+    MAE, RMSE and MAPE come per horizon; r2, the accuracy (100 - MAPE%) and
+    sample_size pool every horizon of the group. r2 uses the total sum of
+    squares of the pooled actual prices, from their sum and sum of squares.
+    """
+    columns = ['sample_count', 'abs_error_sum', 'sq_error_sum', 'ape_sum']
+    per_horizon = sums.pivot_table(index=by, columns='horizon', values=columns, aggfunc='sum', fill_value=0)
+    pooled = sums.groupby(by)[SUMS].sum()
+    per_horizon = per_horizon.reindex(pooled.index, fill_value=0)
+    n = pooled['sample_count'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total = pooled['actual_sq_sum'].to_numpy() - pooled['actual_sum'].to_numpy() ** 2 / n
+        r2 = np.where(total > 0, 1.0 - pooled['sq_error_sum'].to_numpy() / total, np.nan)
+        mape = pooled['ape_sum'].to_numpy() / n
+    result = pd.DataFrame({
+        'sample_size': n.astype(int),
+        'r2_score': r2,
+        'mape': mape,
+        'accuracy': np.clip(100.0 * (1.0 - mape), 0.0, 100.0)
+    }, index=pooled.index)
+    for name in HORIZON_NAMES:
+        if name in per_horizon['sample_count'].columns:
+            count = per_horizon['sample_count'][name].to_numpy(dtype=float)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result[f'mae_{name}'] = np.where(count > 0, per_horizon['abs_error_sum'][name].to_numpy() / count, np.nan)
+                result[f'rmse_{name}'] = np.where(count > 0, np.sqrt(per_horizon['sq_error_sum'][name].to_numpy() / count), np.nan)
+        else:
+            result[f'mae_{name}'] = np.nan
+            result[f'rmse_{name}'] = np.nan
+    return result.reset_index()
+
+
+class ModelEvaluator:
+    """Prediction accuracy per model_version and coin from running error sums.
+
+    model_error_sums holds, per model_version x coin x horizon, the count and
+    the sums of |error|, error^2, |error|/actual, actual and actual^2. The
+    prediction resolver folds each value it resolves into these sums in the
+    same transaction (fold). Metrics for any grouping then come from a few
+    rows per model rather than from the predictions history.
+
+    The fold keeps its own count of folded values next to the resolver's count
+    of resolved ones. Until the first run() builds the sums from the
+    predictions table, nothing is folded. If the two counts differ later,
+    values were resolved without being folded, and run() rebuilds again.
+    Each run also appends a model_performance_metrics snapshot when
+    anything new was resolved.
+    """
+
+    job_name = 'model_evaluator'
+    sums_job = 'model_error_sums'
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _folded(self, conn):
+        """Values folded into the sums, or None before they were first built"""
+        value = conn.exec_driver_sql(
+            "SELECT high_water_mark FROM job_watermarks WHERE job_name = ?", (self.sums_job,)
+        ).scalar()
+        return int(value) if value is not None else None
+
+    def fold(self, conn, frame, written):
+        """Add newly resolved values to the sums; `written` is the count the resolver adds to its mark"""
+        folded = self._folded(conn)
+        if folded is None:
+            # Not built yet; the evaluator's first run builds them from every resolved value
+            return
+        sums = error_sums(frame)
+        if not sums.empty:
+            source = f"SELECT {', '.join('?' for _ in KEYS + SUMS)}"
+            conn.exec_driver_sql(
+                self.db.sql.merge_add('model_error_sums', KEYS, SUMS, source),
+                [tuple(row) for row in sums[KEYS + SUMS].itertuples(index=False, name=None)]
+            )
+        set_watermark(conn, self.sums_job, folded + written)
+
+    def rebuild(self):
+        """Recompute the sums, and missing accuracy scores, from every resolved prediction"""
+        columns = ', '.join(f'prediction_{name}, actual_price_{name}' for name in HORIZON_NAMES)
+        resolved = ' OR '.join(f'actual_price_{name} IS NOT NULL' for name in HORIZON_NAMES)
+        with self.db.connection() as conn:
+            df = pd.read_sql_query(f"""
+                SELECT prediction_id, coin_id, model_version, accuracy_score, {columns}
+                FROM predictions
+                WHERE coin_id IS NOT NULL AND ({resolved})
+            """, conn)
+            predicted = df[[f'prediction_{name}' for name in HORIZON_NAMES]].to_numpy(dtype=float)
+            actual = df[[f'actual_price_{name}' for name in HORIZON_NAMES]].to_numpy(dtype=float)
+
+            frame = pd.DataFrame({
+                'model_version': np.repeat(df['model_version'].to_numpy(dtype=object), len(HORIZON_NAMES)),
+                'coin_id': np.repeat(df['coin_id'].to_numpy(), len(HORIZON_NAMES)),
+                'horizon': np.tile(HORIZON_NAMES, len(df)),
+                'predicted': predicted.ravel(),
+                'actual': actual.ravel()
+            })
+            conn.exec_driver_sql("DELETE FROM model_error_sums")
+            set_watermark(conn, self.sums_job, 0)
+            self.fold(conn, frame, 0)
+
+            scores = accuracy_scores(predicted, actual)
+            missing = df['accuracy_score'].isna().to_numpy() & ~np.isnan(scores)
+            if missing.any():
+                conn.exec_driver_sql(
+                    "UPDATE predictions SET accuracy_score = ? WHERE prediction_id = ?",
+                    list(zip(np.round(scores[missing], 2).tolist(), df['prediction_id'].to_numpy()[missing].tolist()))
+                )
+            set_watermark(conn, self.sums_job, get_watermark(conn, self.db.prediction_resolver.job_name))
+            conn.commit()
+        logger.info("Rebuilt model_error_sums from %d resolved predictions", len(df))
+        return len(df)
+
+    def _sums(self, conn, coin_ids=None, horizon=None):
+        conditions = ['1 = 1']
+        params = []
+        if coin_ids is not None:
+            conditions.append(id_filter('coin_id', coin_ids))
+            params.extend(coin_ids)
+        if horizon is not None:
+            conditions.append('horizon = ?')
+            params.append(horizon)
+        df = pd.read_sql_query(
+            f"SELECT {', '.join(KEYS + SUMS)} FROM model_error_sums WHERE {' AND '.join(conditions)}",
+            conn, params=tuple(params)
+        )
+        for column in SUMS:
+            df[column] = df[column].astype(float)
+        return df
+
+    def run(self):
+        """Rebuild the sums if they lag the resolver, then snapshot the metrics; returns rows written"""
+        with self.db.connection() as conn:
+            resolved = get_watermark(conn, self.db.prediction_resolver.job_name)
+            folded = self._folded(conn)
+            evaluated = get_watermark(conn, self.job_name)
+            conn.commit()
+        rebuilt = folded != resolved
+        if rebuilt:
+            self.rebuild()
+        elif evaluated == resolved:
+            return 0
+
+        with self.db.connection() as conn:
+            sums = self._sums(conn)
+            if sums.empty:
+                set_watermark(conn, self.job_name, resolved)
+                conn.commit()
+                return 0
+            per_coin = metrics_from_sums(sums, ['model_version', 'coin_id'])
+            # coin_id NULL rows pool every coin of a model
+            overall = metrics_from_sums(sums, ['model_version']).assign(coin_id=None)
+            metrics = pd.concat([per_coin, overall], ignore_index=True)
+
+            columns = (['model_version', 'coin_id'] + [f'mae_{name}' for name in HORIZON_NAMES]
+                       + [f'rmse_{name}' for name in HORIZON_NAMES] + ['r2_score', 'sample_size'])
+            metrics['r2_score'] = metrics['r2_score'].clip(-999999, 1).round(4)
+            metrics['model_version'] = metrics['model_version'].replace('', None)
+            rows = [
+                tuple(None if isinstance(value, float) and np.isnan(value) else value for value in row)
+                for row in metrics[columns].astype(object).itertuples(index=False, name=None)
+            ]
+            conn.exec_driver_sql(
+                f"INSERT INTO model_performance_metrics (evaluation_date, {', '.join(columns)}) "
+                f"VALUES ({self.db.sql.now()}, {', '.join('?' for _ in columns)})",
+                rows
+            )
+            set_watermark(conn, self.job_name, resolved)
+            conn.commit()
+        logger.info("Evaluated %d model/coin combinations", len(rows))
+        return len(rows)
+
+    def leaderboard(self, coin_ids=None, horizon=None, per_coin=False):
+        """Models ranked by accuracy, best first, from the running sums"""
+        with self.db.connection() as conn:
+            sums = self._sums(conn, coin_ids, horizon)
+        if sums.empty:
+            return []
+        by = ['model_version', 'coin_id'] if per_coin else ['model_version']
+        metrics = metrics_from_sums(sums, by).sort_values(['accuracy', 'sample_size'], ascending=[False, False])
+        metrics['model_version'] = metrics['model_version'].replace('', None)
+        return [
+            {key: (None if isinstance(value, float) and np.isnan(value) else value) for key, value in row.items()}
+            for row in metrics.astype(object).to_dict('records')
+        ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate prediction accuracy per model into model_performance_metrics")
+    parser.add_argument('--once', action='store_true', help="run a single pass and exit")
+    parser.add_argument('--interval', type=int, default=MODEL_EVAL_INTERVAL, help="seconds between passes")
+    parser.add_argument('--rebuild', action='store_true', help="recompute the running sums from all predictions first")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    if args.rebuild:
+        db_manager.model_evaluator.rebuild()
+    while True:
+        try:
+            written = db_manager.model_evaluator.run()
+            logger.info("Model metrics rows written: %d", written)
+        except Exception:
+            logger.exception("Error evaluating models")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
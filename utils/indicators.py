@@ -0,0 +1,311 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from config import (
+    PRICE_STORE_ENABLED, INDICATOR_SMA_WINDOW, INDICATOR_EMA_SPAN, INDICATOR_RSI_PERIOD, INDICATOR_MACD,
+    INDICATOR_BOLLINGER_WINDOW, INDICATOR_BOLLINGER_STDS, INDICATOR_VOLATILITY_WINDOW, INDICATOR_HISTORY_DAYS,
+    INDICATOR_CACHE_MAX_COINS
+)
+from utils.coins import id_filter
+from utils.lazy import lazy_import
+from utils.singleflight import SingleFlight
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Output columns, in response order; ?indicators= picks groups of them
+INDICATORS = {
+    'sma': ['sma'],
+    'ema': ['ema'],
+    'rsi': ['rsi'],
+    'macd': ['macd', 'macd_signal', 'macd_hist'],
+    'bollinger': ['bb_upper', 'bb_middle', 'bb_lower'],
+    'volatility': ['volatility']
+}
+
+
+def ema(values, span=None, alpha=None, initial=None):
+    """Exponential moving average (recursive form), continuing from `initial` when given"""
+    alpha = alpha if alpha is not None else 2.0 / (span + 1)
+    if len(values) == 0:
+        return np.asarray(values, dtype=float)
+    if initial is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    # Seeding the recursion with the previous value continues it exactly
+    seeded = np.concatenate(([initial], values))
+    return pd.Series(seeded).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def rolling_windows(history, values, window):
+    """Windows of `window` values ending at each of `values`, `history` holding the values before them.
+
+    Returns the (n, window) view for the points that have a full window and
+    the number of leading points that do not.
+    """
+    joined = np.concatenate((history, values))
+    if len(joined) < window:
+        return np.empty((0, window)), len(values)
+    windows = np.lib.stride_tricks.sliding_window_view(joined, window)
+    # windows[i] ends at joined[i + window - 1]; keep those ending at one of `values`
+    skip = max(len(history) - window + 1, 0)
+    windows = windows[skip:]
+    return windows, len(values) - len(windows)
+
+
+def _padded(values, missing):
+    return np.concatenate((np.full(missing, np.nan), values)) if missing else values
+
+
+class IndicatorState:
+    """Computed indicator columns of one coin plus what is needed to extend them.
+
+    Besides the output arrays it keeps the last EMA values (fast and slow
+    MACD lines, signal line, the plain EMA and Wilder's RSI averages), the
+    last price and the tails of the price and log-return series that the
+    rolling windows still need.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+        self.timestamps = np.empty(0, dtype='datetime64[ns]')
+        self.columns = {'price': np.empty(0)}
+        for names in INDICATORS.values():
+            for name in names:
+                self.columns[name] = np.empty(0)
+        self.ema = None
+        self.ema_fast = None
+        self.ema_slow = None
+        self.ema_signal = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.last_price = None
+        self.price_tail = np.empty(0)
+        self.return_tail = np.empty(0)
+
+    def extend(self, timestamps, prices):
+        """Append rows in timestamp order; only the new rows are computed"""
+        keep = ~np.isnan(prices)
+        timestamps, prices = timestamps[keep], prices[keep]
+        if len(prices) == 0:
+            return
+        fast, slow, signal = INDICATOR_MACD
+        new = {'price': prices}
+
+        # SMA and Bollinger bands over the price windows ending at each new row
+        windows, missing = rolling_windows(self.price_tail, prices, INDICATOR_SMA_WINDOW)
+        new['sma'] = _padded(windows.mean(axis=1), missing)
+        windows, missing = rolling_windows(self.price_tail, prices, INDICATOR_BOLLINGER_WINDOW)
+        middle = windows.mean(axis=1)
+        width = INDICATOR_BOLLINGER_STDS * windows.std(axis=1)
+        new['bb_middle'] = _padded(middle, missing)
+        new['bb_upper'] = _padded(middle + width, missing)
+        new['bb_lower'] = _padded(middle - width, missing)
+
+        # EMA and MACD continue from the stored last values
+        new['ema'] = ema(prices, INDICATOR_EMA_SPAN, initial=self.ema)
+        fast_line = ema(prices, fast, initial=self.ema_fast)
+        slow_line = ema(prices, slow, initial=self.ema_slow)
+        macd = fast_line - slow_line
+        signal_line = ema(macd, signal, initial=self.ema_signal)
+        new['macd'], new['macd_signal'], new['macd_hist'] = macd, signal_line, macd - signal_line
+
+        # Price changes need the previous price, the first row ever has none
+        previous = np.concatenate(([self.last_price], prices[:-1])) if self.last_price is not None else prices[:-1]
+        changes = prices[len(prices) - len(previous):] - previous
+        lead = len(prices) - len(changes)
+
+        # RSI with Wilder's smoothing (an EMA with alpha = 1 / period)
+        alpha = 1.0 / INDICATOR_RSI_PERIOD
+        gains = ema(np.clip(changes, 0, None), alpha=alpha, initial=self.avg_gain)
+        losses = ema(np.clip(-changes, 0, None), alpha=alpha, initial=self.avg_loss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = np.where(losses > 0, 100.0 - 100.0 / (1.0 + gains / losses), np.where(gains > 0, 100.0, 50.0))
+        new['rsi'] = _padded(rsi, lead)
+
+        # Realized volatility: root of the summed squared log returns in the window
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.log(prices[lead:] / previous)
+        returns = np.where(np.isfinite(returns), returns, 0.0)
+        windows, missing = rolling_windows(self.return_tail, returns, INDICATOR_VOLATILITY_WINDOW)
+        new['volatility'] = _padded(np.sqrt((windows ** 2).sum(axis=1)), missing + lead)
+
+        self.timestamps = np.concatenate((self.timestamps, timestamps))
+        for name, values in new.items():
+            self.columns[name] = np.concatenate((self.columns[name], values))
+        self.ema, self.ema_fast, self.ema_slow = new['ema'][-1], fast_line[-1], slow_line[-1]
+        self.ema_signal = signal_line[-1]
+        if len(changes):
+            self.avg_gain, self.avg_loss = gains[-1], losses[-1]
+        self.last_price = prices[-1]
+        tail = max(INDICATOR_SMA_WINDOW, INDICATOR_BOLLINGER_WINDOW) - 1
+        self.price_tail = np.concatenate((self.price_tail, prices))[-tail:] if tail else np.empty(0)
+        tail = INDICATOR_VOLATILITY_WINDOW - 1
+        self.return_tail = np.concatenate((self.return_tail, returns))[-tail:] if tail else np.empty(0)
+
+    def copy(self):
+        """Shallow copy; extend() replaces arrays rather than writing into them"""
+        clone = IndicatorState.__new__(IndicatorState)
+        clone.__dict__.update(self.__dict__)
+        clone.columns = dict(self.columns)
+        return clone
+
+    def trim(self, start_time):
+        """Drop output rows before start_time; the carried state is unaffected"""
+        cut = np.searchsorted(self.timestamps, np.datetime64(start_time, 'ns'), side='left')
+        if cut:
+            self.timestamps = self.timestamps[cut:]
+            self.columns = {name: values[cut:] for name, values in self.columns.items()}
+
+    def slice(self, start_time):
+        """(timestamps, {column: values}) from start_time on, as views"""
+        start = np.searchsorted(self.timestamps, np.datetime64(start_time, 'ns'), side='left')
+        return self.timestamps[start:], {name: values[start:] for name, values in self.columns.items()}
+
+
+class IndicatorCache:
+    """Technical indicators of each coin, kept up to date incrementally.
+
+    The first request for a coin computes INDICATOR_HISTORY_DAYS of history
+    and keeps the result together with the indicator state. Later requests
+    read only the Price_Data rows above the highest id seen, ordered by
+    timestamp, and extend the arrays with them. The coin_price watermark
+    tells when there is nothing new, so a current state costs no query. A
+    late row (older than the last one computed) cannot be appended and
+    causes a rebuild. The least recently used coins are dropped past
+    INDICATOR_CACHE_MAX_COINS.
+    """
+
+    def __init__(self, db_manager, max_coins=INDICATOR_CACHE_MAX_COINS):
+        self.db = db_manager
+        self.max_coins = max_coins
+        self._lock = threading.Lock()
+        self._states = OrderedDict()
+        self.single_flight = SingleFlight()
+        self.builds = 0
+        self.extensions = 0
+        self.rows_appended = 0
+        self.hits = 0
+
+    def _history(self, coin_ids, start_time):
+        """Highest id and (timestamps, prices) of the initial window, from the price store when it has the coin"""
+        if PRICE_STORE_ENABLED and len(coin_ids) == 1:
+            stored = self.db.price_store.slice(coin_ids[0], start_time)
+            if stored is not None:
+                last_id, (timestamps, prices, _) = stored
+                return last_id, np.array(timestamps), np.array(prices, dtype=float)
+        query = f"""
+        SELECT id, timestamp, price_usd as price
+        FROM Price_Data
+        WHERE {id_filter('coin_id', coin_ids)} AND timestamp >= ?
+        ORDER BY timestamp, id
+        """
+        df = self.db.read_sql(query, (*coin_ids, start_time.strftime('%Y-%m-%d %H:%M:%S')), name='indicator_history')
+        df = self.db.with_archive(
+            'Price_Data', df, {'id': 'id', 'timestamp': 'timestamp', 'price': 'price_usd'},
+            coin_ids, start_time, order_by='timestamp'
+        )
+        return self._arrays(df)
+
+    def _new_rows(self, coin_ids, after_id, start_time):
+        """Rows above after_id within the history window (after_id is 0 for a coin with no rows yet)"""
+        query = f"""
+        SELECT id, timestamp, price_usd as price
+        FROM Price_Data
+        WHERE {id_filter('coin_id', coin_ids)} AND id > ? AND timestamp >= ?
+        ORDER BY timestamp, id
+        """
+        params = (*coin_ids, after_id, start_time.strftime('%Y-%m-%d %H:%M:%S'))
+        return self._arrays(self.db.read_sql(query, params, name='indicator_rows'))
+
+    @staticmethod
+    def _arrays(df):
+        if df.empty:
+            return 0, np.empty(0, dtype='datetime64[ns]'), np.empty(0)
+        return (
+            int(pd.to_numeric(df['id']).max()),
+            pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]'),
+            pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=float)
+        )
+
+    def _build(self, coin_ids):
+        start_time = datetime.now() - timedelta(days=INDICATOR_HISTORY_DAYS)
+        last_id, timestamps, prices = self._history(coin_ids, start_time)
+        # Rows the price store has not copied yet
+        new_id, new_timestamps, new_prices = self._new_rows(coin_ids, last_id, start_time)
+        if len(new_timestamps):
+            timestamps = np.concatenate((timestamps, new_timestamps))
+            prices = np.concatenate((prices, new_prices))
+            order = np.argsort(timestamps, kind='stable')
+            timestamps, prices, last_id = timestamps[order], prices[order], max(last_id, new_id)
+        state = IndicatorState()
+        state.extend(timestamps, prices)
+        state.last_id = last_id
+        self._count('builds')
+        return state
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _update(self, coin):
+        coin_ids = self.db.coins.coin_ids(coin)
+        if not coin_ids:
+            return None
+        with self._lock:
+            state = self._states.get(coin)
+            if state is not None:
+                self._states.move_to_end(coin)
+        if state is None:
+            state = self._build(coin_ids)
+        else:
+            if len(coin_ids) == 1:
+                mark = self.db.watermarks.lookup(['coin_price'], coin)[0]
+                if not mark or mark[0] is None or int(mark[0]) <= state.last_id:
+                    self._count('hits')
+                    return state
+            start_time = datetime.now() - timedelta(days=INDICATOR_HISTORY_DAYS)
+            last_id, timestamps, prices = self._new_rows(coin_ids, state.last_id, start_time)
+            if len(timestamps) and len(state.timestamps) and timestamps[0] < state.timestamps[-1]:
+                logger.info("Late Price_Data row for %s, rebuilding its indicators", coin)
+                state = self._build(coin_ids)
+            elif len(timestamps):
+                # Extend a copy so requests still reading the current state are unaffected
+                state = state.copy()
+                state.extend(timestamps, prices)
+                state.last_id = last_id
+                state.trim(start_time)
+                self._count('extensions')
+                self._count('rows_appended', len(timestamps))
+            else:
+                self._count('hits')
+                return state
+        with self._lock:
+            self._states[coin] = state
+            self._states.move_to_end(coin)
+            while len(self._states) > self.max_coins:
+                self._states.popitem(last=False)
+        return state
+
+    def get(self, coin, start_time):
+        """(timestamps, {column: values}) of a coin from start_time on, or None for an unknown coin"""
+        state, _ = self.single_flight.do(coin, lambda: self._update(coin))
+        return state.slice(start_time) if state is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+
+    def stats(self):
+        with self._lock:
+            rows = sum(len(state.timestamps) for state in self._states.values())
+            coins = len(self._states)
+        return {
+            'coins': coins,
+            'rows': rows,
+            'builds': self.builds,
+            'extensions': self.extensions,
+            'rows_appended': self.rows_appended,
+            'hits': self.hits
+        }
@@ -0,0 +1,36 @@
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access.
+
+    Once loaded, the module's attributes are copied onto the stand-in so later
+    lookups such as `pd.DataFrame` are plain attribute reads.
+    """
+
+    def __init__(self, name):
+        self.__name = name
+        self.__module = None
+
+    def __load(self):
+        with _lock:
+            if self.__module is None:
+                module = importlib.import_module(self.__name)
+                self.__dict__.update(module.__dict__)
+                self.__module = module
+        return self.__module
+
+    def __getattr__(self, attr):
+        return getattr(self.__load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__module is not None else 'not loaded'
+        return f"<lazy module '{self.__name}' ({state})>"
+
+
+def lazy_import(name):
+    """`name` as a module that is only imported when first used"""
+    return LazyModule(name)
@@ -0,0 +1,146 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, from sub-millisecond cache hits to multi-second scans
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Row-count buckets for query results
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label set"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, in the Prometheus sense"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in sorted(self._series.items())]
+        samples = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                samples.append((f'{self.name}_bucket', _format_labels(self.labels, key, [('le', le)]), cumulative))
+            samples.append((f'{self.name}_sum', _format_labels(self.labels, key), total))
+            samples.append((f'{self.name}_count', _format_labels(self.labels, key), count))
+        return samples
+
+
+class Gauge:
+    """Values read from a callback at scrape time: {label values tuple: value}"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels, collect):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def samples(self):
+        return [(self.name, _format_labels(self.labels, key), value) for key, value in sorted(self.collect().items())]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name, help_text, labels, collect):
+        return self.register(Gauge(name, help_text, labels, collect))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                continue
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_format_value(value)}' for name, labels, value in samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+request_latency = registry.histogram(
+    'dashboard_request_duration_seconds', 'Request latency per route', ('route', 'method', 'status')
+)
+response_bytes = registry.counter(
+    'dashboard_response_bytes_total', 'Response body bytes per route', ('route',)
+)
+json_serialize_seconds = registry.histogram(
+    'dashboard_json_serialize_seconds', 'Time spent serializing JSON per route', ('route',)
+)
+query_phase_seconds = registry.histogram(
+    'dashboard_query_phase_seconds', 'Query time per phase (execute, fetch, dataframe)', ('query', 'phase')
+)
+query_rows = registry.histogram(
+    'dashboard_query_rows', 'Rows returned per query', ('query',), buckets=ROW_BUCKETS
+)
+pool_wait_seconds = registry.histogram(
+    'dashboard_pool_checkout_seconds', 'Time to check a connection out of the pool', ('waited',)
+)
+slow_queries = registry.counter(
+    'dashboard_slow_queries_total', 'Queries over SLOW_QUERY_THRESHOLD_MS', ('query',)
+)
@@ -0,0 +1,217 @@
+import logging
+import argparse
+import time
+from datetime import datetime
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+from config import PREDICTION_RESOLVE_INTERVAL, PREDICTION_RESOLVE_GRACE_DAYS, LOG_LEVEL
+from utils.rollups import get_watermark, set_watermark
+
+logger = logging.getLogger(__name__)
+
+# Prediction horizons as (column suffix, unit, amount) after prediction_date
+HORIZONS = [
+    ('24h', 'hour', 24),
+    ('7d', 'day', 7),
+    ('30d', 'day', 30),
+    ('90d', 'day', 90)
+]
+
+
+def horizon_offset(unit, amount):
+    return np.timedelta64(amount, 'h' if unit == 'hour' else 'D')
+
+
+def accuracy_scores(predicted, actual):
+    """accuracy_score of each row of (n, horizons) predicted/actual matrices.
+
+    100 minus the mean absolute percentage error over the resolved horizons,
+    floored at 0; NaN when no horizon is resolved.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ape = np.abs(predicted - actual) / actual
+    ape = np.where(np.isfinite(ape) & (actual > 0), ape, np.nan)
+    resolved = (~np.isnan(ape)).sum(axis=1)
+    mean = np.nansum(ape, axis=1) / np.maximum(resolved, 1)
+    return np.where(resolved > 0, np.clip(100.0 * (1.0 - mean), 0.0, 100.0), np.nan)
+
+
+class PredictionResolver:
+    """Fills actual_price_* and prediction_error_* once a prediction's horizon has elapsed.
+
+    The actual price for a horizon is the first Price_Data price at or after
+    prediction_date + horizon, the same rule vw_predictions applies per row.
+    Here it is resolved per coin as a forward as-of join of the sorted due
+    times against the sorted price series. prediction_error_* is stored as
+    prediction - actual. accuracy_score is refreshed over the horizons resolved
+    so far, and every new value is folded into the model evaluator's running
+    error sums in the same transaction.
+
+    A horizon that has no price yet PREDICTION_RESOLVE_GRACE_DAYS after it
+    fell due (a delisted coin, a gap in collection) is no longer looked at,
+    so it neither stays pending forever nor drags the price reads back. The
+    first pass (watermark still 0) has no such window and backfills every
+    historical horizon, as vw_predictions computed them on the fly.
+    """
+
+    job_name = 'prediction_resolver'
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _pending(self, conn, grace_days=None):
+        """Predictions with at least one horizon that elapsed (within grace_days, if given) and is not resolved yet"""
+        sql = self.db.sql
+        now = sql.now()
+        conditions = []
+        for name, unit, amount in HORIZONS:
+            due = sql.date_add(unit, -amount, now)
+            condition = f"actual_price_{name} IS NULL AND prediction_date <= {due}"
+            if grace_days is not None:
+                condition += f" AND prediction_date > {sql.date_add('day', -grace_days, due)}"
+            conditions.append(f"({condition})")
+        conditions = ' OR '.join(conditions)
+        query = f"""
+        SELECT
+            prediction_id, coin_id, prediction_date, model_version,
+            prediction_24h, prediction_7d, prediction_30d, prediction_90d,
+            actual_price_24h, actual_price_7d, actual_price_30d, actual_price_90d
+        FROM predictions
+        WHERE coin_id IS NOT NULL AND prediction_date IS NOT NULL AND ({conditions})
+        ORDER BY coin_id, prediction_date
+        """
+        df = pd.read_sql_query(query, conn)
+        df['prediction_date'] = pd.to_datetime(df['prediction_date'])
+        return df
+
+    def _prices(self, conn, coin_id, since):
+        """Sorted price series of one coin from `since` onwards"""
+        query = """
+        SELECT price_date, price_usd
+        FROM Price_Data
+        WHERE coin_id = ? AND price_date >= ?
+        ORDER BY price_date
+        """
+        df = pd.read_sql_query(query, conn, params=(int(coin_id), since.strftime('%Y-%m-%d %H:%M:%S')))
+        # Old horizons may reach into archived Price_Data
+        df = self.db.with_archive(
+            'Price_Data', df, {'price_date': 'price_date', 'price_usd': 'price_usd'}, [coin_id], since.to_pydatetime(),
+            order_by='price_date'
+        )
+        return (
+            pd.to_datetime(df['price_date']).to_numpy(dtype='datetime64[ns]'),
+            df['price_usd'].astype(float).to_numpy()
+        )
+
+    def resolve(self, now=None, grace_days=PREDICTION_RESOLVE_GRACE_DAYS):
+        """Resolve every newly elapsed horizon; returns the number of values written per horizon"""
+        now = np.datetime64(now or datetime.now(), 'ns')
+        offsets = {name: horizon_offset(unit, amount) for name, unit, amount in HORIZONS}
+        updates = {name: [] for name in offsets}
+        resolved = []
+        scores = []
+
+        with self.db.connection() as conn:
+            if get_watermark(conn, self.job_name) == 0:
+                # Nothing resolved yet: backfill the whole history once
+                grace_days = None
+            oldest_due = now - np.timedelta64(grace_days, 'D') if grace_days is not None else None
+            pending = self._pending(conn, grace_days)
+
+            for coin_id, group in pending.groupby('coin_id', sort=False):
+                group = group.copy()
+                changed = np.zeros(len(group), dtype=bool)
+                dates = group['prediction_date'].to_numpy(dtype='datetime64[ns]')
+                masks = {
+                    name: group[f'actual_price_{name}'].isna().to_numpy()
+                    & (dates + offset <= now)
+                    & ((dates + offset > oldest_due) if oldest_due is not None else True)
+                    for name, offset in offsets.items()
+                }
+                first_due = min((dates[masks[name]] + offset).min() for name, offset in offsets.items() if masks[name].any())
+                price_times, prices = self._prices(conn, coin_id, pd.Timestamp(first_due))
+                if len(prices) == 0:
+                    continue
+
+                for name, offset in offsets.items():
+                    mask = masks[name]
+                    if not mask.any():
+                        continue
+                    due = dates[mask] + offset
+                    idx = np.searchsorted(price_times, due, side='left')
+                    found = idx < len(prices)
+                    actual = prices[idx[found]]
+                    predicted = group[f'prediction_{name}'].to_numpy(dtype=float)[mask][found]
+                    error = predicted - actual
+                    ids = group['prediction_id'].to_numpy()[mask][found]
+                    updates[name].extend(zip(
+                        np.round(actual, 8).tolist(),
+                        [None if np.isnan(e) else round(e, 8) for e in error.tolist()],
+                        ids.tolist()
+                    ))
+                    resolved.append(pd.DataFrame({
+                        'model_version': group['model_version'].to_numpy(dtype=object)[mask][found],
+                        'coin_id': coin_id,
+                        'horizon': name,
+                        'predicted': predicted,
+                        'actual': actual
+                    }))
+                    rows = np.flatnonzero(mask)[found]
+                    group.iloc[rows, group.columns.get_loc(f'actual_price_{name}')] = actual
+                    changed[rows] = True
+
+                predicted = group[[f'prediction_{name}' for name in offsets]].to_numpy(dtype=float)
+                actuals = group[[f'actual_price_{name}' for name in offsets]].to_numpy(dtype=float)
+                accuracy = accuracy_scores(predicted, actuals)
+                keep = changed & ~np.isnan(accuracy)
+                scores.extend(zip(np.round(accuracy[keep], 2).tolist(), group['prediction_id'].to_numpy()[keep].tolist()))
+
+        self._write(updates, resolved, scores)
+        return {name: len(rows) for name, rows in updates.items()}
+
+    def _write(self, updates, resolved, scores):
+        with self.db.connection() as conn:
+            written = 0
+            for name, rows in updates.items():
+                if rows:
+                    conn.exec_driver_sql(
+                        f"UPDATE predictions SET actual_price_{name} = ?, prediction_error_{name} = ? "
+                        f"WHERE prediction_id = ?",
+                        rows
+                    )
+                    written += len(rows)
+            if scores:
+                conn.exec_driver_sql("UPDATE predictions SET accuracy_score = ? WHERE prediction_id = ?", scores)
+            if written:
+                self.db.model_evaluator.fold(conn, pd.concat(resolved, ignore_index=True), written)
+                # Running count of resolved values; readers use it as a change marker
+                set_watermark(conn, self.job_name, get_watermark(conn, self.job_name) + written)
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve actual prices of elapsed predictions")
+    parser.add_argument('--once', action='store_true', help="run a single pass and exit")
+    parser.add_argument('--interval', type=int, default=PREDICTION_RESOLVE_INTERVAL, help="seconds between passes")
+    parser.add_argument('--grace-days', type=int, default=PREDICTION_RESOLVE_GRACE_DAYS,
+                        help="days after a horizon falls due that it is still resolved "
+                             "(the first pass backfills all of them)")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    while True:
+        try:
+            counts = db_manager.resolve_prediction_actuals(grace_days=args.grace_days)
+            logger.info("Resolved prediction actuals: %s", counts)
+        except Exception:
+            logger.exception("Error resolving prediction actuals")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from config import PRICE_STORE_DIR, PRICE_STORE_INTERVAL, LOG_LEVEL
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Column files of a coin: name -> dtype
+COLUMNS = {
+    'timestamp': 'int64',  # naive datetime as nanoseconds since the epoch, sorted
+    'price': 'float64',
+    'volume': 'float64'
+}
+
+
+class PriceStore:
+    """Append-only per-coin copy of Price_Data in memory-mapped column files.
+
+    Each coin has a directory with one raw file per column and a meta.json
+    that holds the committed row count, the highest Price_Data id copied and
+    a generation number. The sync job (`python -m utils.price_store`) is the
+    only writer. It appends rows above the last id and then replaces
+    meta.json, so readers never see a partial append. If a batch would break
+    the timestamp order, the coin is rewritten as a new generation.
+
+    Readers map the files read-only, so worker processes share the pages
+    through the OS page cache. A range read is a binary search on the
+    timestamps followed by a slice of the mapped arrays.
+    """
+
+    def __init__(self, db_manager, root=PRICE_STORE_DIR):
+        self.db = db_manager
+        self.root = root
+        self._lock = threading.Lock()
+        self._maps = {}  # coin_id -> (meta mtime, meta, {column: memmap})
+
+    def _dir(self, coin_id):
+        return os.path.join(self.root, f'coin_{int(coin_id)}')
+
+    def _path(self, coin_id, column, generation):
+        return os.path.join(self._dir(coin_id), f'{column}.{generation}.bin')
+
+    def _read_meta(self, coin_id):
+        try:
+            with open(os.path.join(self._dir(coin_id), 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, coin_id, meta):
+        path = os.path.join(self._dir(coin_id), 'meta.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(path + '.tmp', path)
+
+    # Reading
+
+    def _arrays(self, coin_id):
+        """Mapped column arrays of a coin and its meta, or None when the coin has no store"""
+        meta_path = os.path.join(self._dir(coin_id), 'meta.json')
+        try:
+            stat = os.stat(meta_path)
+        except FileNotFoundError:
+            return None
+        mtime = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._maps.get(coin_id)
+        if cached and cached[0] == mtime:
+            return cached[1], cached[2]
+
+        meta = self._read_meta(coin_id)
+        if meta is None:
+            return None
+        count = meta['count']
+        if count == 0:
+            arrays = {column: np.empty(0, dtype=dtype) for column, dtype in COLUMNS.items()}
+        else:
+            arrays = {
+                column: np.memmap(self._path(coin_id, column, meta['generation']), dtype=dtype, mode='r', shape=(count,))
+                for column, dtype in COLUMNS.items()
+            }
+        with self._lock:
+            self._maps[coin_id] = (mtime, meta, arrays)
+        return meta, arrays
+
+    def slice(self, coin_id, start_time):
+        """Highest Price_Data id held and (timestamps, prices, volumes) from start_time on.
+
+        The arrays are views of the mapped files, timestamps as datetime64[ns].
+        Returns None when the coin has no store.
+        """
+        loaded = self._arrays(coin_id)
+        if loaded is None:
+            return None
+        meta, arrays = loaded
+        timestamps = arrays['timestamp']
+        start = np.searchsorted(timestamps, np.datetime64(start_time, 'ns').astype(np.int64), side='left')
+        return meta['last_id'], (
+            timestamps[start:].view('datetime64[ns]'),
+            arrays['price'][start:],
+            arrays['volume'][start:]
+        )
+
+    # Writing (sync job only)
+
+    def _fetch(self, coin_id, after_id):
+        """Price_Data rows of a coin above `after_id` as (ids, timestamp ns, price, volume) in id order"""
+        query = """
+        SELECT id, timestamp, price_usd as price, volume_24h as volume
+        FROM Price_Data
+        WHERE coin_id = ? AND id > ? AND timestamp IS NOT NULL
+        ORDER BY id
+        """
+        df = self.db.read_sql(query, (int(coin_id), int(after_id)), name='price_store_sync')
+        if after_id == 0 and self.db.archive.covers('Price_Data', None):
+            # A first build also copies the days already moved to cold storage
+            cold = self.db.archive.read(
+                'Price_Data', {'id': 'id', 'timestamp': 'timestamp', 'price': 'price_usd', 'volume': 'volume_24h'},
+                [coin_id]
+            )
+            df = pd.concat([cold, df], ignore_index=True).sort_values('id', kind='stable', ignore_index=True)
+        return (
+            df['id'].to_numpy(dtype=np.int64),
+            pd.to_datetime(df['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+            pd.to_numeric(df['price'], errors='coerce').to_numpy(dtype=np.float64),
+            pd.to_numeric(df['volume'], errors='coerce').to_numpy(dtype=np.float64)
+        )
+
+    def sync(self, coin_id):
+        """Append the coin's new Price_Data rows; returns the number of rows added"""
+        meta = self._read_meta(coin_id)
+        last_id = meta['last_id'] if meta else 0
+        ids, timestamps, prices, volumes = self._fetch(coin_id, last_id)
+        if len(ids) == 0 and meta is not None:
+            return 0
+        new = {'timestamp': timestamps, 'price': prices, 'volume': volumes}
+        os.makedirs(self._dir(coin_id), exist_ok=True)
+
+        loaded = self._arrays(coin_id) if meta else None
+        tail = loaded[1]['timestamp'][-1] if loaded and meta['count'] else None
+        in_order = bool(np.all(np.diff(timestamps) >= 0)) and (tail is None or len(timestamps) == 0 or timestamps[0] >= tail)
+
+        if meta is not None and in_order:
+            for column, values in new.items():
+                with open(self._path(coin_id, column, meta['generation']), 'r+b') as f:
+                    # Drop anything past the committed count left by an interrupted append
+                    f.truncate(meta['count'] * np.dtype(COLUMNS[column]).itemsize)
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(values, dtype=COLUMNS[column]).tobytes())
+            meta = {**meta, 'count': meta['count'] + len(ids), 'last_id': int(ids[-1])}
+        else:
+            # First build, or rows arrived out of timestamp order: write a new sorted generation
+            if loaded:
+                new = {column: np.concatenate([np.asarray(loaded[1][column]), values]) for column, values in new.items()}
+            order = np.argsort(new['timestamp'], kind='stable')
+            generation = (meta['generation'] + 1) if meta else 0
+            for column, values in new.items():
+                with open(self._path(coin_id, column, generation), 'wb') as f:
+                    f.write(np.ascontiguousarray(values[order], dtype=COLUMNS[column]).tobytes())
+            meta = {
+                'generation': generation,
+                'count': len(order),
+                'last_id': int(ids[-1]) if len(ids) else last_id
+            }
+        self._write_meta(coin_id, meta)
+        self._remove_old_generations(coin_id, meta['generation'])
+        return len(ids)
+
+    def _remove_old_generations(self, coin_id, generation):
+        for name in os.listdir(self._dir(coin_id)):
+            parts = name.split('.')
+            if len(parts) == 3 and parts[2] == 'bin' and parts[1] != str(generation):
+                try:
+                    os.remove(os.path.join(self._dir(coin_id), name))
+                except OSError:
+                    pass  # still mapped by a reader on a platform that forbids removing it
+
+    def sync_all(self):
+        """Sync every coin in the registry; returns {coin_id: rows added}"""
+        return {coin_id: self.sync(coin_id) for coin_id in self.db.coins.ids()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped per-coin price store")
+    parser.add_argument('--once', action='store_true', help="run a single sync and exit")
+    parser.add_argument('--interval', type=int, default=PRICE_STORE_INTERVAL, help="seconds between syncs")
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    while True:
+        try:
+            added = db_manager.price_store.sync_all()
+            logger.info("Price store synced, %d rows added", sum(added.values()))
+        except Exception:
+            logger.exception("Error syncing price store")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from config import PROFILE_SECRET, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_TOKEN_TTL
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATABASE_MODULE = os.path.join(ROOT, 'utils', 'database.py')
+
+# Breakdown categories, matched against the innermost frame that belongs to one
+CATEGORIES = ('database', 'pandas', 'json', 'other')
+_PATH_CATEGORIES = (
+    (f'{os.sep}pyodbc', 'database'),
+    (f'{os.sep}sqlalchemy{os.sep}', 'database'),
+    (f'{os.sep}sqlite3{os.sep}', 'database'),
+    (f'{os.sep}pandas{os.sep}', 'pandas'),
+    (f'{os.sep}numpy{os.sep}', 'pandas'),
+    (f'{os.sep}json{os.sep}', 'json'),
+)
+
+
+def sign(path, expires=None, secret=PROFILE_SECRET):
+    """Profile token for `path`: '<expiry epoch>.<hex HMAC-SHA256 of path|expiry>'"""
+    expires = int(expires if expires is not None else time.time() + PROFILE_TOKEN_TTL)
+    digest = hmac.new(secret.encode(), f'{path}|{expires}'.encode(), hashlib.sha256).hexdigest()
+    return f'{expires}.{digest}'
+
+
+def verify(token, path, secret=PROFILE_SECRET):
+    """True when `token` was signed for `path` with the configured secret and has not expired"""
+    if not secret or not token:
+        return False
+    expires, _, digest = token.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign(path, int(expires), secret).partition('.')[2], digest)
+
+
+def _frame_key(code):
+    filename = code.co_filename
+    if filename.startswith(ROOT):
+        filename = os.path.relpath(filename, ROOT)
+    return code.co_name, filename, code.co_firstlineno
+
+
+def _category(stack):
+    """Category of a root-to-leaf stack of code objects"""
+    for code in reversed(stack):
+        filename = code.co_filename
+        for fragment, category in _PATH_CATEGORIES:
+            if fragment in filename:
+                return category
+        if filename == DATABASE_MODULE and code.co_name == '_execute':
+            # No Python frame above it: the driver's C execute/fetch is running
+            return 'database'
+    return 'other'
+
+
+class SamplingProfiler:
+    """Wall-clock sampler of one thread's Python stack.
+
+    A daemon thread reads the target thread's frame every `interval` seconds
+    and weights each stack by the time since the previous sample, so time
+    blocked in the database driver counts as well as time on the CPU.
+    """
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}  # tuple of code objects, root first -> seconds
+        self.samples = 0
+        self.started = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self
+
+    def _run(self):
+        last = self.started
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack = tuple(reversed(stack))
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + (now - last)
+            self.samples += 1
+            last = now
+
+    def breakdown(self):
+        """Sampled seconds and share of the request per category"""
+        seconds = dict.fromkeys(CATEGORIES, 0.0)
+        for stack, weight in self.stacks.items():
+            seconds[_category(stack)] += weight
+        sampled = sum(seconds.values())
+        return {
+            'duration_ms': round(self.duration * 1000.0, 3),
+            'samples': self.samples,
+            'categories': {
+                category: {
+                    'ms': round(value * 1000.0, 3),
+                    'share': round(value / sampled, 4) if sampled else 0.0
+                }
+                for category, value in seconds.items()
+            }
+        }
+
+    def collapsed(self):
+        """Collapsed stacks ('frame;frame;frame weight' lines) with weights in microseconds"""
+        lines = []
+        for stack, weight in sorted(self.stacks.items(), key=lambda item: -item[1]):
+            names = ';'.join(f'{name} ({filename}:{line})' for name, filename, line in map(_frame_key, stack))
+            lines.append(f'{names} {max(int(weight * 1e6), 1)}')
+        return '\n'.join(lines) + '\n'
+
+    def speedscope(self, name):
+        """Sampled profile in the speedscope file format"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, weight in self.stacks.items():
+            sample = []
+            for code in stack:
+                key = _frame_key(code)
+                if key not in index:
+                    index[key] = len(frames)
+                    frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+                sample.append(index[key])
+            samples.append(sample)
+            weights.append(weight)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(weights),
+                'samples': samples,
+                'weights': weights
+            }],
+            'name': name,
+            'exporter': 'CryptoDashboard request profiler'
+        }
+
+
+def save(profiler, name, fmt, directory=PROFILE_DIR):
+    """Write a profile as speedscope JSON or collapsed stacks; returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    slug = name.strip('/').replace('/', '_') or 'root'
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    if fmt == 'collapsed':
+        path = os.path.join(directory, f'{stamp}_{slug}.collapsed.txt')
+        body = profiler.collapsed()
+    else:
+        path = os.path.join(directory, f'{stamp}_{slug}.speedscope.json')
+        body = json.dumps(profiler.speedscope(name))
+    with open(path, 'w') as f:
+        f.write(body)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sign a path for per-request profiling')
+    parser.add_argument('path', help='request path, e.g. /api/price/BTC')
+    parser.add_argument('--ttl', type=int, default=PROFILE_TOKEN_TTL, help='seconds the token stays valid')
+    args = parser.parse_args()
+    if not PROFILE_SECRET:
+        parser.error('PROFILE_SECRET is not set')
+    print(sign(args.path, time.time() + args.ttl))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Labels of the mentions chart distribution, in output order
+MENTIONS_CHART_LABELS = ['Positive', 'Neutral', 'Negative', 'Very Positive', 'Very Negative']
+
+# Sort modes of /api/mentions_chart
+MENTIONS_CHART_SORTS = ('total', 'positive', 'negative', 'name')
+
+
+def _symbol_runs(symbols):
+    """Start offsets of each symbol's run in a symbol-sorted column, and the symbols"""
+    symbols = np.asarray(symbols, dtype=object)
+    if len(symbols) == 0:
+        return np.array([], dtype=np.int64), symbols
+    starts = np.flatnonzero(np.r_[True, symbols[1:] != symbols[:-1]])
+    return starts, symbols[starts]
+
+
+def mentions_chart(df):
+    """Per-coin totals and label counts from symbol-sorted (symbol, sentiment_label, mentions) rows.
+
+    Returns the coins in symbol order together with the arrays the sort
+    modes order by, so sorting a cached chart is a single argsort.
+    """
+    totals = df.groupby('symbol')['mentions'].sum()
+    counts = df.pivot_table(
+        index='symbol', columns='sentiment_label', values='mentions', aggfunc='sum', fill_value=0
+    ).reindex(index=totals.index, columns=MENTIONS_CHART_LABELS, fill_value=0)
+    totals = totals.to_numpy(dtype=np.int64)
+    matrix = counts.to_numpy(dtype=np.int64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(totals[:, None] > 0, matrix * 100.0 / totals[:, None], 0.0)
+
+    symbols = counts.index.tolist()
+    coins = [
+        {
+            'symbol': symbol,
+            'total_mentions': total,
+            'sentiment_distribution': dict(zip(MENTIONS_CHART_LABELS, row))
+        }
+        for symbol, total, row in zip(symbols, totals.tolist(), matrix.tolist())
+    ]
+    return {
+        'coins': coins,
+        'totals': totals,
+        'positive_share': shares[:, MENTIONS_CHART_LABELS.index('Positive')],
+        'negative_share': shares[:, MENTIONS_CHART_LABELS.index('Negative')]
+    }
+
+
+def sort_mentions_chart(chart, sort_by):
+    """Coins of a mentions chart ordered by `sort_by`; ties keep symbol order"""
+    if sort_by == 'total':
+        order = np.argsort(-chart['totals'], kind='stable')
+    elif sort_by == 'positive':
+        order = np.argsort(-chart['positive_share'], kind='stable')
+    elif sort_by == 'negative':
+        order = np.argsort(-chart['negative_share'], kind='stable')
+    else:  # name, already symbol order
+        return list(chart['coins'])
+    coins = chart['coins']
+    return [coins[i] for i in order.tolist()]
+
+
+def sentiment_distribution(df):
+    """{symbol: {'total', 'distribution': {label: {'count', 'percentage'}}}} from symbol-sorted rows"""
+    starts, symbols = _symbol_runs(df['symbol'].to_numpy())
+    counts = df['mention_count'].to_numpy(dtype=np.int64)
+    if len(counts) == 0:
+        return {}
+    totals = np.add.reduceat(counts, starts).tolist()
+    labels = [str(label) for label in df['sentiment_label'].tolist()]
+    entries = [
+        {'count': count, 'percentage': percentage}
+        for count, percentage in zip(counts.tolist(), df['percentage'].to_numpy(dtype=float).tolist())
+    ]
+    ends = np.r_[starts[1:], len(counts)].tolist()
+    return {
+        symbol: {
+            'total': total,
+            'distribution': dict(zip(labels[start:end], entries[start:end]))
+        }
+        for symbol, total, start, end in zip(symbols.tolist(), totals, starts.tolist(), ends)
+    }
+
+
+def daily_sentiment(df, labels):
+    """Dates and per-label count lists from (date, sentiment_label, count) rows in one pass.
+
+    Dates keep their order of appearance; labels missing on a date count 0 and
+    labels outside `labels` are ignored.
+    """
+    dates, date_codes = pd.Index([]), np.array([], dtype=np.int64)
+    if not df.empty:
+        date_codes, dates = pd.factorize(df['date'].astype(str).str[:10])
+    label_codes = df['sentiment_label'].map({label: i for i, label in enumerate(labels)}).to_numpy()
+    known = ~pd.isna(label_codes)
+    matrix = np.zeros((len(dates), len(labels)), dtype=np.int64)
+    np.add.at(
+        matrix,
+        (date_codes[known], label_codes[known].astype(np.int64)),
+        df['count'].to_numpy(dtype=np.int64)[known]
+    )
+    return list(dates), {label: matrix[:, i].tolist() for i, label in enumerate(labels)}
@@ -0,0 +1,186 @@
+import logging
+import argparse
+import time
+from config import ROLLUP_BATCH_SIZE, ROLLUP_INTERVAL, LOG_LEVEL
+from utils.backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+
+def get_watermark(conn, job_name):
+    """Read a job's high-water mark (0 if the job has never run)"""
+    value = conn.exec_driver_sql(
+        "SELECT high_water_mark FROM job_watermarks WHERE job_name = ?", (job_name,)
+    ).scalar()
+    return int(value) if value is not None else 0
+
+
+def set_watermark(conn, job_name, value):
+    """Store a job's high-water mark; commit together with the work it covers"""
+    now = get_backend().now()
+    result = conn.exec_driver_sql(
+        f"UPDATE job_watermarks SET high_water_mark = ?, updated_at = {now} WHERE job_name = ?",
+        (value, job_name)
+    )
+    if result.rowcount == 0:
+        conn.exec_driver_sql(
+            f"INSERT INTO job_watermarks (job_name, high_water_mark, updated_at) VALUES (?, ?, {now})",
+            (job_name, value)
+        )
+
+
+class ChatRollup:
+    """Hourly counts and summed sentiment_score per coin x source x sentiment_label.
+
+    chat_data_hourly is maintained incrementally from a high-water mark on
+    chat_id. Readers use source_sql(), which adds the rows written since the
+    last refresh, so new rows count straight away.
+
+    Rows folded before the sentiment model scored them are counted under
+    label '' without a score, and their chat_ids are kept in
+    chat_data_unscored. Each refresh moves the ones scored since into their
+    label. Until then they still count as unscored. Changes to a row that
+    was already scored when folded are not picked up.
+    """
+    job_name = 'chat_data_hourly'
+    # chat_ids up to this mark have their unscored rows listed in chat_data_unscored
+    unscored_job = 'chat_data_unscored'
+    keys = ['bucket_hour', 'coin_id', 'source_id', 'sentiment_label']
+    values = ['mention_count', 'score_sum', 'score_count']
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    def _aggregate_sql(self, where):
+        """Hourly aggregate of the chat_data rows matching `where`"""
+        sql = self.db.sql
+        return f"""
+            SELECT
+                {sql.to_hour('timestamp')} AS bucket_hour,
+                coin_id,
+                source_id,
+                COALESCE(sentiment_label, '') AS sentiment_label,
+                COUNT(*) AS mention_count,
+                COALESCE(SUM(CAST(sentiment_score AS FLOAT)), 0) AS score_sum,
+                COUNT(sentiment_score) AS score_count
+            FROM chat_data
+            WHERE {where}
+            GROUP BY {sql.to_hour('timestamp')}, coin_id, source_id, COALESCE(sentiment_label, '')
+        """
+
+    def source_sql(self):
+        """Derived table of hourly rows: the rollup plus chat_data rows above the high-water mark"""
+        tail = self._aggregate_sql(
+            f"chat_id > COALESCE((SELECT high_water_mark FROM job_watermarks WHERE job_name = '{self.job_name}'), 0)"
+        )
+        return f"""(
+            SELECT {', '.join(self.keys + self.values)}
+            FROM chat_data_hourly
+            UNION ALL
+            {tail}
+        )"""
+
+    def _track_unscored(self, conn, start, stop):
+        """List the unscored chat_data rows of (start, stop] as folded"""
+        conn.exec_driver_sql(
+            "INSERT INTO chat_data_unscored (chat_id, sentiment_label) "
+            "SELECT chat_id, COALESCE(sentiment_label, '') FROM chat_data "
+            "WHERE chat_id > ? AND chat_id <= ? AND sentiment_score IS NULL",
+            (start, stop)
+        )
+        set_watermark(conn, self.unscored_job, stop)
+
+    def refold_scored(self, conn):
+        """Move rows scored since they were folded from their folded label to the scored one.
+
+        The exact rows read are adjusted and then dropped from
+        chat_data_unscored in the caller's transaction, so a row scored
+        meanwhile waits for the next refresh. Returns the rows moved.
+        """
+        sql = self.db.sql
+        rows = conn.exec_driver_sql(f"""
+            SELECT u.chat_id, {sql.to_hour('cd.timestamp')}, cd.coin_id, cd.source_id, u.sentiment_label,
+                   COALESCE(cd.sentiment_label, ''), CAST(cd.sentiment_score AS FLOAT)
+            FROM chat_data_unscored u
+            JOIN chat_data cd ON cd.chat_id = u.chat_id
+            WHERE cd.sentiment_score IS NOT NULL
+        """).fetchall()
+        if rows:
+            changes = {}
+            for _, hour, coin_id, source_id, folded_label, label, score in rows:
+                for key, delta in (((hour, coin_id, source_id, folded_label), (-1, 0.0, 0)),
+                                   ((hour, coin_id, source_id, label), (1, float(score), 1))):
+                    total = changes.get(key, (0, 0.0, 0))
+                    changes[key] = tuple(a + b for a, b in zip(total, delta))
+            source = f"SELECT {', '.join('?' for _ in self.keys + self.values)}"
+            conn.exec_driver_sql(
+                sql.merge_add('chat_data_hourly', self.keys, self.values, source),
+                [key + values for key, values in changes.items()]
+            )
+            conn.exec_driver_sql(
+                "DELETE FROM chat_data_unscored WHERE chat_id = ?", [(row[0],) for row in rows]
+            )
+            conn.exec_driver_sql("DELETE FROM chat_data_hourly WHERE mention_count = 0")
+        # Rows archived or deleted unscored stay counted as they were folded
+        conn.exec_driver_sql(
+            "DELETE FROM chat_data_unscored WHERE NOT EXISTS "
+            "(SELECT 1 FROM chat_data cd WHERE cd.chat_id = chat_data_unscored.chat_id)"
+        )
+        return len(rows)
+
+    def refresh(self, batch_size=ROLLUP_BATCH_SIZE):
+        """Fold chat_data rows above the high-water mark into the rollup, then re-fold rows
+        scored since they were folded; returns the new mark"""
+        merge = self.db.sql.merge_add(
+            'chat_data_hourly', self.keys, self.values, self._aggregate_sql('chat_id > ? AND chat_id <= ?')
+        )
+        with self.db.connection() as conn:
+            start = get_watermark(conn, self.job_name)
+            # Rows still being inserted by an open transaction below MAX(chat_id) would be
+            # skipped, so the collector should commit its batches before this runs
+            end = conn.exec_driver_sql("SELECT MAX(chat_id) FROM chat_data").scalar() or 0
+            tracked = get_watermark(conn, self.unscored_job)
+            if tracked < start:
+                # Rollup built before unscored rows were tracked: list the ones still unscored
+                self._track_unscored(conn, tracked, start)
+            conn.commit()
+
+            while start < end:
+                stop = min(start + batch_size, end)
+                conn.exec_driver_sql(merge, (start, stop))
+                self._track_unscored(conn, start, stop)
+                set_watermark(conn, self.job_name, stop)
+                conn.commit()
+                logger.info("Rolled up chat_data %d..%d", start + 1, stop)
+                start = stop
+
+            moved = self.refold_scored(conn)
+            conn.commit()
+            if moved:
+                logger.info("Re-folded %d chat_data rows scored after they were rolled up", moved)
+        return start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the hourly chat_data rollup")
+    parser.add_argument('--once', action='store_true', help="run a single refresh and exit")
+    parser.add_argument('--interval', type=int, default=ROLLUP_INTERVAL, help="seconds between refreshes")
+    parser.add_argument('--batch-size', type=int, default=ROLLUP_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    while True:
+        try:
+            mark = db_manager.chat_rollup.refresh(args.batch_size)
+            logger.info("chat_data_hourly is current up to chat_id %d", mark)
+        except Exception:
+            logger.exception("Error refreshing chat_data rollup")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
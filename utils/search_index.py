@@ -0,0 +1,532 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from config import (
+    SEARCH_INDEX_DIR, SEARCH_INDEX_BATCH_SIZE, SEARCH_INDEX_INTERVAL, SEARCH_INDEX_CACHE_SEGMENTS,
+    SEARCH_SNIPPET_CHARS, LOG_LEVEL
+)
+from utils.coins import id_filter
+from utils.lazy import lazy_import
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+logger = logging.getLogger(__name__)
+
+# Letters and digits in any script; everything else separates tokens
+_TOKEN = re.compile(r'[^\W_]+')
+# Longer tokens (hashes, mangled URLs) are not indexed
+MAX_TOKEN_LENGTH = 32
+
+# Columns of chat_data copied into the index; content is only tokenized
+_ROW_COLUMNS = {
+    'chat_id': 'chat_id', 'timestamp': 'timestamp', 'coin_id': 'coin_id', 'source_id': 'source_id',
+    'sentiment_label': 'sentiment_label', 'content': 'content'
+}
+
+
+def tokenize(text):
+    """Distinct lowercase tokens of a text, in order of appearance"""
+    if not isinstance(text, str):
+        return []
+    return list(dict.fromkeys(token for token in _TOKEN.findall(text.lower()) if len(token) <= MAX_TOKEN_LENGTH))
+
+
+def parse_query(query):
+    """(token, is_prefix) terms of a query; every term must match, and a trailing * matches by prefix"""
+    terms = []
+    for word in (query or '').split():
+        tokens = _TOKEN.findall(word.lower())
+        for i, token in enumerate(tokens):
+            term = (token[:MAX_TOKEN_LENGTH], word.endswith('*') and i == len(tokens) - 1)
+            if term not in terms:
+                terms.append(term)
+    return terms
+
+
+def varint_encode(values):
+    """Unsigned integers as LEB128 bytes (7 bits per byte, high bit set on all but the last)"""
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+    starts = np.cumsum(lengths) - lengths
+    position = np.arange(lengths.sum()) - np.repeat(starts, lengths)
+    encoded = (np.repeat(values, lengths) >> (7 * position).astype(np.uint64)) & np.uint64(0x7F)
+    more = position < np.repeat(lengths, lengths) - 1
+    return (encoded | np.where(more, 0x80, 0).astype(np.uint64)).astype(np.uint8), lengths
+
+
+def varint_decode(data):
+    """Inverse of varint_encode"""
+    data = np.asarray(data, dtype=np.uint8)
+    if len(data) == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(data < 0x80)
+    starts = np.r_[0, ends[:-1] + 1]
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    shifted = (data & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(shifted, starts).astype(np.int64)
+
+
+def build_postings(terms, docs):
+    """Compressed postings of (term, doc) pairs: (vocabulary, counts, byte offsets, bytes).
+
+    Pairs are grouped by term in vocabulary order and by doc within a term.
+    Each term's doc list is stored as its first doc followed by the gaps
+    between docs, varint-encoded, so a term is decoded from its own byte range.
+    """
+    vocabulary, term_index = np.unique(np.asarray(terms, dtype=str), return_inverse=True)
+    docs = np.asarray(docs, dtype=np.int64)
+    order = np.lexsort((docs, term_index))
+    term_index, docs = term_index[order], docs[order]
+    gaps = docs.copy()
+    same = np.r_[False, term_index[1:] == term_index[:-1]]
+    gaps[same] -= docs[np.flatnonzero(same) - 1]
+    data, lengths = varint_encode(gaps)
+    counts = np.bincount(term_index, minlength=len(vocabulary))
+    term_bytes = np.bincount(term_index, weights=lengths, minlength=len(vocabulary)).astype(np.int64)
+    return vocabulary, counts, np.r_[0, np.cumsum(term_bytes)], data
+
+
+def decode_postings(counts, offsets, data, lo, hi):
+    """Docs of the terms lo..hi-1 (consecutive in the vocabulary), concatenated"""
+    gaps = varint_decode(data[offsets[lo]:offsets[hi]])
+    if len(gaps) == 0:
+        return gaps
+    lengths = counts[lo:hi]
+    lengths = lengths[lengths > 0]
+    total = np.cumsum(gaps)
+    # Gaps restart at each term, so subtract the running total before its first doc
+    first = np.cumsum(lengths) - lengths
+    return total - np.repeat(total[first] - gaps[first], lengths)
+
+
+class SearchIndex:
+    """Local inverted index over chat_data.content, one segment per day.
+
+    A segment holds the day's indexed messages in chat_id order (chat_id,
+    timestamp, coin_id, source_id and lowercased sentiment_label) and the
+    postings of every token to those messages, compressed with
+    build_postings. Segments are .npz files under SEARCH_INDEX_DIR named
+    by day and generation; manifest.json lists the current generation of
+    each day, the highest chat_id indexed and, per day, the messages
+    indexed before the sentiment model labelled them.
+
+    The index job (`python -m utils.search_index`) is the only writer. It
+    reads chat_data above that chat_id, rewrites the segments of the days
+    the rows fall on as new generations, and then replaces the manifest,
+    so readers always see complete segments. A first build also indexes
+    the days already moved to cold storage. Each run also picks up the
+    labels of messages indexed unlabelled (see _relabel).
+
+    A search filters and intersects postings in the segments of the
+    requested days only. The main table (or the archive) is read only for
+    the page of messages returned, to build their snippets.
+    """
+
+    def __init__(self, db_manager, root=SEARCH_INDEX_DIR, max_segments=SEARCH_INDEX_CACHE_SEGMENTS):
+        self.db = db_manager
+        self.root = root
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._manifest_cache = None  # (manifest stat, manifest)
+        self._segments = OrderedDict()  # (day, generation) -> segment arrays
+
+    def _manifest_path(self):
+        return os.path.join(self.root, 'manifest.json')
+
+    def _segment_path(self, day, generation):
+        return os.path.join(self.root, f'{day}.{generation}.npz')
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        path = self._manifest_path()
+        with open(path + '.tmp', 'w') as f:
+            json.dump(manifest, f)
+        os.replace(path + '.tmp', path)
+
+    def _load(self, day, generation):
+        with np.load(self._segment_path(day, generation), allow_pickle=False) as f:
+            return {name: f[name] for name in f.files}
+
+    def _write_segment(self, day, generation, segment):
+        with open(self._segment_path(day, generation), 'wb') as f:
+            np.savez_compressed(f, **segment)
+
+    # Reading
+
+    def manifest(self):
+        """Current manifest, reread when the file changes; None before the first build"""
+        try:
+            stat = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if self._manifest_cache and self._manifest_cache[0] == key:
+                return self._manifest_cache[1]
+        manifest = self._read_manifest()
+        with self._lock:
+            self._manifest_cache = (key, manifest)
+        return manifest
+
+    def _segment(self, day, generation):
+        key = (day, generation)
+        with self._lock:
+            segment = self._segments.get(key)
+            if segment is not None:
+                self._segments.move_to_end(key)
+                return segment
+        segment = self._load(day, generation)
+        with self._lock:
+            self._segments[key] = segment
+            while len(self._segments) > self.max_segments:
+                self._segments.popitem(last=False)
+        return segment
+
+    @staticmethod
+    def _term_docs(segment, token, prefix):
+        """Docs of a segment containing the token (or a token it prefixes)"""
+        vocabulary = segment['terms']
+        lo = np.searchsorted(vocabulary, token, side='left')
+        if prefix:
+            hi = np.searchsorted(vocabulary, token + '\U0010ffff', side='left')
+        else:
+            hi = lo + 1 if lo < len(vocabulary) and vocabulary[lo] == token else lo
+        if hi <= lo:
+            return None
+        return decode_postings(segment['counts'], segment['offsets'], segment['postings'], lo, hi)
+
+    @classmethod
+    def _match_segment(cls, segment, terms, coin_ids, source_ids, label, start_ns, end_ns):
+        """Positions of the segment's docs matching every term and filter"""
+        timestamps = segment['timestamp']
+        matched = np.ones(len(timestamps), dtype=bool)
+        if coin_ids is not None:
+            matched &= np.isin(segment['coin_id'], coin_ids)
+        if source_ids is not None:
+            matched &= np.isin(segment['source_id'], source_ids)
+        if label is not None:
+            matched &= segment['label'] == label
+        if start_ns is not None:
+            matched &= timestamps >= start_ns
+        if end_ns is not None:
+            matched &= timestamps < end_ns
+        for token, prefix in terms:
+            if not matched.any():
+                break
+            docs = cls._term_docs(segment, token, prefix)
+            if docs is None:
+                return np.empty(0, dtype=np.int64)
+            has_term = np.zeros(len(timestamps), dtype=bool)
+            has_term[docs] = True
+            matched &= has_term
+        return np.flatnonzero(matched)
+
+    def matches(self, terms, coin_ids=None, source_ids=None, label=None, start=None, end=None):
+        """(timestamps ns, chat_ids) of every indexed message matching, newest first"""
+        for attempt in range(2):
+            manifest = self.manifest()
+            if manifest is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            first_day = start.date().isoformat() if start else None
+            last_day = end.date().isoformat() if end else None
+            start_ns = np.datetime64(start, 'ns').astype(np.int64) if start else None
+            end_ns = np.datetime64(end, 'ns').astype(np.int64) if end else None
+            label = label.lower() if label else None
+            timestamps, chat_ids = [], []
+            try:
+                for day, generation in manifest['segments'].items():
+                    if (first_day and day < first_day) or (last_day and day > last_day):
+                        continue
+                    segment = self._segment(day, generation)
+                    docs = self._match_segment(segment, terms, coin_ids, source_ids, label, start_ns, end_ns)
+                    timestamps.append(segment['timestamp'][docs])
+                    chat_ids.append(segment['chat_id'][docs])
+                break
+            except FileNotFoundError:
+                # A segment was replaced after the manifest was read; retry with the new one
+                if attempt:
+                    raise
+                with self._lock:
+                    self._manifest_cache = None
+        if not timestamps:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        timestamps, chat_ids = np.concatenate(timestamps), np.concatenate(chat_ids)
+        order = np.lexsort((-chat_ids, -timestamps))
+        return timestamps[order], chat_ids[order]
+
+    def _rows(self, chat_ids):
+        """chat_data rows of the given chat_ids, from the main table and then the archive"""
+        columns = ['chat_id', 'timestamp', 'coin_id', 'source_id', 'content', 'sentiment_score', 'sentiment_label', 'url']
+        chat_ids = [int(chat_id) for chat_id in chat_ids]
+        df = self.db.read_sql(
+            f"SELECT {', '.join(columns)} FROM chat_data WHERE {id_filter('chat_id', chat_ids)}",
+            tuple(chat_ids), name='search_page'
+        )
+        missing = sorted(set(chat_ids) - set(df['chat_id'].astype(int)))
+        if missing and self.db.archive.covers('chat_data', None):
+            cold = self.db.archive.read('chat_data', {column: column for column in columns}, ids=missing)
+            df = pd.concat([df, cold], ignore_index=True)
+        return df
+
+    def search(self, query, coin=None, source=None, label=None, start=None, end=None, limit=20, after=None):
+        """Page of messages matching `query`, newest first, with snippets.
+
+        `after` is the (timestamp, chat_id) of the last message of the
+        previous page. Returns {'total', 'results', 'next'} with next the
+        key to pass as `after` for the following page, or None.
+        """
+        terms = parse_query(query)
+        if not terms:
+            raise ValueError("query has no searchable terms")
+        coin_ids = self.db.coins.coin_ids(coin) if coin else None
+        source_ids = None
+        if source:
+            rows = self.db.fetch_all("SELECT source_id FROM chat_source WHERE source_name = ?", (source,))
+            source_ids = [int(row[0]) for row in rows]
+
+        timestamps, chat_ids = self.matches(terms, coin_ids, source_ids, label, start, end)
+        total = len(chat_ids)
+        if after is not None:
+            after_ns = np.datetime64(after[0], 'ns').astype(np.int64)
+            keep = (timestamps < after_ns) | ((timestamps == after_ns) & (chat_ids < after[1]))
+            timestamps, chat_ids = timestamps[keep], chat_ids[keep]
+        page = chat_ids[:limit]
+        following = len(chat_ids) > limit
+
+        results = []
+        if len(page):
+            rows = self._rows(page).set_index('chat_id')
+            sources = dict(self.db.fetch_all("SELECT source_id, source_name FROM chat_source"))
+            pattern = snippet_pattern(terms)
+            for chat_id in page.tolist():
+                if chat_id not in rows.index:
+                    continue  # deleted since it was indexed
+                row = rows.loc[chat_id]
+                text, highlights = snippet(row['content'], pattern)
+                score = row['sentiment_score']
+                results.append({
+                    'chat_id': chat_id,
+                    'timestamp': pd.Timestamp(row['timestamp']).isoformat(),
+                    'coin': self.db.coins.symbol(row['coin_id']),
+                    'source': sources.get(int(row['source_id'])),
+                    'sentiment_label': row['sentiment_label'],
+                    'sentiment_score': None if pd.isna(score) else float(score),
+                    'url': row['url'],
+                    'snippet': text,
+                    'highlights': highlights
+                })
+        next_key = None
+        if following:
+            next_key = (pd.Timestamp(int(timestamps[limit - 1])).to_pydatetime(), int(chat_ids[limit - 1]))
+        return {'total': total, 'results': results, 'next': next_key}
+
+    def stats(self):
+        manifest = self.manifest() or {'segments': {}, 'last_chat_id': 0, 'docs': 0}
+        with self._lock:
+            cached = len(self._segments)
+        return {
+            'segments': len(manifest['segments']),
+            'docs': manifest['docs'],
+            'last_chat_id': manifest['last_chat_id'],
+            'cached_segments': cached
+        }
+
+    # Writing (index job only)
+
+    def _fetch(self, after_id, until_id):
+        """chat_data rows with after_id < chat_id <= until_id in chat_id order"""
+        df = self.db.read_sql(
+            f"SELECT {', '.join(_ROW_COLUMNS.values())} FROM chat_data WHERE chat_id > ? AND chat_id <= ? ORDER BY chat_id",
+            (int(after_id), int(until_id)), name='search_index_sync'
+        )
+        if after_id == 0 and self.db.archive.covers('chat_data', None):
+            # A first build also indexes the days already moved to cold storage
+            cold = self.db.archive.read('chat_data', _ROW_COLUMNS)
+            df = pd.concat([cold, df], ignore_index=True).sort_values('chat_id', kind='stable', ignore_index=True)
+        return df
+
+    def _merge_day(self, segment, rows):
+        """Segment of a day with `rows` (all above its chat_ids) appended"""
+        tokens = [tokenize(text) for text in rows['content']]
+        keep = np.array([bool(found) for found in tokens], dtype=bool)
+        rows, tokens = rows[keep], [found for found in tokens if found]
+        offset = len(segment['chat_id']) if segment else 0
+        terms = [token for found in tokens for token in found]
+        docs = np.repeat(np.arange(offset, offset + len(tokens)), [len(found) for found in tokens])
+        if segment:
+            old_docs = decode_postings(segment['counts'], segment['offsets'], segment['postings'], 0, len(segment['terms']))
+            terms = np.concatenate([np.repeat(segment['terms'], segment['counts']), np.asarray(terms, dtype=str)])
+            docs = np.concatenate([old_docs, docs])
+        vocabulary, counts, offsets, postings = build_postings(terms, docs)
+        labels = rows['sentiment_label'].fillna('').astype(str).str.lower().to_numpy(dtype=str)
+        new = {
+            'chat_id': rows['chat_id'].to_numpy(dtype=np.int64),
+            'timestamp': pd.to_datetime(rows['timestamp']).to_numpy(dtype='datetime64[ns]').astype(np.int64),
+            'coin_id': rows['coin_id'].to_numpy(dtype=np.int64),
+            'source_id': rows['source_id'].to_numpy(dtype=np.int64),
+            'label': labels if len(labels) else np.empty(0, dtype='<U1')
+        }
+        if segment:
+            new = {name: np.concatenate([segment[name], values]) for name, values in new.items()}
+        return {**new, 'terms': vocabulary, 'counts': counts, 'offsets': offsets, 'postings': postings}
+
+    def _add(self, manifest, rows):
+        """Merge chat_data rows into their days' segments as new generations; returns the new manifest"""
+        segments = dict(manifest['segments'])
+        unlabelled = dict(manifest.get('unlabelled') or {})
+        docs = manifest['docs']
+        days = pd.to_datetime(rows['timestamp']).dt.strftime('%Y-%m-%d')
+        for day, day_rows in rows.groupby(days, sort=True):
+            generation = segments.get(day)
+            segment = self._load(day, generation) if generation is not None else None
+            merged = self._merge_day(segment, day_rows)
+            if len(merged['chat_id']) == (len(segment['chat_id']) if segment else 0):
+                continue  # nothing to index on that day
+            generation = 0 if generation is None else generation + 1
+            self._write_segment(day, generation, merged)
+            docs += len(merged['chat_id']) - (len(segment['chat_id']) if segment else 0)
+            segments[day] = generation
+            unlabelled[day] = int((merged['label'] == '').sum())
+        return {**manifest, 'segments': dict(sorted(segments.items())), 'docs': docs, 'unlabelled': unlabelled}
+
+    def _relabel(self, manifest, chunk_size=1000):
+        """Take the sentiment_label of messages indexed before they were scored; returns the new manifest.
+
+        Days with such messages are counted in the manifest's 'unlabelled';
+        only those segments are read, and rewritten when a label arrived.
+        Labels changed after a message was indexed with one are not picked up.
+        """
+        known = manifest.get('unlabelled')
+        # Manifests written before the counts were kept get every day checked once
+        days = list(manifest['segments']) if known is None else [day for day, count in known.items() if count]
+        segments = dict(manifest['segments'])
+        unlabelled = dict(known or {})
+        for day in days:
+            segment = self._load(day, segments[day])
+            missing = np.flatnonzero(segment['label'] == '')
+            found = {}
+            for lo in range(0, len(missing), chunk_size):
+                chat_ids = segment['chat_id'][missing[lo:lo + chunk_size]].tolist()
+                found.update(self.db.fetch_all(
+                    f"SELECT chat_id, sentiment_label FROM chat_data "
+                    f"WHERE {id_filter('chat_id', chat_ids)} AND sentiment_label IS NOT NULL",
+                    chat_ids, name='search_index_relabel'
+                ))
+            if found:
+                labels = segment['label'].tolist()
+                for position in missing:
+                    label = found.get(int(segment['chat_id'][position]))
+                    if label is not None:
+                        labels[position] = label.lower()
+                segments[day] += 1
+                self._write_segment(day, segments[day], {**segment, 'label': np.array(labels, dtype=str)})
+            unlabelled[day] = len(missing) - len(found)
+        return {**manifest, 'segments': segments, 'unlabelled': unlabelled}
+
+    def _remove_old_generations(self, manifest):
+        for name in os.listdir(self.root):
+            parts = name.split('.')
+            if len(parts) == 3 and parts[2] == 'npz' and manifest['segments'].get(parts[0]) != int(parts[1]):
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass  # still open by a reader on a platform that forbids removing it
+
+    def update(self, batch_size=SEARCH_INDEX_BATCH_SIZE):
+        """Index chat_data rows above the manifest's chat_id; returns the new high-water mark"""
+        os.makedirs(self.root, exist_ok=True)
+        manifest = self._read_manifest() or {'last_chat_id': 0, 'segments': {}, 'docs': 0}
+        start = manifest['last_chat_id']
+        # Rows still being inserted by an open transaction below MAX(chat_id) would be
+        # skipped, so the collector should commit its batches before this runs
+        end = self.db.fetch_all("SELECT MAX(chat_id) FROM chat_data")[0][0] or 0
+        # A first build reads the archive even when the main table is empty
+        first = start == 0 and self.db.archive.covers('chat_data', None)
+        while start < end or first:
+            stop = min(start + batch_size, end)
+            rows = self._fetch(start, stop)
+            first = False
+            if not rows.empty:
+                manifest = self._add(manifest, rows)
+                stop = max(stop, int(rows['chat_id'].max()))
+            manifest = {**manifest, 'last_chat_id': stop}
+            self._write_manifest(manifest)
+            self._remove_old_generations(manifest)
+            logger.info("Indexed chat_data %d..%d", start + 1, stop)
+            start = stop
+
+        relabelled = self._relabel(manifest)
+        if relabelled != manifest:
+            self._write_manifest(relabelled)
+            self._remove_old_generations(relabelled)
+        return start
+
+
+def snippet_pattern(terms):
+    """Regex finding the query terms as whole tokens (or token prefixes) in content"""
+    alternatives = [re.escape(token) + (r'[^\W_]*' if prefix else '') for token, prefix in terms]
+    return re.compile(r'(?<![^\W_])(?:' + '|'.join(alternatives) + r')(?![^\W_])', re.IGNORECASE)
+
+
+def snippet(content, pattern, width=SEARCH_SNIPPET_CHARS):
+    """About `width` characters of content around the first match, and [start, end) offsets of the
+    matches within it"""
+    if not isinstance(content, str):
+        return '', []
+    text = ' '.join(content.split())
+    first = pattern.search(text)
+    begin = max(0, first.start() - width // 3) if first else 0
+    if begin > 0:
+        space = text.find(' ', begin, first.start())
+        begin = space + 1 if space >= 0 else begin
+    end = min(len(text), begin + width)
+    if end < len(text):
+        space = text.rfind(' ', begin, end)
+        end = space if space > (first.end() if first else begin) else end
+    lead = '…' if begin > 0 else ''
+    text_part = text[begin:end]
+    highlights = [
+        [match.start() + len(lead), match.end() + len(lead)]
+        for match in pattern.finditer(text_part)
+    ]
+    return lead + text_part + ('…' if end < len(text) else ''), highlights
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the full-text index of chat_data content")
+    parser.add_argument('--once', action='store_true', help="run a single update and exit")
+    parser.add_argument('--interval', type=int, default=SEARCH_INDEX_INTERVAL, help="seconds between updates")
+    parser.add_argument('--batch-size', type=int, default=SEARCH_INDEX_BATCH_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    from utils.database import DatabaseManager
+    db_manager = DatabaseManager()
+    while True:
+        try:
+            mark = db_manager.search_index.update(args.batch_size)
+            logger.info("Search index is current up to chat_id %d", mark)
+        except Exception:
+            logger.exception("Error updating search index")
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
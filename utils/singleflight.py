@@ -0,0 +1,78 @@
+import re
+import threading
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(query):
+    """Collapse whitespace so the same statement built with different indentation matches"""
+    return _WHITESPACE.sub(' ', query).strip()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce identical concurrent executions into one.
+
+    The first caller for a key runs the function; callers arriving while it
+    is in flight wait for it and get the same result (or exception). Nothing
+    is kept once the call completes, so this never serves stale data.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.deduplicated = 0
+
+    def do(self, key, func):
+        """Return (result, shared); shared is True when the same result object went to more than one caller.
+
+        Callers that modify a shared result must copy it first. The leader
+        learns whether anyone waited once the key is released, so by then
+        its result is final and followers may already be reading it.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.deduplicated += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                waited = call.waiters > 0
+            call.done.set()
+        return call.result, waited
+
+    def stats(self):
+        with self._lock:
+            total = self.executions + self.deduplicated
+            return {
+                'executions': self.executions,
+                'deduplicated': self.deduplicated,
+                'dedup_ratio': round(self.deduplicated / total, 4) if total else 0.0,
+                'in_flight': len(self._calls)
+            }
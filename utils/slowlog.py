@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import date, datetime
+from config import (
+    SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG_SIZE, SLOW_QUERY_CAPTURE_PLAN, SLOW_QUERY_DUMP_DIR
+)
+from utils.singleflight import normalize_sql
+
+logger = logging.getLogger(__name__)
+
+
+def _param_value(value):
+    """Query parameter as a JSON-safe value"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of queries slower than a threshold, with their execution plans.
+
+    The plan is fetched from the active backend (showplan XML on SQL Server,
+    EXPLAIN QUERY PLAN on SQLite) on a separate pooled connection after the
+    slow query has returned its connection. Plans are kept per normalized
+    statement, so a query that is slow on every request is explained once.
+    """
+
+    def __init__(self, db_manager, threshold_ms=SLOW_QUERY_THRESHOLD_MS, size=SLOW_QUERY_LOG_SIZE,
+                 capture_plan=SLOW_QUERY_CAPTURE_PLAN):
+        self.db = db_manager
+        self.threshold = threshold_ms / 1000.0
+        self.capture_plan = capture_plan
+        self._entries = deque(maxlen=size)
+        self._plans = OrderedDict()
+        self._plan_limit = max(size, 1)
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    @property
+    def enabled(self):
+        return self.threshold >= 0
+
+    def is_slow(self, duration):
+        return self.enabled and duration >= self.threshold
+
+    def record(self, name, query, params, duration, rows):
+        """Keep a slow query; `duration` in seconds covers execute and fetch"""
+        sql = normalize_sql(query)
+        entry = {
+            'timestamp': datetime.now().isoformat(sep=' ', timespec='seconds'),
+            'name': name,
+            'sql': sql,
+            'params': [_param_value(value) for value in params],
+            'duration_ms': round(duration * 1000.0, 3),
+            'rows': rows,
+            'plan_format': None,
+            'plan': None
+        }
+        if self.capture_plan:
+            entry['plan_format'], entry['plan'] = self._plan(sql, query, params)
+        with self._lock:
+            self._entries.append(entry)
+            self.recorded += 1
+        logger.warning("Slow query %s: %.1f ms, %d rows", name, entry['duration_ms'], rows)
+        return entry
+
+    def _plan(self, sql, query, params):
+        with self._lock:
+            if sql in self._plans:
+                self._plans.move_to_end(sql)
+                return self._plans[sql]
+        try:
+            with self.db.raw_connection() as conn:
+                plan = self.db.sql.explain(conn, query, params)
+        except Exception as e:
+            logger.error("Error capturing plan for slow query: %s", e)
+            return None, None
+        with self._lock:
+            self._plans[sql] = plan
+            while len(self._plans) > self._plan_limit:
+                self._plans.popitem(last=False)
+        return plan
+
+    def entries(self, limit=None, plans=True):
+        """Captured slow queries, newest first"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if limit is not None:
+            entries = entries[:limit]
+        if not plans:
+            entries = [{**entry, 'plan': None} for entry in entries]
+        return entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._plans.clear()
+
+    def dump(self, directory=SLOW_QUERY_DUMP_DIR):
+        """Write the buffer to a timestamped JSON-lines file, oldest first; returns (path, count)"""
+        entries = self.entries()
+        entries.reverse()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"slow_queries_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+        with open(path, 'w') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+        return path, len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold_ms': round(self.threshold * 1000.0, 3),
+                'capacity': self._entries.maxlen,
+                'buffered': len(self._entries),
+                'recorded': self.recorded,
+                'plans_cached': len(self._plans)
+            }
@@ -0,0 +1,236 @@
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+import numpy as np
+from config import SQLITE_PATH
+from utils.backends import SQLITE_DDL_PATH
+
+# Well-known coins first, the rest are numbered placeholders
+KNOWN_COINS = [
+    ('BTC', 'Bitcoin'), ('ETH', 'Ethereum'), ('USDT', 'Tether'), ('BNB', 'BNB'),
+    ('SOL', 'Solana'), ('XRP', 'XRP'), ('USDC', 'USD Coin'), ('ADA', 'Cardano'),
+    ('AVAX', 'Avalanche'), ('DOGE', 'Dogecoin'), ('DOT', 'Polkadot'), ('TRX', 'TRON'),
+    ('LINK', 'Chainlink'), ('MATIC', 'Polygon'), ('SHIB', 'Shiba Inu'), ('LTC', 'Litecoin'),
+    ('BCH', 'Bitcoin Cash'), ('UNI', 'Uniswap'), ('ATOM', 'Cosmos'), ('XLM', 'Stellar')
+]
+
+SOURCES = ['Reddit', 'Twitter', 'Telegram', 'CryptoCompare', 'Discord', 'YouTube', 'News', 'Forum']
+
+PRICE_SOURCES = ['CoinGecko', 'Binance', 'CryptoCompare']
+
+MODEL_VERSIONS = ['v1.0', 'v1.1', 'v2.0']
+
+# (upper bound of sentiment_score, label), checked in order
+SENTIMENT_BANDS = [(-0.6, 'Very Negative'), (-0.2, 'Negative'), (0.2, 'Neutral'), (0.6, 'Positive'), (1.01, 'Very Positive')]
+
+PHRASES = {
+    'Very Negative': ['is collapsing, get out now', 'rug pull incoming', 'total scam, dumping everything'],
+    'Negative': ['looks weak today', 'losing support, careful', 'not convinced by this rally'],
+    'Neutral': ['trading sideways', 'any news on the roadmap?', 'volume about average'],
+    'Positive': ['breaking resistance', 'solid fundamentals', 'accumulating more this week'],
+    'Very Positive': ['to the moon!', 'massive breakout, all in', 'best project in the market']
+}
+
+PRICE_BATCH = 200_000
+
+
+def _format_times(times):
+    """Format datetime64[s] values as 'YYYY-MM-DD HH:MM:SS' strings"""
+    return np.char.replace(np.datetime_as_string(times, unit='s'), 'T', ' ')
+
+
+def _sentiment_labels(scores):
+    labels = np.empty(len(scores), dtype=object)
+    lower = -np.inf
+    for upper, label in SENTIMENT_BANDS:
+        labels[(scores >= lower) & (scores < upper)] = label
+        lower = upper
+    return labels
+
+
+def _insert_coins(conn, n_coins):
+    coins = list(KNOWN_COINS[:n_coins])
+    coins += [(f"C{i:03d}", f"Coin {i:03d}") for i in range(len(coins) + 1, n_coins + 1)]
+    conn.executemany(
+        "INSERT INTO Coins (symbol, full_name, description) VALUES (?, ?, ?)",
+        [(symbol, name, f"Synthetic {name}") for symbol, name in coins]
+    )
+    return [symbol for symbol, _ in coins]
+
+
+def _insert_sources(conn, n_sources):
+    names = (SOURCES * (n_sources // len(SOURCES) + 1))[:n_sources]
+    names = [name if i < len(SOURCES) else f"{name}{i}" for i, name in enumerate(names)]
+    conn.executemany(
+        "INSERT INTO chat_source (source_name, api_base_url) VALUES (?, ?)",
+        [(name, f"https://api.{name.lower()}.example") for name in names]
+    )
+    return names
+
+
+def _insert_prices_and_predictions(conn, rng, n_coins, start, end, price_interval, prediction_interval):
+    """Random-walk prices per coin, plus predictions sampled from those prices"""
+    step = np.timedelta64(price_interval, 's')
+    times = np.arange(start, end, step)
+    time_strings = _format_times(times)
+    steps_per_day = max(int(86400 // price_interval), 1)
+    sigma = 0.8 * np.sqrt(price_interval / (365 * 86400))
+    horizons = {'24h': 1, '7d': 7, '30d': 30, '90d': 90}
+    prediction_every = max(int(prediction_interval * 3600 // price_interval), 1)
+    price_rows = prediction_rows = 0
+
+    for coin_id in range(1, n_coins + 1):
+        start_price = float(np.exp(rng.uniform(np.log(0.01), np.log(50000))))
+        log_returns = rng.normal(0, sigma, len(times))
+        prices = start_price * np.exp(np.cumsum(log_returns))
+        volumes = start_price * 1e6 * rng.lognormal(0, 0.5, len(times))
+        previous = np.concatenate([np.full(steps_per_day, prices[0]), prices[:-steps_per_day]])[:len(prices)]
+        changes = (prices - previous) / previous * 100
+        sources = rng.choice(PRICE_SOURCES, len(times))
+
+        for lo in range(0, len(times), PRICE_BATCH):
+            hi = lo + PRICE_BATCH
+            conn.executemany(
+                "INSERT INTO Price_Data (coin_id, price_date, timestamp, price_usd, volume_24h, price_change_24h, data_source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                zip([coin_id] * (hi - lo), time_strings[lo:hi].tolist(), time_strings[lo:hi].tolist(),
+                    np.round(prices[lo:hi], 8).tolist(), np.round(volumes[lo:hi], 2).tolist(),
+                    np.round(changes[lo:hi], 2).tolist(), sources[lo:hi].tolist())
+            )
+        price_rows += len(times)
+
+        idx = np.arange(0, len(times), prediction_every)
+        current = prices[idx]
+        forecasts = {
+            name: current * np.exp(rng.normal(0, sigma * np.sqrt(days * steps_per_day), len(idx)))
+            for name, days in horizons.items()
+        }
+        sentiment = np.round(rng.uniform(-1, 1, len(idx)), 2)
+        conditions = np.where(sentiment > 0.2, 'Bullish', np.where(sentiment < -0.2, 'Bearish', 'Neutral'))
+        conn.executemany(
+            "INSERT INTO predictions (coin_id, prediction_date, current_price, prediction_24h, prediction_7d, "
+            "prediction_30d, prediction_90d, sentiment_score, confidence_score, model_version, "
+            "training_window_days, data_points_count, market_conditions, volatility_index) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            zip([coin_id] * len(idx), time_strings[idx].tolist(), np.round(current, 8).tolist(),
+                *(np.round(forecasts[name], 8).tolist() for name in horizons),
+                sentiment.tolist(), np.round(rng.uniform(50, 95, len(idx)), 2).tolist(),
+                rng.choice(MODEL_VERSIONS, len(idx)).tolist(), [30] * len(idx),
+                rng.integers(100, 5000, len(idx)).tolist(), conditions.tolist(),
+                np.round(rng.uniform(5, 80, len(idx)), 2).tolist())
+        )
+        prediction_rows += len(idx)
+
+    return price_rows, prediction_rows
+
+
+def _insert_chat_data(conn, rng, symbols, n_sources, n_rows, start, end, chunk_size):
+    """Chat rows in timestamp order, so chat_id grows with time as it does in production"""
+    n_coins = len(symbols)
+    # Popular coins get most of the chatter
+    weights = 1.0 / np.arange(1, n_coins + 1) ** 0.8
+    weights /= weights.sum()
+    coin_bias = rng.normal(0, 0.15, n_coins)
+    span = (end - start).astype('int64')
+    n_chunks = max(-(-n_rows // chunk_size), 1)
+    phrase_lists = {label: np.array(phrases, dtype=object) for label, phrases in PHRASES.items()}
+    symbol_array = np.array(symbols, dtype=object)
+
+    for chunk in range(n_chunks):
+        size = min(chunk_size, n_rows - chunk * chunk_size)
+        lo = start + np.timedelta64(span * chunk // n_chunks, 's')
+        hi = start + np.timedelta64(span * (chunk + 1) // n_chunks, 's')
+        offsets = np.sort(rng.integers(0, max((hi - lo).astype('int64'), 1), size))
+        times = _format_times(lo + offsets.astype('timedelta64[s]'))
+        coin_idx = rng.choice(n_coins, size, p=weights)
+        source_ids = rng.integers(1, n_sources + 1, size)
+        scores = np.round(np.clip(rng.normal(coin_bias[coin_idx], 0.4), -1, 1), 2)
+        labels = _sentiment_labels(scores)
+
+        content = np.empty(size, dtype=object)
+        for label, phrases in phrase_lists.items():
+            mask = labels == label
+            content[mask] = symbol_array[coin_idx[mask]] + ' ' + phrases[rng.integers(0, len(phrases), mask.sum())]
+
+        # A few rows the sentiment model has not scored yet
+        unscored = rng.random(size) < 0.02
+        scores = np.where(unscored, None, scores)
+        labels[unscored] = None
+
+        conn.executemany(
+            "INSERT INTO chat_data (timestamp, coin_id, source_id, content, sentiment_score, sentiment_label, url) "
+            "VALUES (?, ?, ?, ?, ?, ?, NULL)",
+            zip(times.tolist(), (coin_idx + 1).tolist(), source_ids.tolist(), content.tolist(),
+                scores.tolist(), labels.tolist())
+        )
+        conn.commit()
+
+    return n_rows
+
+
+def generate(path=SQLITE_PATH, coins=50, sources=5, chat_rows=200_000, price_days=30,
+             price_interval=300, prediction_interval=24, seed=42, chunk_size=500_000, reset=False):
+    """Fill a SQLite database with reproducible synthetic data for every table the app reads"""
+    if reset and os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    end = np.datetime64(datetime.now().replace(microsecond=0), 's')
+    start = end - np.timedelta64(price_days, 'D')
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        with open(SQLITE_DDL_PATH) as f:
+            conn.executescript(f.read())
+
+        symbols = _insert_coins(conn, coins)
+        source_names = _insert_sources(conn, sources)
+        conn.commit()
+        price_rows, prediction_rows = _insert_prices_and_predictions(
+            conn, rng, coins, start, end, price_interval, prediction_interval
+        )
+        conn.commit()
+        chat_count = _insert_chat_data(conn, rng, symbols, len(source_names), chat_rows, start, end, chunk_size)
+    finally:
+        conn.close()
+
+    return {
+        'coins': len(symbols),
+        'sources': len(source_names),
+        'chat_data': chat_count,
+        'price_data': price_rows,
+        'predictions': prediction_rows
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic CryptoAiDb for DB_BACKEND=sqlite")
+    parser.add_argument('--path', default=SQLITE_PATH, help="SQLite file to create")
+    parser.add_argument('--coins', type=int, default=50)
+    parser.add_argument('--sources', type=int, default=5)
+    parser.add_argument('--chat-rows', type=int, default=200_000)
+    parser.add_argument('--price-days', type=int, default=30, help="days of history ending now")
+    parser.add_argument('--price-interval', type=int, default=300, help="seconds between price ticks")
+    parser.add_argument('--prediction-interval', type=int, default=24, help="hours between predictions per coin")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=500_000, help="chat rows per insert batch")
+    parser.add_argument('--reset', action='store_true', help="delete an existing database file first")
+    args = parser.parse_args()
+
+    # Production scale: --coins 200 --chat-rows 50000000 --price-days 365 --price-interval 60
+    counts = generate(
+        path=args.path, coins=args.coins, sources=args.sources, chat_rows=args.chat_rows,
+        price_days=args.price_days, price_interval=args.price_interval,
+        prediction_interval=args.prediction_interval, seed=args.seed,
+        chunk_size=args.chunk_size, reset=args.reset
+    )
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import threading
+import time
+import zlib
+from config import WATERMARK_TTL
+
+# Cheap change markers per data source; each must be answerable from an index
+WATERMARK_QUERIES = {
+    'chat_data': "SELECT MAX(chat_id) FROM chat_data",
+    'Price_Data': "SELECT MAX(id) FROM Price_Data",
+    'coin_price': """
+        SELECT MAX(pd.id) FROM Price_Data pd
+        WHERE pd.coin_id IN (SELECT coin_id FROM Coins WHERE symbol = ?)
+    """,
+    'predictions': "SELECT MAX(prediction_id) FROM predictions",
+    'prediction_resolver': "SELECT high_water_mark FROM job_watermarks WHERE job_name = 'prediction_resolver'",
+    'Coins': "SELECT coin_id, symbol, full_name, description FROM Coins ORDER BY coin_id",
+    'chat_source': "SELECT source_id, source_name, api_base_url FROM chat_source ORDER BY source_id",
+    'chat_archive': "SELECT high_water_mark FROM job_watermarks WHERE job_name = 'chat_archive'",
+    'price_archive': "SELECT high_water_mark FROM job_watermarks WHERE job_name = 'price_archive'"
+}
+
+# Sources whose query takes the coin symbol as its parameter
+PER_COIN = {'coin_price'}
+
+# Small lookup tables read whole, so edits to existing rows change the
+# watermark too; it is (row count, CRC32 of the rows)
+FINGERPRINTED = {'Coins', 'chat_source'}
+
+
+def fingerprint(rows):
+    rows = [tuple(row) for row in rows]
+    return len(rows), zlib.crc32(repr(rows).encode('utf-8'))
+
+
+class DataWatermarks:
+    """Short-lived cache of the data watermarks that make up the API ETags.
+
+    A watermark changes whenever rows are added to its source (or, for the
+    FINGERPRINTED lookup tables, any row changes), so a response built from
+    the same watermarks (and parameters) is still current.
+    """
+
+    def __init__(self, db_manager, ttl=WATERMARK_TTL):
+        self.db = db_manager
+        self.ttl = ttl
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, sources, coin=None):
+        """Return the watermarks of `sources`, querying only the ones not cached"""
+        keys = [(source, coin if source in PER_COIN else None) for source in sources]
+        now = time.monotonic()
+        with self._lock:
+            cached = {key: self._values[key][0] for key in keys
+                      if key in self._values and self._values[key][1] > now}
+
+        missing = [key for key in keys if key not in cached]
+        if missing:
+            with self.db.connection() as conn:
+                for source, key_coin in missing:
+                    params = (key_coin,) if source in PER_COIN else ()
+                    result = conn.exec_driver_sql(WATERMARK_QUERIES[source], params)
+                    if source in FINGERPRINTED:
+                        cached[(source, key_coin)] = fingerprint(result.fetchall())
+                    else:
+                        row = result.fetchone()
+                        cached[(source, key_coin)] = tuple(row) if row else None
+            with self._lock:
+                for key in missing:
+                    self._values[key] = (cached[key], now + self.ttl)
+
+        return tuple(cached[key] for key in keys)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()